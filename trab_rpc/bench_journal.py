@@ -0,0 +1,129 @@
+"""Benchmark do journal: custo nas jogadas e tempo de recuperação.
+
+1. Vazão: várias threads jogam partidas (make_move + JOURNAL.record com o
+   lock da sala, como o MakeMove) com o journal desligado e ligado.
+2. Recuperação: N salas com partidas pela metade, um snapshot, mais jogadas
+   depois dele (o "rabo" do journal) e então recover() + GameRoom.restore
+   num registro novo, como no início do serve().
+
+Uso: python bench_journal.py [--rooms 100000] [--threads 4] [--dir /tmp/x]
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import game_pb2
+import gamelog
+from journal import Journal, recover
+from registry import RoomRegistry
+from room import GameRoom
+
+def play(rooms, journal, counts, index, max_moves=None):
+    moves = 0
+    for room in rooms:
+        played = 0
+        while room.status == "IN_GAME" and (max_moves is None or played < max_moves):
+            with room.lock:
+                player = room.current_turn_player_id
+                room.make_move(player, game_pb2.SHOOT_OPPONENT)
+                journal.record("move", room, (player, game_pb2.SHOOT_OPPONENT))
+            played += 1
+        moves += played
+    counts[index] = moves
+
+def run_threads(groups, journal, max_moves=None):
+    counts = [0] * len(groups)
+    threads = [threading.Thread(target=play, args=(rooms, journal, counts, i, max_moves))
+               for i, rooms in enumerate(groups)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts), time.perf_counter() - start
+
+def new_rooms(registry, journal, n, first=0):
+    rooms = []
+    for i in range(first, first + n):
+        room = GameRoom("bench", f"host{i}")
+        room.room_id = f"room-{i:06x}" # Ids de 6 hex sorteados colidem com tantas salas
+        registry.add(room)
+        with room.lock:
+            journal.record("create", room)
+            room.add_player(f"guest{i}")
+            journal.record("join", room)
+        rooms.append(room)
+    return rooms
+
+def bench_throughput(directory, threads, rooms_per_thread):
+    print(f"Vazão: {threads} threads x {rooms_per_thread} salas")
+    for name, enabled in (("desligado", False), ("ligado", True)):
+        random.seed(1)
+        path = os.path.join(directory, f"throughput-{name}")
+        registry = RoomRegistry()
+        journal = Journal(path)
+        if enabled:
+            journal.start(registry)
+        groups = [new_rooms(registry, journal, rooms_per_thread, t * rooms_per_thread) for t in range(threads)]
+        moves, elapsed = run_threads(groups, journal)
+        journal.stop()
+        print(f"  journal {name:<10} {moves / elapsed:>10.0f} jogadas/s")
+
+def bench_recovery(directory, n):
+    print(f"Recuperação: {n} salas")
+    path = os.path.join(directory, "recovery")
+    registry = RoomRegistry()
+    journal = Journal(path, snapshot_interval=3600)
+    journal.start(registry)
+    random.seed(2)
+    rooms = new_rooms(registry, journal, n)
+    run_threads([rooms], journal, max_moves=2)
+
+    start = time.perf_counter()
+    seq = journal.snapshot()
+    snapshot_time = time.perf_counter() - start
+
+    tail_moves, _ = run_threads([rooms], journal, max_moves=2) # O rabo depois do snapshot
+    journal.stop()
+    sizes = {name: os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)}
+    print(f"  snapshot (seq {seq}) em {snapshot_time:.2f}s; arquivos: "
+          + ", ".join(f"{name} {size / 1e6:.1f} MB" for name, size in sorted(sizes.items())))
+
+    start = time.perf_counter()
+    states, last_seq = recover(path)
+    read_time = time.perf_counter() - start
+    recovered = RoomRegistry()
+    for state in states.values():
+        recovered.add(GameRoom.restore(state))
+    total = time.perf_counter() - start
+    print(f"  {len(recovered)} salas, {tail_moves} registros no rabo (até seq {last_seq})")
+    print(f"  leitura {read_time:.2f}s + restore {total - read_time:.2f}s = {total:.2f}s")
+
+    # Confere que a recuperação bate com a memória
+    mismatches = sum(1 for room in rooms if recovered.get(room.room_id).dump_state() != room.dump_state())
+    print(f"  salas diferentes da memória: {mismatches}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=100000, help="Salas na recuperação")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--throughput-rooms", type=int, default=5000, help="Salas por thread na vazão")
+    parser.add_argument("--dir", default=None, help="Diretório dos arquivos (padrão: temporário)")
+    args = parser.parse_args()
+
+    gamelog.configure(level=logging.WARNING)
+    directory = args.dir or tempfile.mkdtemp(prefix="bench_journal-")
+    try:
+        bench_throughput(directory, args.threads, args.throughput_rooms)
+        bench_recovery(directory, args.rooms)
+    finally:
+        if args.dir is None:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
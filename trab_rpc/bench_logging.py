@@ -0,0 +1,120 @@
+"""Benchmark: jogadas/s com o log ligado e desligado.
+
+Várias threads jogam partidas em salas próprias (make_move até GAME_OVER,
+sem inscritos) e comparam:
+- print: como o servidor antigo, um print por broadcast/pente com o lock
+  da sala, escrevendo direto no arquivo;
+- desligado: gamelog em WARNING (os eventos de jogo nem viram LogRecord);
+- ligado: gamelog em INFO, todos os broadcasts (sem amostragem);
+- amostrado: gamelog em INFO com a amostragem padrão.
+
+A saída vai para um arquivo temporário de verdade (não /dev/null). Para o
+gamelog, 'descarte' é o que não coube no buffer e 'esvaziar' é o tempo que a
+thread de escrita levou depois do fim das jogadas.
+
+Uso: python bench_logging.py [--threads 4] [--rooms 5000] [--repeat 3]
+"""
+import argparse
+import contextlib
+import logging
+import random
+import tempfile
+import threading
+import time
+
+import game_pb2
+import gamelog
+from room import GameRoom
+
+class PrintRoom(GameRoom):
+    """GameRoom com os prints síncronos da versão antiga."""
+
+    __slots__ = ()
+
+    def _load_clip(self):
+        super()._load_clip()
+        pente = format(self.clip_bits, f"0{self.clip_size}b")[::-1]
+        print(f"Sala {self.room_id}: Carregando pente. {self.clip_size} balas, {self.clip_live} reais. Pente: {pente}")
+
+    def _broadcast_state(self):
+        with self.lock:
+            super()._broadcast_state()
+            print(f"Sala {self.room_id}: Transmitindo estado v{self.version} -> {self.last_action_log}")
+
+def make_rooms(cls, threads, rooms_per_thread):
+    return [[cls("bench", f"host{t}-{i}") for i in range(rooms_per_thread)] for t in range(threads)]
+
+def play(rooms, counts, index):
+    moves = 0
+    for room in rooms:
+        room.add_player("guest")
+        while room.status == "IN_GAME":
+            room.make_move(room.current_turn_player_id, game_pb2.SHOOT_OPPONENT)
+            moves += 1
+    counts[index] = moves
+
+def run(groups):
+    counts = [0] * len(groups)
+    threads = [threading.Thread(target=play, args=(rooms, counts, i)) for i, rooms in enumerate(groups)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+def run_scenario(cls, config, args):
+    random.seed(args.seed)
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as out:
+        # As salas são criadas com o log desligado, fora da medição
+        gamelog.configure(level=logging.WARNING, stream=out)
+        with contextlib.redirect_stdout(out):
+            groups = make_rooms(cls, args.threads, args.rooms)
+        out.flush()
+        base = out.tell()
+
+        dropped = gamelog.dropped()
+        if config:
+            gamelog.configure(stream=out, **config)
+        with contextlib.redirect_stdout(out):
+            moves_per_s = run(groups)
+        dropped = gamelog.dropped() - dropped
+
+        start = time.perf_counter()
+        gamelog.shutdown() # Espera a thread de escrita terminar o buffer
+        drain = time.perf_counter() - start
+
+        # Conta nos bytes: prints de várias threads podem intercalar caracteres
+        out.flush()
+        out.buffer.seek(base)
+        lines = out.buffer.read().count(b"\n")
+    return moves_per_s, lines, dropped, drain
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--rooms", type=int, default=5000, help="Salas por thread")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Rodadas por cenário (vale a melhor)")
+    args = parser.parse_args()
+
+    scenarios = (
+        ("print", PrintRoom, None),
+        ("desligado", GameRoom, {"level": logging.WARNING}),
+        ("ligado", GameRoom, {"level": logging.INFO, "sample_every": {}}),
+        ("amostrado", GameRoom, {"level": logging.INFO}),
+    )
+
+    print(f"{args.threads} threads x {args.rooms} salas")
+    print(f"{'cenário':<12} {'jogadas/s':>10} {'linhas':>9} {'descarte':>9} {'esvaziar':>9}")
+    for name, cls, config in scenarios:
+        # Melhor de N rodadas: a máquina pode estar fazendo outras coisas
+        best = max((run_scenario(cls, config, args) for _ in range(args.repeat)), key=lambda r: r[0])
+        moves_per_s, lines, dropped, drain = best
+        if cls is PrintRoom:
+            print(f"{name:<12} {moves_per_s:>10.0f} {lines:>9} {'-':>9} {'-':>9}")
+        else:
+            print(f"{name:<12} {moves_per_s:>10.0f} {lines:>9} {dropped:>9} {drain * 1000:>7.0f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark de contenção do registro de salas.
+
+Compara o modelo antigo (dict global + ROOMS_LOCK, com o GetLobbies montando
+a lista inteira dentro do lock) com o RoomRegistry em shards. Threads de
+"jogo" fazem buscas pontuais (como MakeMove/Subscribe) enquanto uma thread
+de "lobby" varre todas as salas sem parar.
+
+Uso: python bench_registry.py [--rooms 20000] [--threads 8] [--seconds 3]
+"""
+import argparse
+import threading
+import time
+
+from registry import RoomRegistry
+
+class FakeRoom:
+    def __init__(self, n):
+        self.room_id = f"room-{n:06x}"
+        self.room_name = "bench"
+        self.players = {"host": None}
+        self.status = "WAITING"
+
+def _room_info(room):
+    # Custo parecido com montar um RoomInfo por sala
+    return (room.room_id, room.room_name, len(room.players), room.status)
+
+class GlobalLockRooms:
+    """O modelo antigo: um dict e um lock para tudo."""
+
+    def __init__(self):
+        self.rooms = {}
+        self.lock = threading.Lock()
+
+    def add(self, room):
+        with self.lock:
+            self.rooms[room.room_id] = room
+
+    def get(self, room_id):
+        with self.lock:
+            return self.rooms.get(room_id)
+
+    def scan(self):
+        with self.lock:
+            return [_room_info(room) for room in self.rooms.values()]
+
+class ShardedRooms:
+    def __init__(self):
+        self.registry = RoomRegistry()
+
+    def add(self, room):
+        self.registry.add(room)
+
+    def get(self, room_id):
+        return self.registry.get(room_id)
+
+    def scan(self):
+        return [_room_info(room) for room in self.registry.values()]
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))
+    return sorted_values[index]
+
+def run(impl, room_ids, threads, seconds):
+    stop = threading.Event()
+    lookups = [0] * threads
+    latencies = [[] for _ in range(threads)]
+    scans = [0]
+
+    def player(n):
+        count = 0
+        samples = latencies[n]
+        i = n
+        while not stop.is_set():
+            room_id = room_ids[i % len(room_ids)]
+            start = time.perf_counter()
+            impl.get(room_id)
+            elapsed = time.perf_counter() - start
+            count += 1
+            i += threads
+            if count % 64 == 0: # Amostra a latência para não pesar no teste
+                samples.append(elapsed)
+        lookups[n] = count
+
+    def lobby():
+        while not stop.is_set():
+            impl.scan()
+            scans[0] += 1
+
+    workers = [threading.Thread(target=player, args=(n,)) for n in range(threads)]
+    workers.append(threading.Thread(target=lobby))
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+
+    samples = sorted(s for per_thread in latencies for s in per_thread)
+    return {
+        "lookups_per_s": sum(lookups) / seconds,
+        "scans_per_s": scans[0] / seconds,
+        "lookup_p50_us": _percentile(samples, 50) * 1e6,
+        "lookup_p99_us": _percentile(samples, 99) * 1e6,
+        "lookup_max_us": (samples[-1] if samples else 0.0) * 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    rooms = [FakeRoom(n) for n in range(args.rooms)]
+    room_ids = [room.room_id for room in rooms]
+
+    print(f"{args.rooms} salas, {args.threads} threads de jogo + 1 de lobby, {args.seconds}s")
+    print(f"{'modelo':<12} {'buscas/s':>12} {'scans/s':>9} {'p50 (us)':>9} {'p99 (us)':>9} {'max (us)':>10}")
+    for name, impl in (("global-lock", GlobalLockRooms()), ("sharded", ShardedRooms())):
+        for room in rooms:
+            impl.add(room)
+        r = run(impl, room_ids, args.threads, args.seconds)
+        print(f"{name:<12} {r['lookups_per_s']:>12.0f} {r['scans_per_s']:>9.1f} "
+              f"{r['lookup_p50_us']:>9.2f} {r['lookup_p99_us']:>9.2f} {r['lookup_max_us']:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Micro-benchmark do GameRoom compacto contra a versão antiga.
+
+Mede, com N salas residentes (dois jogadores, partida em andamento):
+- memória por sala (tracemalloc), só o núcleo e com o histórico de broadcast;
+- custo médio de uma jogada (make_move sem broadcast);
+- custo de montar o GameState (_get_state_proto).
+
+Uso: python bench_room.py [--rooms 100000]
+"""
+import argparse
+import contextlib
+import gc
+import os
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+import game_pb2
+from room import GameRoom, INITIAL_LIVES
+
+class LegacyGameRoom:
+    """Cópia da representação antiga (dict de jogadores e pente em lista),
+    mantida só para comparação."""
+
+    def __init__(self, room_name, host_name):
+        self.room_id = f"room-{uuid.uuid4().hex[:6]}"
+        self.room_name = room_name
+        self.players = {}
+        self.host_id = host_name
+        self.status = "WAITING"
+        self.clip = []
+        self.current_turn_player_id = None
+        self.last_action_log = "Jogo criado. Esperando oponente..."
+        self.winner_id = None
+        self.subscriber_queues = []
+        self.lock = threading.RLock()
+        self.add_player(host_name)
+
+    def add_player(self, player_name):
+        if len(self.players) >= 2:
+            raise Exception("Sala está cheia")
+        self.players[player_name] = {"name": player_name, "lives": INITIAL_LIVES}
+        if len(self.players) == 2:
+            self.start_game()
+        else:
+            self.last_action_log = f"{player_name} entrou na sala. Esperando oponente..."
+            self._broadcast_state()
+        return player_name
+
+    def start_game(self):
+        self.status = "IN_GAME"
+        self.current_turn_player_id = random.choice(list(self.players.keys()))
+        self._load_clip()
+        self.last_action_log = f"Jogo iniciado! {len(self.clip)} balas no pente ({self.clip.count(True)} reais). Vez de {self.current_turn_player_id}."
+        self._broadcast_state()
+
+    def _load_clip(self):
+        total = random.randint(2, 8)
+        live = total // 2
+        if total % 2 != 0 and random.choice([True, False]):
+            live += 1
+        self.clip = [True] * live + [False] * (total - live)
+        random.shuffle(self.clip)
+        print(f"Sala {self.room_id}: Carregando pente. {total} balas, {live} reais. Pente: {self.clip}")
+
+    def get_opponent_id(self, player_id):
+        for pid in self.players.keys():
+            if pid != player_id:
+                return pid
+        return None
+
+    def make_move(self, player_id, action):
+        with self.lock:
+            if action == game_pb2.QUIT_GAME:
+                self.players[player_id]["lives"] = 0
+                self.last_action_log = f"{player_id} desistiu."
+            elif self.status != "IN_GAME":
+                raise Exception("Jogo não está ativo")
+            elif player_id != self.current_turn_player_id:
+                raise Exception("Não é o seu turno")
+            elif not self.clip:
+                self._load_clip()
+                self.last_action_log = f"Pente vazio. Recarregando! {len(self.clip)} balas ({self.clip.count(True)} reais)."
+            elif action == game_pb2.SHOOT_SELF:
+                if self.clip.pop(0):
+                    self.players[player_id]["lives"] -= 1
+                    self.last_action_log = f"{player_id} atirou em si mesmo... ERA REAL! -1 vida. A vez passa."
+                    self.current_turn_player_id = self.get_opponent_id(player_id)
+                else:
+                    self.last_action_log = f"{player_id} atirou em si mesmo... FESTIM! A vez continua."
+            elif action == game_pb2.SHOOT_OPPONENT:
+                opponent_id = self.get_opponent_id(player_id)
+                if self.clip.pop(0):
+                    self.players[opponent_id]["lives"] -= 1
+                    self.last_action_log = f"{player_id} atirou em {opponent_id}... ERA REAL! {opponent_id} perdeu 1 vida."
+                else:
+                    self.last_action_log = f"{player_id} atirou em {opponent_id}... FESTIM! Ninguém se feriu."
+                self.current_turn_player_id = opponent_id
+
+            for pid, data in self.players.items():
+                if data["lives"] <= 0 and self.status != "GAME_OVER":
+                    self.winner_id = self.get_opponent_id(pid) or "Ninguém"
+                    self.status = "GAME_OVER"
+                    self.last_action_log += f" FIM DE JOGO! {self.winner_id} venceu!"
+                    break
+
+            self._broadcast_state()
+
+    def _broadcast_state(self):
+        # A versão antiga montava o GameState e o colocava nas filas
+        state_proto = self._get_state_proto()
+        for q in list(self.subscriber_queues):
+            q.put(state_proto)
+
+    def _get_state_proto(self):
+        pids = list(self.players.keys())
+        p1_name, p1_lives, p2_name, p2_lives = "", 0, "", 0
+        if len(pids) > 0:
+            p1_name = self.players[pids[0]]["name"]
+            p1_lives = self.players[pids[0]]["lives"]
+        if len(pids) > 1:
+            p2_name = self.players[pids[1]]["name"]
+            p2_lives = self.players[pids[1]]["lives"]
+        return game_pb2.GameState(
+            room_id=self.room_id,
+            status=self.status,
+            player1_name=p1_name,
+            player2_name=p2_name,
+            player1_lives=p1_lives,
+            player2_lives=p2_lives,
+            current_turn_player_id=self.current_turn_player_id or "",
+            bullets_in_clip=len(self.clip),
+            live_bullets_in_clip=self.clip.count(True),
+            last_action_log=self.last_action_log,
+            winner_id=self.winner_id or "",
+        )
+
+# Variantes sem broadcast: isolam o custo do núcleo da sala
+class LegacyCore(LegacyGameRoom):
+    def _broadcast_state(self):
+        pass
+
+class CompactCore(GameRoom):
+    __slots__ = ()
+
+    def _broadcast_state(self):
+        pass
+
+def measure_memory(cls, n):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rooms = []
+    for i in range(n):
+        room = cls("bench", f"host{i}")
+        room.add_player(f"guest{i}")
+        rooms.append(room)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Desconta a própria lista que segura as salas
+    per_room = (after - before - rooms.__sizeof__()) / n
+    return rooms, per_room
+
+def measure_moves(rooms):
+    moves = 0
+    start = time.perf_counter()
+    for room in rooms:
+        while room.status == "IN_GAME":
+            room.make_move(room.current_turn_player_id, game_pb2.SHOOT_OPPONENT)
+            moves += 1
+    elapsed = time.perf_counter() - start
+    return elapsed / moves * 1e9, moves
+
+def measure_state(rooms, samples=100000):
+    sample = rooms[:samples]
+    start = time.perf_counter()
+    for room in sample:
+        room._get_state_proto()
+    return (time.perf_counter() - start) / len(sample) * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{args.rooms} salas residentes")
+    print(f"{'classe':<20} {'bytes/sala':>11} {'ns/jogada':>10} {'ns/estado':>10}")
+    # Os prints da classe antiga (como no servidor antigo) vão para o /dev/null
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = []
+        for name, cls in (("antiga (núcleo)", LegacyCore), ("compacta (núcleo)", CompactCore),
+                          ("antiga (servidor)", LegacyGameRoom), ("compacta (servidor)", GameRoom)):
+            random.seed(args.seed)
+            rooms, per_room = measure_memory(cls, args.rooms)
+            state_ns = measure_state(rooms)
+            move_ns, _ = measure_moves(rooms) if "núcleo" in name else (float("nan"), 0)
+            results.append((name, per_room, move_ns, state_ns))
+            del rooms
+
+    for name, per_room, move_ns, state_ns in results:
+        print(f"{name:<20} {per_room:>11.0f} {move_ns:>10.0f} {state_ns:>10.0f}")
+    print("núcleo = sem broadcast; servidor = com o broadcast/histórico de cada versão")
+
+if __name__ == '__main__':
+    main()
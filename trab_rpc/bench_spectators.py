@@ -0,0 +1,119 @@
+"""Benchmark: latência das jogadas com muitos espectadores numa sala.
+
+Uma sala com dois jogadores recebe N observadores, cada um uma corrotina
+num event loop (como os streams do server_aio), de dois jeitos:
+- inscritos: cada observador é um AsyncSubscriber inscrito na sala (o que
+  um SubscribeToGameUpdates de quem não joga faz): o broadcast entrega para
+  todos com o lock da sala;
+- espectadores: WatchGame (spectators.py): a sala tem um único inscrito, o
+  feed compartilhado, e o hub acorda os espectadores fora do lock; acima de
+  LIVE_SPECTATORS eles entram na camada coalescida.
+
+Mede o tempo de cada jogada (lock da sala + make_move + broadcast, o caminho
+do MakeMove) num ritmo fixo, e quantas versões cada observador recebeu.
+
+Uso: python bench_spectators.py [--watchers 0 10 100 1000 5000] [--moves 500] [--rate 200]
+"""
+import argparse
+import asyncio
+import logging
+import threading
+import time
+
+import game_pb2
+import gamelog
+from room import GameRoom
+from server_aio import AsyncSubscriber
+from spectators import SpectatorHub
+
+def new_room():
+    room = GameRoom("bench", "p1")
+    room.add_player("p2")
+    # Vidas "infinitas": a partida não acaba durante a medição
+    room.player1_lives = room.player2_lives = 10 ** 9
+    return room
+
+async def consume(get, received, index):
+    while True:
+        await get()
+        received[index] += 1
+
+async def attach(mode, hub, room, n, received):
+    # Cria os observadores no event loop; retorna (tarefas, espectadores)
+    loop = asyncio.get_running_loop()
+    tasks, spectators = [], []
+    for i in range(n):
+        if mode == "inscritos":
+            subscriber = AsyncSubscriber(loop)
+            room.subscribe(subscriber)
+            get = subscriber.get
+        else:
+            spectator = hub.join(room)
+            spectators.append(spectator)
+            get = spectator.get_async
+        tasks.append(loop.create_task(consume(get, received, i)))
+    return tasks, spectators
+
+async def detach(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def play(room, moves, rate):
+    # Tempo de cada jogada, no ritmo 'rate' (jogadas/s)
+    interval = 1.0 / rate
+    times = []
+    next_move = time.perf_counter()
+    for _ in range(moves):
+        next_move += interval
+        start = time.perf_counter()
+        with room.lock:
+            room.make_move(room.current_turn_player_id, game_pb2.SHOOT_OPPONENT)
+        times.append(time.perf_counter() - start)
+        time.sleep(max(0.0, next_move - time.perf_counter()))
+    return sorted(times)
+
+def run(mode, n, moves, rate):
+    room = new_room()
+    received = [0] * n
+    hub = SpectatorHub()
+    hub.start()
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+
+    tasks, spectators = asyncio.run_coroutine_threadsafe(attach(mode, hub, room, n, received), loop).result()
+    time.sleep(0.2) # Deixa os observadores receberem o estado inicial
+    times = play(room, moves, rate)
+    time.sleep(1.0) # Últimas entregas (a camada coalescida olha uma vez por segundo)
+
+    asyncio.run_coroutine_threadsafe(detach(tasks), loop).result()
+    for spectator in spectators:
+        hub.leave(spectator)
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join()
+    loop.close()
+    hub.stop()
+
+    p50 = times[len(times) // 2] * 1e3
+    p99 = times[min(len(times) - 1, len(times) * 99 // 100)] * 1e3
+    versions = sum(received) / n if n else float("nan")
+    return p50, p99, versions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--watchers", type=int, nargs="+", default=[0, 10, 100, 1000, 5000])
+    parser.add_argument("--moves", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200.0, help="Jogadas por segundo")
+    args = parser.parse_args()
+
+    gamelog.configure(level=logging.WARNING)
+    print(f"{args.moves} jogadas a {args.rate:g}/s")
+    print(f"{'modo':<13} {'observadores':>12} {'p50 ms':>8} {'p99 ms':>8} {'versões/obs.':>13}")
+    for mode in ("inscritos", "espectadores"):
+        for n in args.watchers:
+            p50, p99, versions = run(mode, n, args.moves, args.rate)
+            print(f"{mode:<13} {n:>12} {p50:>8.3f} {p99:>8.3f} {versions:>13.1f}")
+
+if __name__ == '__main__':
+    main()
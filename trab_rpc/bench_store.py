@@ -0,0 +1,181 @@
+"""Benchmark dos stores (store.py): latência das jogadas em cada backend.
+
+1. Latência: várias threads jogam partidas pelo STORE.apply_move (como o
+   MakeMove), medindo cada jogada: memória sem journal, memória + journal e
+   SQLite com um processo.
+2. SQLite com vários processos no mesmo banco: cada um joga as próprias
+   salas enquanto a thread de mudanças publica na cópia local as jogadas dos
+   outros.
+3. Propagação: um processo joga e outro mede quanto tempo cada versão leva
+   para chegar num inscrito dele.
+
+Uso: python bench_store.py [--threads 4] [--rooms 500] [--processes 2]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import game_pb2
+import gamelog
+from journal import Journal
+from registry import RoomRegistry
+from room import GameRoom
+from store import MemoryStore, SQLiteStore
+
+def new_rooms(store, n, prefix):
+    rooms = []
+    for i in range(n):
+        room = GameRoom("bench", f"{prefix}-host{i}")
+        room.room_id = f"{prefix}-{i:06x}" # Ids de 6 hex sorteados colidem com tantas salas
+        store.add(room)
+        store.update(room, "join", lambda target: target.add_player(f"{prefix}-guest{i}"))
+        rooms.append(room)
+    return rooms
+
+def play(store, rooms, latencies):
+    for room in rooms:
+        while room.status == "IN_GAME":
+            start = time.perf_counter()
+            store.apply_move(room, room.current_turn_player_id, game_pb2.SHOOT_OPPONENT)
+            latencies.append(time.perf_counter() - start)
+
+def run_threads(store, groups):
+    # Retorna (latências de todas as jogadas, segundos)
+    latencies = [[] for _ in groups]
+    threads = [threading.Thread(target=play, args=(store, rooms, latencies[i])) for i, rooms in enumerate(groups)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [x for group in latencies for x in group], time.perf_counter() - start
+
+def summary(latencies, elapsed):
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2] * 1e6
+    p99 = ordered[int(len(ordered) * 0.99)] * 1e6
+    return (f"{len(ordered) / elapsed:>9.0f} jogadas/s  média {statistics.fmean(ordered) * 1e6:>7.1f} µs  "
+            f"p50 {p50:>7.1f} µs  p99 {p99:>7.1f} µs")
+
+def open_store(kind, directory):
+    registry = RoomRegistry()
+    if kind == "sqlite":
+        store = SQLiteStore(registry, os.path.join(directory, "rooms.db"))
+    else:
+        store = MemoryStore(registry, Journal(os.path.join(directory, "journal")))
+    _, last_seq = store.recover()
+    if kind != "memory":
+        store.start(last_seq) # Memória sem journal: o Journal fica desligado
+    return store
+
+def bench_latency(directory, threads, rooms):
+    print(f"Latência: {threads} threads x {rooms} salas")
+    for kind, label in (("memory", "memória"), ("journal", "memória + journal"), ("sqlite", "SQLite")):
+        random.seed(1)
+        path = os.path.join(directory, kind)
+        store = open_store(kind, path)
+        groups = [new_rooms(store, rooms, f"t{t}") for t in range(threads)]
+        latencies, elapsed = run_threads(store, groups)
+        if kind != "memory":
+            store.stop()
+        print(f"  {label:<18} {summary(latencies, elapsed)}")
+
+def _worker(path, index, threads, rooms, ready, results):
+    # Um processo servidor: joga as próprias salas no banco compartilhado
+    gamelog.configure(level=logging.WARNING)
+    store = open_store("sqlite", path)
+    groups = [new_rooms(store, rooms, f"p{index}t{t}") for t in range(threads)]
+    ready.wait()
+    latencies, elapsed = run_threads(store, groups)
+    time.sleep(0.2) # Deixa a thread de mudanças alcançar os outros processos
+    results.put((len(store.rooms), latencies, elapsed))
+    store.stop()
+
+def bench_processes(directory, processes, threads, rooms):
+    print(f"SQLite com {processes} processos: {threads} threads x {rooms} salas cada")
+    path = os.path.join(directory, "processes")
+    ready = multiprocessing.Barrier(processes)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_worker, args=(path, i, threads, rooms, ready, results))
+               for i in range(processes)]
+    for w in workers:
+        w.start()
+    outcomes = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+    latencies = [x for _, values, _ in outcomes for x in values]
+    elapsed = max(seconds for _, _, seconds in outcomes)
+    print(f"  {'total':<18} {summary(latencies, elapsed)}")
+    print(f"  salas em cada processo: {sorted(count for count, _, _ in outcomes)}")
+
+class _Arrivals:
+    # Inscrito que só anota quando cada versão chegou
+    def __init__(self, room_id, times):
+        self.room_id = room_id
+        self.times = times
+
+    def push(self, update):
+        self.times[(self.room_id, update.version)] = time.time()
+
+def _writer(path, room_ids, interval, results):
+    gamelog.configure(level=logging.WARNING)
+    store = open_store("sqlite", path)
+    written = {}
+    for room_id in room_ids:
+        room = store.get(room_id)
+        while room.status == "IN_GAME":
+            store.apply_move(room, room.current_turn_player_id, game_pb2.SHOOT_OPPONENT)
+            written[(room_id, room.version)] = time.time()
+            time.sleep(interval)
+    results.put(written)
+    store.stop()
+
+def bench_propagation(directory, rooms, interval):
+    print(f"Propagação: {rooms} partidas jogadas num processo, inscritos em outro")
+    path = os.path.join(directory, "propagation")
+    store = open_store("sqlite", path)
+    arrivals = {}
+    room_ids = []
+    for room in new_rooms(store, rooms, "w"):
+        room.subscribe(_Arrivals(room.room_id, arrivals), room.version)
+        room_ids.append(room.room_id)
+
+    results = multiprocessing.Queue()
+    writer = multiprocessing.Process(target=_writer, args=(path, room_ids, interval, results))
+    writer.start()
+    written = results.get()
+    writer.join()
+    time.sleep(0.1)
+    store.stop()
+    delays = sorted(arrivals[key] - t for key, t in written.items() if key in arrivals)
+    print(f"  {len(delays)}/{len(written)} versões; atraso p50 {delays[len(delays) // 2] * 1e3:.1f} ms, "
+          f"p99 {delays[int(len(delays) * 0.99)] * 1e3:.1f} ms, máximo {delays[-1] * 1e3:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--rooms", type=int, default=500, help="Salas por thread")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--games", type=int, default=50, help="Partidas na medida de propagação")
+    parser.add_argument("--dir", default=None, help="Diretório dos arquivos (padrão: temporário)")
+    args = parser.parse_args()
+
+    gamelog.configure(level=logging.WARNING)
+    directory = args.dir or tempfile.mkdtemp(prefix="bench_store-")
+    try:
+        bench_latency(directory, args.threads, args.rooms)
+        bench_processes(directory, args.processes, args.threads, args.rooms)
+        bench_propagation(directory, args.games, 0.005)
+    finally:
+        if args.dir is None:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
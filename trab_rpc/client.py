@@ -1,206 +1,350 @@
+import argparse
 import grpc
 import threading
 import time
-import os # Para limpar o terminal
+import os
+import queue
+import random
 
 # Importa as classes geradas
 import game_pb2
 import game_pb2_grpc
 
+from connection import Backoff, RESUBSCRIBE_CODES, RETRY_CODES, open_channel, session_metadata, room_stub
+from events import SCHEMA_V2, apply_update, expand
+from render import AnsiRenderer, game_lines
+
 # --- Variáveis de Estado Global do Cliente ---
 # (Simples, apenas para este exemplo)
 PLAYER_NAME = ""
 CURRENT_ROOM_ID = ""
-CURRENT_GAME_STATE = None
-STATE_LOCK = threading.Lock() # Lock para proteger o CURRENT_GAME_STATE
-IS_MY_TURN = False
-GAME_OVER = False
+SESSION_TOKEN = "" # Token da sessão (devolvido pelo servidor ao criar/entrar numa sala)
+RENDERER = AnsiRenderer() # Quadro do jogo; None no modo bot (sem tela)
+
+LOBBY_PAGE_SIZE = 10 # Salas por página na listagem do lobby
+MOVE_TIMEOUT = 2.0 # Prazo de cada tentativa do MakeMove (segundos)
+MOVE_ATTEMPTS = 3 # Tentativas de uma jogada, todas com o mesmo sequence
+
+# Modo PlayGame (python client.py --stream): jogadas e estados no mesmo stream
+USE_PLAY_STREAM = False
 
 def clear_screen():
-    # Limpa o terminal para uma "UI" melhor
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # Limpa o terminal com uma sequência ANSI (sem abrir um processo)
+    if RENDERER is not None:
+        RENDERER.clear()
 
-def print_game_state(state):
-    """Função de "renderização" do terminal."""
-    global IS_MY_TURN, GAME_OVER
-    
-    with STATE_LOCK:
-        clear_screen()
-        print("================ BUCKSHOT ROULETTE (gRPC) ================")
-        print(f"Sala: {state.room_id} | Status: {state.status}")
-        print(f"Log: {state.last_action_log}\n")
-        
-        # Pente
-        print(f"--- PENTE ATUAL ---")
-        print(f"Balas Totais: {state.bullets_in_clip}")
-        print(f"Balas Reais:  {state.live_bullets_in_clip}")
-        print(f"Balas Festim: {state.bullets_in_clip - state.live_bullets_in_clip}\n")
-        
-        # Jogadores
-        print("--- JOGADORES ---")
-        print(f"  {state.player1_name}: {state.player1_lives} vidas")
-        if state.player2_name:
-            print(f"  {state.player2_name}: {state.player2_lives} vidas")
-        print("-------------------")
-
-        # Turno / Fim de Jogo
-        if state.status == "GAME_OVER":
-            print(f"\n!!!!!!!! FIM DE JOGO !!!!!!!!")
-            print(f"{state.winner_id} VENCEU!")
-            print("==========================================================")
-            IS_MY_TURN = False
-            GAME_OVER = True
-        elif state.status == "IN_GAME":
-            if state.current_turn_player_id == PLAYER_NAME:
-                print(f"\n>>>> É A SUA VEZ, {PLAYER_NAME}! <<<<")
-                IS_MY_TURN = True
-            else:
-                print(f"\n>>>> Esperando a jogada de {state.current_turn_player_id}... <<<<")
-                IS_MY_TURN = False
-        elif state.status == "WAITING":
-            print("\n>>>> Esperando outro jogador entrar na sala... <<<<")
-            IS_MY_TURN = False
-
-def listen_for_updates(stub):
-    """Thread dedicada a escutar o stream de GameState do servidor."""
-    global CURRENT_GAME_STATE
-    
-    print(f"Cliente: Conectando ao stream da sala {CURRENT_ROOM_ID} como {PLAYER_NAME}...")
-    try:
-        request = game_pb2.SubscribeRequest(room_id=CURRENT_ROOM_ID, player_id=PLAYER_NAME)
-        stream = stub.SubscribeToGameUpdates(request)
-        
-        for state in stream:
-            # A cada novo estado recebido, atualiza a variável global e imprime
-            with STATE_LOCK:
-                CURRENT_GAME_STATE = state
-            print_game_state(state)
-            
-    except grpc.RpcError as e:
-        if e.code() == grpc.StatusCode.CANCELLED:
-            print("Stream cancelado pelo cliente.")
-        else:
-            print(f"Erro no stream gRPC: {e.details()} (Código: {e.code()})")
-    except Exception as e:
-        print(f"Erro na thread de escuta: {e}")
-    finally:
-        print("Thread de escuta terminada.")
-        # Se a thread morrer, sinaliza o fim do jogo
-        global GAME_OVER
-        GAME_OVER = True 
-
-def game_input_loop(stub):
-    """Thread dedicada a capturar o input do usuário para jogar."""
-    global IS_MY_TURN, GAME_OVER, CURRENT_GAME_STATE
-    
-    while not GAME_OVER:
-        # Pega o status atual de forma segura
-        current_status = ""
-        with STATE_LOCK:
-            if CURRENT_GAME_STATE:
-                current_status = CURRENT_GAME_STATE.status
+class GameSession:
+    """Uma partida do lado do cliente.
+
+    A thread de escuta recebe os estados (e, no PlayGame, os acks) e a cada
+    um incrementa 'events' e acorda quem espera em wait_event: o loop de
+    input (ou o bot) dorme até algo acontecer, sem polling. Com um renderer,
+    cada estado redesenha só o que mudou no quadro; sem (modo bot), nada é
+    desenhado.
+
+    Os estados chegam no esquema compacto (GameStateV2, ver events.py) e
+    viram um GameState local, com o texto do log montado aqui.
+
+    Se o stream cai por um problema de conexão (connection.RESUBSCRIBE_CODES)
+    ou termina antes do fim do jogo, a thread de escuta se inscreve de novo
+    na mesma sala, com resume_from_version e espera exponencial entre as
+    tentativas: uma queda rápida da rede não tira o jogador da partida.
+    """
+
+    def __init__(self, stub, player_name, room_id, session_token, use_play_stream, renderer):
+        self.stub = stub
+        self.player_name = player_name
+        self.room_id = room_id
+        self.session_token = session_token # Autoriza as jogadas e a inscrição
+        self.renderer = renderer
+        self.use_play_stream = use_play_stream
+        self.state = None
+        self.events = 0 # Estados e erros de jogada recebidos até agora
+        self.errors = [] # Erros de jogada (acks do PlayGame) ainda não mostrados
+        self.game_over = False
+        self.reconnects = 0 # Reinscrições depois de o stream cair
+        self._cond = threading.Condition()
+        # Fila de PlayRequests do stream atual (None = jogadas via MakeMove);
+        # cada reconexão do PlayGame usa uma fila nova
+        self._requests = queue.Queue() if use_play_stream else None
+        self._requests_lock = threading.Lock()
+        self._unacked = {} # action_id -> PlayRequest ainda sem ack (reenviadas na reconexão)
+        # Sequence das jogadas (também o action_id do PlayGame). Começa do
+        # relógio para continuar crescendo se o cliente reiniciar no meio da
+        # partida: um sequence repetido receberia o resultado da jogada antiga
+        self._sequence = time.time_ns() // 1000
+        self._call = None # Stream atual (cancelado no close)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        # Fecha o lado do cliente do PlayGame (se estiver em uso) e para as reconexões
+        self._stop.set()
+        with self._requests_lock:
+            if self._requests is not None:
+                self._requests.put(None)
+        call = self._call
+        if call is not None and not self.game_over:
+            call.cancel() # Saiu antes do fim do jogo
+        self._thread.join(timeout=1)
+
+    @property
+    def my_turn(self):
+        state = self.state
+        return state is not None and state.status == "IN_GAME" and state.current_turn_player_id == self.player_name
+
+    def wait_event(self, seen):
+        """Dorme até chegar um evento depois de 'seen' (ou o jogo acabar);
+        retorna (events, state)."""
+        with self._cond:
+            while self.events == seen and not self.game_over:
+                self._cond.wait()
+            return self.events, self.state
+
+    def send(self, action):
+        """Envia uma jogada: pelo PlayGame se o stream estiver ativo, senão via
+        MakeMove. Retorna a mensagem de erro do MakeMove (ou None); no
+        PlayGame o erro chega depois, pelo ack.
+
+        Cada jogada leva um sequence novo e as tentativas repetem o mesmo, então
+        o servidor nunca aplica a mesma jogada duas vezes (ver
+        room.GameRoom.apply_move): um MakeMove sem resposta no prazo é
+        simplesmente repetido."""
+        with self._requests_lock:
+            self._sequence += 1
+            sequence = self._sequence
+            if self._requests is not None:
+                request = game_pb2.PlayRequest(
+                    move=game_pb2.PlayMove(action_id=sequence, action=action, sequence=sequence))
+                self._unacked[sequence] = request
+                self._requests.put(request)
+                return None
+
+        request = game_pb2.MoveRequest(room_id=self.room_id, player_id=self.player_name,
+                                       action=action, sequence=sequence, session_token=self.session_token)
+        backoff = Backoff(initial=0.1, maximum=1.0)
+        for attempt in range(MOVE_ATTEMPTS):
+            try:
+                self.stub.MakeMove(request, timeout=MOVE_TIMEOUT, wait_for_ready=True)
+                return None
+            except grpc.RpcError as e:
+                if e.code() not in RETRY_CODES or attempt == MOVE_ATTEMPTS - 1:
+                    return e.details()
+            time.sleep(backoff.next())
+
+    def _play_requests(self, requests, join):
+        """Gerador do lado do cliente do PlayGame: 'join' e depois as jogadas da fila."""
+        yield game_pb2.PlayRequest(join=join)
+        while True:
+            request = requests.get()
+            if request is None:
+                return # Fim do jogo (ou reconexão): fecha o lado do cliente
+            yield request
+
+    def _new_requests(self):
+        # Reconexão do PlayGame: as jogadas sem ack (não enviadas ou perdidas
+        # com o stream antigo) vão para uma fila nova, na ordem, e o gerador
+        # do stream antigo (se ainda lê) é encerrado. As que já tinham sido
+        # aplicadas voltam como repetição, pelo sequence.
+        with self._requests_lock:
+            self._requests.put(None)
+            self._requests = queue.Queue()
+            for request in self._unacked.values():
+                self._requests.put(request)
+            return self._requests
+
+    def _open_stream(self, reconnecting):
+        # Na reconexão o servidor reenvia só o que se perdeu depois da última
+        # versão recebida (ou o estado completo, se a sala voltou do journal
+        # numa versão anterior)
+        version = self.state.version if self.state is not None else 0
+        join = game_pb2.SubscribeRequest(room_id=self.room_id, player_id=self.player_name,
+                                         resume_from_version=version, schema_version=SCHEMA_V2,
+                                         session_token=self.session_token)
+        # wait_for_ready: numa reconexão, espera o canal voltar em vez de falhar na hora
+        if self._requests is not None:
+            requests = self._new_requests() if reconnecting else self._requests
+            return self.stub.PlayGame(self._play_requests(requests, join), wait_for_ready=True,
+                                      metadata=session_metadata(self.session_token))
+        return self.stub.StreamGameUpdates(join, wait_for_ready=True)
+
+    def _listen(self):
+        """Thread dedicada a escutar o stream do servidor (e reconectar)."""
+        backoff = Backoff()
+        reconnecting = False
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._call = self._open_stream(reconnecting)
+                    if self._stop.is_set():
+                        self._call.cancel() # close() chegou durante a reconexão
+                    if reconnecting:
+                        # Os headers chegam logo depois da inscrição, mesmo sem
+                        # estado novo para mandar (ou a chamada falhou)
+                        self._call.initial_metadata()
+                        if not self._call.done():
+                            backoff.reset()
+                            reconnecting = False
+                            self._status("")
+                    for event in self._call:
+                        if not self.use_play_stream:
+                            self._on_state(apply_update(event, self.state)) # StreamGameUpdates: só estados
+                        elif event.WhichOneof("kind") == "compact":
+                            self._on_state(expand(event.compact, self.state))
+                        elif event.WhichOneof("kind") == "state":
+                            self._on_state(event.state)
+                        else:
+                            # Modo PlayGame: estados e acks chegam misturados no mesmo stream
+                            with self._requests_lock:
+                                self._unacked.pop(event.ack.action_id, None)
+                            if not event.ack.success:
+                                self._on_error(event.ack.error_message)
+                    if self.game_over:
+                        return
+                    reason = "stream encerrado pelo servidor"
+                except grpc.RpcError as e:
+                    if self._stop.is_set() or e.code() not in RESUBSCRIBE_CODES:
+                        if e.code() != grpc.StatusCode.CANCELLED and self.renderer is not None:
+                            print(f"Erro no stream gRPC: {e.details()} (Código: {e.code()})")
+                        return
+                    reason = f"{e.details()} ({e.code().name})"
+
+                reconnecting = True
+                delay = backoff.next()
+                if delay is None:
+                    if self.renderer is not None:
+                        print(f"Sem conexão com o servidor: {reason}")
+                    return
+                self.reconnects += 1
+                self._status(f"Conexão perdida: {reason}. Reconectando em {delay:.1f}s...")
+                self._stop.wait(delay)
+        finally:
+            # Se a thread morrer, sinaliza o fim do jogo
+            with self._cond:
+                self.game_over = True
+                self._cond.notify_all()
+
+    def _status(self, text):
+        if self.renderer is not None:
+            self.renderer.status(text)
+
+    def _on_state(self, state):
+        with self._cond:
+            self.state = state
+            self.events += 1
+            if state.status == "GAME_OVER":
+                self.game_over = True
+            self._cond.notify_all()
+        if self.renderer is not None:
+            self.renderer.draw(game_lines(state, self.player_name))
+
+    def _on_error(self, message):
+        with self._cond:
+            self.errors.append(message)
+            self.events += 1
+            self._cond.notify_all()
+
+def game_input_loop(session):
+    """Input do jogador: espera os eventos da partida e pergunta a ação
+    quando é a vez dele."""
+    seen = 0
+    wait = True
+    while True:
+        if wait:
+            seen, state = session.wait_event(seen)
+        wait = True
+        if session.game_over:
+            break
+
+        RENDERER.prompt_area()
+        for message in session.errors:
+            # Mostra o erro (ex: "Não é seu turno")
+            print(f"Erro ao fazer jogada: {message}")
+        session.errors.clear()
 
         # --- Lógica de sair da espera ---
-        if current_status == "WAITING":
-            print("\nVocê está esperando um oponente.")
+        if state is not None and state.status == "WAITING":
+            print("Você está esperando um oponente.")
             print("  Digite 'sair' para voltar ao lobby.")
             choice = input("Ação: ").strip().lower()
 
-            # Checa o estado DE NOVO, *depois* do input.
-            # O estado pode ter mudado enquanto o usuário digitava.
-            with STATE_LOCK:
-                new_status = ""
-                if CURRENT_GAME_STATE:
-                    new_status = CURRENT_GAME_STATE.status
-            
-            # Se o estado mudou (ex: de WAITING para IN_GAME),
-            # ignora o input ('choice') e recomeça o loop principal.
-            if new_status != "WAITING":
+            # O estado pode ter mudado enquanto o usuário digitava
+            # (ex: de WAITING para IN_GAME): ignora o input e recomeça
+            if session.state.status != "WAITING":
                 continue
 
             if choice == 'sair':
-                try:
-                    # Envia uma jogada de "desistência"
-                    request = game_pb2.MoveRequest(
-                        room_id=CURRENT_ROOM_ID,
-                        player_id=PLAYER_NAME,
-                        action=game_pb2.QUIT_GAME
-                    )
-                    stub.MakeMove(request)
-                    # O servidor vai processar, fechar o jogo, e o
-                    # stream 'listen_for_updates' vai nos desconectar.
-                    GAME_OVER = True # Força a saída do loop local
-                    break # Sai do game_input_loop
-                except grpc.RpcError as e:
-                    print(f"Erro ao sair da sala: {e.details()}")
-            else:
-                print("Opção inválida.")
-        
-        # --- LÓGICA DE JOGO ORIGINAL ---
-        elif IS_MY_TURN:
-            print("\nEscolha sua ação:")
+                # Envia uma jogada de "desistência"; o servidor fecha o jogo
+                # e o stream nos desconecta
+                error = session.send(game_pb2.QUIT_GAME)
+                if error:
+                    print(f"Erro ao sair da sala: {error}")
+                break
+            print("Opção inválida.")
+            wait = False # Pergunta de novo
+
+        elif session.my_turn:
+            print("Escolha sua ação:")
             print("  1: Atirar no Oponente")
             print("  2: Atirar em Si Mesmo")
             print("  3: Desistir")
             choice = input("Ação (1-3): ")
 
-            action = None
-            if choice == '1':
-                action = game_pb2.SHOOT_OPPONENT
-            elif choice == '2':
-                action = game_pb2.SHOOT_SELF
-            elif choice == '3':
-                action = game_pb2.QUIT_GAME
-            else:
+            action = {'1': game_pb2.SHOOT_OPPONENT, '2': game_pb2.SHOOT_SELF, '3': game_pb2.QUIT_GAME}.get(choice)
+            if action is None:
                 print("Escolha inválida.")
-                continue # Pergunta de novo
-
-            # Envia a jogada (RPC)
-            try:
-                request = game_pb2.MoveRequest(
-                    room_id=CURRENT_ROOM_ID,
-                    player_id=PLAYER_NAME,
-                    action=action
-                )
-                stub.MakeMove(request)
-                # O estado não é atualizado aqui, mas sim pelo stream
-                IS_MY_TURN = False # Previne jogada dupla
-                
-                if action == game_pb2.QUIT_GAME:
-                    GAME_OVER = True
-                    
-            except grpc.RpcError as e:
-                # Mostra o erro (ex: "Não é seu turno")
-                print(f"Erro ao fazer jogada: {e.details()}")
-        
-        # Dorme um pouco para não fritar a CPU
-        time.sleep(0.1)
+                wait = False # Pergunta de novo
+                continue
 
+            # Envia a jogada; o estado novo chega pelo stream
+            error = session.send(action)
+            if error:
+                print(f"Erro ao fazer jogada: {error}")
+                wait = False
+            elif action == game_pb2.QUIT_GAME:
+                break
 
-def main_menu(stub):
+def main_menu(stub, server_address):
     """Menu principal (Lobby)."""
-    global PLAYER_NAME, CURRENT_ROOM_ID, GAME_OVER, IS_MY_TURN
+    global CURRENT_ROOM_ID, SESSION_TOKEN
 
     while True:
         clear_screen()
-        print(f"Bem-vindo, {PLAYER_NAME}! (Servidor: localhost:50051)")
+        print(f"Bem-vindo, {PLAYER_NAME}! (Servidor: {server_address})")
         print("\n--- LOBBY PRINCIPAL ---")
         print("  1: Ver salas disponíveis")
         print("  2: Criar uma sala")
         print("  3: Entrar em uma sala")
-        print("  4: Sair")
+        print("  4: Procurar partida (o servidor escolhe o oponente)")
+        print("  5: Assistir uma partida")
+        print("  6: Sair")
         choice = input("Escolha uma opção: ")
 
         if choice == '1':
             # --- Listar Lobbies ---
+            name_prefix = input("Filtrar pelo nome da sala (Enter para todas): ").strip()
             try:
-                response = stub.GetLobbies(game_pb2.Empty())
-                print("\n--- Salas Ativas ---")
-                if not response.rooms:
-                    print("Nenhuma sala encontrada.")
-                for room in response.rooms:
-                    print(f"  - ID: {room.room_id} | Nome: {room.room_name} | Jogadores: {room.player_count}/2 | Status: {room.status}")
-                input("\nPressione Enter para continuar...")
+                page_token = ""
+                while True:
+                    request = game_pb2.LobbyRequest(page_size=LOBBY_PAGE_SIZE, page_token=page_token, name_prefix=name_prefix)
+                    response = stub.GetLobbies(request, metadata=session_metadata(SESSION_TOKEN))
+                    print("\n--- Salas Esperando Oponente ---")
+                    if not response.rooms:
+                        print("Nenhuma sala encontrada.")
+                    for room in response.rooms:
+                        print(f"  - ID: {room.room_id} | Nome: {room.room_name} | Jogadores: {room.player_count}/2 | Status: {room.status}")
+
+                    # Próxima página (se houver)
+                    page_token = response.next_page_token
+                    if not page_token:
+                        input("\nPressione Enter para continuar...")
+                        break
+                    if input("\nEnter para a próxima página, 'q' para voltar: ").strip().lower() == 'q':
+                        break
             except grpc.RpcError as e:
                 print(f"Erro ao listar salas: {e.details()}")
                 time.sleep(2)
@@ -209,13 +353,15 @@ def main_menu(stub):
             # --- Criar Sala ---
             room_name = input("Digite o nome da sua sala: ")
             try:
-                request = game_pb2.CreateRoomRequest(player_name=PLAYER_NAME, room_name=room_name)
+                request = game_pb2.CreateRoomRequest(player_name=PLAYER_NAME, room_name=room_name,
+                                                     session_token=SESSION_TOKEN)
                 response = stub.CreateRoom(request)
                 CURRENT_ROOM_ID = response.room_id
+                SESSION_TOKEN = response.session_token
                 print(f"Sala '{response.room_name}' (ID: {response.room_id}) criada! Esperando oponente...")
                 
                 # Entra no loop do jogo
-                start_game_threads(stub)
+                start_game_threads(room_stub(stub, response))
                 
             except grpc.RpcError as e:
                 print(f"Erro ao criar sala: {e.details()}")
@@ -225,62 +371,184 @@ def main_menu(stub):
             # --- Entrar na Sala ---
             room_id = input("Digite o ID da sala para entrar: ")
             try:
-                request = game_pb2.JoinRoomRequest(player_name=PLAYER_NAME, room_id=room_id)
+                request = game_pb2.JoinRoomRequest(player_name=PLAYER_NAME, room_id=room_id,
+                                                   session_token=SESSION_TOKEN)
                 response = stub.JoinRoom(request)
                 CURRENT_ROOM_ID = response.room_id
+                SESSION_TOKEN = response.session_token
                 print(f"Você entrou na sala '{response.room_name}'!")
                 
                 # Entra no loop do jogo
-                start_game_threads(stub)
+                start_game_threads(room_stub(stub, response))
 
             except grpc.RpcError as e:
                 print(f"Erro ao entrar na sala: {e.details()}")
                 time.sleep(2)
         
         elif choice == '4':
+            # --- Matchmaking ---
+            room = find_match(stub, PLAYER_NAME, SESSION_TOKEN)
+            if room is not None:
+                CURRENT_ROOM_ID = room.room_id
+                SESSION_TOKEN = room.session_token
+                start_game_threads(room_stub(stub, room))
+
+        elif choice == '5':
+            # --- Espectador ---
+            room_id = input("Digite o ID da sala para assistir: ")
+            watch_game(stub, room_id)
+
+        elif choice == '6':
             print("Até logo!")
             break
         else:
             print("Opção inválida.")
             time.sleep(1)
 
+def find_match(stub, player_name, session_token, quiet=False, timeout=None):
+    """Entra na fila do FindMatch e espera o servidor formar a partida.
+    Retorna o RoomInfo (a sala já tem os dois jogadores; session_token é o
+    token para jogar nela) ou None."""
+    request = game_pb2.MatchRequest(player_name=player_name, session_token=session_token)
+    stream = stub.FindMatch(request, timeout=timeout)
+    try:
+        for update in stream:
+            if update.status == "QUEUED" and not quiet:
+                print("Procurando oponente... (Ctrl+C para cancelar)")
+            elif update.status == "MATCHED":
+                if not quiet:
+                    print(f"Partida encontrada contra {update.opponent_name}! Sala: {update.room.room_id}")
+                return update.room
+    except KeyboardInterrupt:
+        stream.cancel() # Sai da fila
+        print("\nBusca cancelada.")
+    except grpc.RpcError as e:
+        if quiet:
+            return None
+        print(f"Erro no matchmaking: {e.details()}")
+    if not quiet:
+        time.sleep(2)
+    return None
+
+def watch_game(stub, room_id):
+    """Assiste uma sala (WatchGame) até o fim do jogo ou Ctrl+C."""
+    stream = stub.WatchGame(game_pb2.WatchRequest(room_id=room_id), metadata=session_metadata(SESSION_TOKEN))
+    try:
+        for state in stream:
+            RENDERER.draw(game_lines(state, PLAYER_NAME) + ["", "(Assistindo. Ctrl+C para voltar ao lobby)"])
+    except KeyboardInterrupt:
+        stream.cancel()
+    except grpc.RpcError as e:
+        print(f"Erro ao assistir: {e.details()}")
+    RENDERER.prompt_area()
+    input("\nPressione Enter para voltar ao lobby...")
+
 def start_game_threads(stub):
-    """Inicia as duas threads para o jogo (escuta e input)."""
-    global GAME_OVER, IS_MY_TURN
-    # Reseta o estado do jogo
-    GAME_OVER = False
-    IS_MY_TURN = False
-
-    # Thread 1: Escuta o servidor
-    listener_thread = threading.Thread(target=listen_for_updates, args=(stub,), daemon=True)
-    listener_thread.start()
-
-    # Thread 2: Captura input (esta é a thread principal do jogo)
-    game_input_loop(stub)
-    
-    # Quando o jogo acabar (loop de input terminar)
-    # A thread de escuta (listen_for_updates) já imprimiu a mensagem final
-    # de GAME_OVER. Agora, apenas esperamos o usuário confirmar.
-    print("\n==========================================================")
+    """Inicia a partida: a thread de escuta e o loop de input (nesta thread)."""
+    session = GameSession(stub, PLAYER_NAME, CURRENT_ROOM_ID, SESSION_TOKEN, USE_PLAY_STREAM, RENDERER)
+    RENDERER.clear()
+    print(f"Cliente: Conectando ao stream da sala {CURRENT_ROOM_ID} como {PLAYER_NAME}...")
+    session.start()
+
+    game_input_loop(session)
+
+    # A thread de escuta já desenhou o quadro final de GAME_OVER.
+    # Agora, apenas esperamos o usuário confirmar.
+    RENDERER.prompt_area()
     input("Pressione Enter para voltar ao lobby...")
-    
-    # Tenta limpar a thread de escuta (que já deve ter terminado)
-    listener_thread.join(timeout=1)
+    session.close()
+
+# --- Modo bot (headless) ---
+
+def bot_loop(session, rng):
+    """Joga sozinho: a cada evento em que é a sua vez, escolhe uma ação."""
+    seen = 0
+    wait = True
+    while True:
+        if wait:
+            seen, state = session.wait_event(seen)
+        wait = True
+        if session.game_over:
+            return
+        if session.my_turn:
+            error = session.send(rng.choice((game_pb2.SHOOT_OPPONENT, game_pb2.SHOOT_SELF)))
+            if error:
+                # MakeMove falhou (ex: servidor reiniciando): tenta de novo
+                # se ainda for a vez dele quando o stream voltar
+                time.sleep(0.5)
+                wait = False
 
+def run_bot(target, name, args, results, index):
+    # Cada bot tem a própria conexão, como clientes de verdade: sem sessão,
+    # os limites do servidor são por conexão (ver ratelimit.py)
+    with open_channel(target, own_connection=True) as channel:
+        _play_bot(game_pb2_grpc.GameServerStub(channel), name, args, results, index)
+
+def _play_bot(stub, name, args, results, index):
+    rng = random.Random(f"{args.seed}-{name}")
+    played = reconnects = 0
+    token = ""
+    for _ in range(args.matches):
+        room = find_match(stub, name, token, quiet=True, timeout=args.timeout)
+        if room is None:
+            break # Ninguém para parear (ou servidor fora)
+        token = room.session_token
+        session = GameSession(room_stub(stub, room), name, room.room_id, token, args.stream, None)
+        session.start()
+        bot_loop(session, rng)
+        session.close()
+        played += 1
+        reconnects += session.reconnects
+    results[index] = (played, reconnects)
+
+def run_bots(args):
+    """Vários clientes sem tela no mesmo processo, pareados pelo FindMatch."""
+    results = [(0, 0)] * args.bots
+    threads = [
+        threading.Thread(target=run_bot, args=(args.target, f"bot-{os.getpid()}-{i}", args, results, i), daemon=True)
+        for i in range(args.bots)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    played = sum(played for played, _ in results)
+    reconnects = sum(reconnects for _, reconnects in results)
+    print(f"{args.bots} bots: {played} partidas jogadas (contando os dois lados) em {elapsed:.1f}s, "
+          f"{reconnects} reconexões")
 
 def run():
-    global PLAYER_NAME
+    global PLAYER_NAME, USE_PLAY_STREAM, RENDERER
+    parser = argparse.ArgumentParser(description="Cliente do Buckshot Roulette (gRPC)")
+    parser.add_argument("--stream", action="store_true", help="Jogadas e estados no mesmo stream (PlayGame)")
+    parser.add_argument("--target", default="localhost:50051", help="Endereço do servidor")
+    parser.add_argument("--bots", type=int, default=0, help="Roda N bots sem tela (modo headless)")
+    parser.add_argument("--matches", type=int, default=1, help="Partidas por bot")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Espera máxima na fila (bots)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    USE_PLAY_STREAM = args.stream
+
+    if args.bots:
+        RENDERER = None
+        run_bots(args)
+        return
+
+    if os.name == 'nt':
+        os.system('') # Liga as sequências ANSI no console do Windows
     while not PLAYER_NAME:
         PLAYER_NAME = input("Digite seu nome de jogador: ")
 
-    # Altere 'localhost' para o IP do servidor se estiver em máquinas diferentes
-    server_address = 'localhost:50051'
+    # Use --target com o IP do servidor se estiver em máquinas diferentes
+    server_address = args.target
     
-    with grpc.insecure_channel(server_address) as channel:
+    with open_channel(server_address) as channel:
         stub = game_pb2_grpc.GameServerStub(channel)
         print(f"Conectado ao servidor em {server_address}")
         time.sleep(1)
-        main_menu(stub)
+        main_menu(stub, server_address)
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    run()
@@ -0,0 +1,373 @@
+"""Servidor em vários processos: um supervisor, N workers e uma frente.
+
+Um server.py usa no máximo ~um núcleo (GIL), por mais salas que tenha.
+'python cluster.py --workers N' sobe N processos server.py (os workers) e
+divide as salas entre eles com um anel de hash consistente (hashring.py):
+
+- Cada worker só cria room_ids que o anel manda para ele (ver
+  server.owned_room_id) e devolve o próprio endereço em
+  RoomInfo.server_address. Depois de criar, entrar ou parear, o cliente
+  fala direto com o worker da sala (connection.room_stub): as jogadas e os
+  streams não passam pela frente, então a vazão cresce com os núcleos.
+- A frente atende na porta de sempre e repassa cada chamada ao worker dono
+  do room_id (clientes que não conhecem server_address funcionam igual,
+  só com um salto a mais). Os bytes passam sem serem decodificados de novo;
+  só o room_id é lido para rotear. CreateRoom vai para os workers em
+  rodízio, GetLobbies junta as listas de todos e FindMatch manda os
+  jogadores de dois em dois para o mesmo worker, onde a fila do
+  matchmaking os pareia.
+- O supervisor reinicia o worker que cair. Cada worker tem o próprio
+  journal (DATA_DIR/worker-<i>), então as salas dele voltam com ele.
+
+Nomes protegidos e limites por jogador são de cada worker; o token de
+sessão de um vale nos outros (sessions.py). Mudar --workers muda o dono de
+~1/N dos room_ids: as salas que um worker recuperar do journal sem ser
+mais dono delas só são achadas falando direto com ele.
+
+Uso: python cluster.py --workers 4 [--port 50051] [--base-port 50100]
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+
+import grpc
+
+import game_pb2
+import gamelog
+from connection import CHANNEL_OPTIONS, SERVER_OPTIONS
+from hashring import HashRing
+from metrics import REGISTRY, METRICS_PORT, AsyncMetricsInterceptor, start_http_server
+from ratelimit import FORWARDED_METADATA, forwarded_peer
+
+LOG = gamelog.get_logger("cluster")
+
+SERVICE = "game.GameServer"
+DATA_DIR = os.environ.get("GAME_DATA_DIR", "game_data") # Cada worker usa DATA_DIR/worker-<i>
+CHECK_INTERVAL = 1.0 # Segundos entre as verificações dos workers
+RESTART_DELAY = 2.0 # Espera mínima entre dois restarts do mesmo worker
+
+RESTARTS = REGISTRY.counter("cluster_worker_restarts_total", "Workers reiniciados pelo supervisor", ("worker",))
+
+class Supervisor:
+    """Processos dos workers: sobe, reinicia quem cair e para todos."""
+
+    def __init__(self, module, addresses, ports, metrics_port):
+        self.module = module
+        # Os tokens de sessão de um worker valem nos outros (ver sessions.py);
+        # um worker reiniciado recebe o mesmo segredo
+        self.secret = secrets.token_hex(16)
+        self.addresses = addresses
+        self.ports = ports
+        self.metrics_port = metrics_port
+        self.processes = [None] * len(addresses)
+        self._started_at = [0.0] * len(addresses)
+
+    def _spawn(self, index):
+        env = dict(os.environ,
+                   GAME_PORT=str(self.ports[index]),
+                   GAME_METRICS_PORT=str(self.metrics_port + 1 + index),
+                   GAME_DATA_DIR=os.path.join(DATA_DIR, f"worker-{index}"),
+                   GAME_CLUSTER=",".join(self.addresses),
+                   GAME_SERVER_ADDRESS=self.addresses[index],
+                   GAME_CLUSTER_SECRET=self.secret)
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.processes[index] = subprocess.Popen([sys.executable, self.module], cwd=here, env=env)
+        self._started_at[index] = time.monotonic()
+        LOG.info("worker_started", "Worker iniciado", worker=index, address=self.addresses[index],
+                 pid=self.processes[index].pid)
+
+    def start(self):
+        for index in range(len(self.addresses)):
+            self._spawn(index)
+
+    def check(self):
+        # Reinicia os workers que morreram (sem entrar em loop se ele morre na hora)
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process.poll() is None or now - self._started_at[index] < RESTART_DELAY:
+                continue
+            LOG.warning("worker_died", "Worker morreu; reiniciando", worker=index, code=process.returncode)
+            RESTARTS.inc((str(index),))
+            self._spawn(index)
+
+    def stop(self):
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                process.wait()
+
+def next_up(start, count, up):
+    # Primeiro índice a partir de 'start' (em círculo) com up(índice); se
+    # nenhum estiver no ar, o próprio 'start'
+    for offset in range(count):
+        index = (start + offset) % count
+        if up(index):
+            return index
+    return start
+
+class MatchRouter:
+    """Worker de cada FindMatch, para os dois jogadores de uma partida
+    caírem na mesma fila. Guarda, por worker, os jogadores ainda sem par (na
+    fila dele ou a caminho): quem chega vai para um worker com um número
+    ímpar deles, onde alguém espera parceiro; senão, para o próximo do
+    rodízio, onde vai esperar o próximo jogador."""
+
+    def __init__(self, workers):
+        self.unpaired = [set() for _ in range(workers)]
+        self._next = 0
+
+    def assign(self, player_name, up):
+        # Só chamado no event loop da frente, sem lock. 'up(índice)' diz se
+        # o worker está no ar
+        for index, players in enumerate(self.unpaired):
+            if len(players) % 2 and up(index):
+                break
+        else:
+            index = next_up(self._next, len(self.unpaired), up)
+            self._next = (index + 1) % len(self.unpaired)
+        self.unpaired[index].add(player_name)
+        return index
+
+    def matched(self, index, player_name, opponent_name):
+        # Os dois saem juntos: se o MATCHED do oponente ainda não chegou, ele
+        # não pode contar como alguém esperando parceiro
+        self.unpaired[index].discard(player_name)
+        self.unpaired[index].discard(opponent_name)
+
+    def left(self, index, player_name):
+        # Saiu da fila sem parear (desistiu ou o stream falhou)
+        self.unpaired[index].discard(player_name)
+
+def _forward_metadata(context, secret):
+    # Metadata do cliente (ex: session-token para os limites), sem as do
+    # transporte, mais a conexão dele assinada: sem sessão, os limites do
+    # worker são por conexão, e todas chegariam como a da frente
+    metadata = tuple((m.key, m.value) for m in context.invocation_metadata()
+                     if m.key not in ("user-agent", FORWARDED_METADATA) and not m.key.startswith(("grpc-", ":")))
+    return metadata + ((FORWARDED_METADATA, forwarded_peer(context.peer(), secret)),)
+
+async def _abort(context, error):
+    # Devolve ao cliente o erro do worker, com os trailers (ex: grpc-retry-pushback-ms)
+    await context.abort(error.code(), error.details() or "", tuple(error.trailing_metadata() or ()))
+
+class Front:
+    """Frente de roteamento (grpc.aio): repassa os bytes de cada chamada
+    ao worker certo."""
+
+    def __init__(self, addresses, secret):
+        self.addresses = addresses
+        self.secret = secret.encode()
+        self.ring = HashRing(addresses)
+        self.matches = MatchRouter(len(addresses))
+        self._next = 0
+        self._channels = {}
+        self._calls = {}
+
+    def _channel(self, address):
+        channel = self._channels.get(address)
+        if channel is None:
+            channel = self._channels[address] = grpc.aio.insecure_channel(address, options=CHANNEL_OPTIONS)
+        return channel
+
+    def _call(self, address, method, kind):
+        # Multicallable sem (de)serializadores: recebe e devolve bytes
+        key = (address, method)
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = getattr(self._channel(address), kind)(f"/{SERVICE}/{method}")
+        return call
+
+    def _up(self, index):
+        # Um worker que caiu (a última conexão falhou, ex: reiniciando) sai
+        # do rodízio do CreateRoom e do FindMatch até voltar
+        state = self._channel(self.addresses[index]).get_state()
+        return state != grpc.ChannelConnectivity.TRANSIENT_FAILURE
+
+    def _round_robin(self):
+        index = next_up(self._next, len(self.addresses), self._up)
+        self._next = (index + 1) % len(self.addresses)
+        return self.addresses[index]
+
+    def _send(self, address, method, request, context):
+        return self._call(address, method, "unary_unary")(
+            request, metadata=_forward_metadata(context, self.secret), timeout=context.time_remaining())
+
+    async def _unary(self, address, method, request, context):
+        try:
+            return await self._send(address, method, request, context)
+        except grpc.aio.AioRpcError as e:
+            await _abort(context, e)
+
+    async def _stream(self, address, method, kind, request, context):
+        call = self._call(address, method, kind)(request, metadata=_forward_metadata(context, self.secret),
+                                                 timeout=context.time_remaining())
+        try:
+            # Os headers do worker chegam ao cliente antes do primeiro estado
+            # (o GameSession usa isso para saber que a reinscrição deu certo)
+            headers = await call.initial_metadata()
+            if not call.done():
+                await context.send_initial_metadata(tuple(headers or ()))
+            async for response in call:
+                yield response
+        except grpc.aio.AioRpcError as e:
+            await _abort(context, e)
+        finally:
+            call.cancel()
+
+    def _owner(self, request_type, request):
+        return self.ring.owner(request_type.FromString(request).room_id)
+
+    # --- RPCs ---
+
+    async def GetLobbies(self, request, context):
+        try:
+            return await self._lobbies(request, context)
+        except grpc.aio.AioRpcError as e:
+            await _abort(context, e)
+
+    async def _lobbies(self, request, context):
+        lobby = game_pb2.LobbyRequest.FromString(request)
+        if lobby.page_size <= 0:
+            # Sem paginação: as listas de todos (concatenar as mensagens
+            # serializadas junta os 'repeated rooms')
+            pages = await asyncio.gather(*(self._send(address, "GetLobbies", request, context)
+                                           for address in self.addresses))
+            return b"".join(pages)
+        # Paginação: o token da frente é "<worker>:<token do worker>", e as
+        # páginas percorrem os workers em ordem
+        index, _, token = lobby.page_token.partition(":")
+        index = int(index) if index.isdigit() else 0
+        while index < len(self.addresses):
+            lobby.page_token = token
+            page = game_pb2.LobbyList.FromString(
+                await self._send(self.addresses[index], "GetLobbies", lobby.SerializeToString(), context))
+            if page.next_page_token:
+                page.next_page_token = f"{index}:{page.next_page_token}"
+                return page.SerializeToString()
+            index, token = index + 1, ""
+            if page.rooms:
+                if index < len(self.addresses):
+                    page.next_page_token = f"{index}:"
+                return page.SerializeToString()
+        return b""
+
+    async def CreateRoom(self, request, context):
+        return await self._unary(self._round_robin(), "CreateRoom", request, context)
+
+    async def JoinRoom(self, request, context):
+        return await self._unary(self._owner(game_pb2.JoinRoomRequest, request), "JoinRoom", request, context)
+
+    async def MakeMove(self, request, context):
+        return await self._unary(self._owner(game_pb2.MoveRequest, request), "MakeMove", request, context)
+
+    async def FindMatch(self, request, context):
+        player_name = game_pb2.MatchRequest.FromString(request).player_name
+        index = self.matches.assign(player_name, self._up)
+        unpaired = True
+        try:
+            async for response in self._stream(self.addresses[index], "FindMatch", "unary_stream",
+                                               request, context):
+                update = game_pb2.MatchUpdate.FromString(response)
+                if unpaired and update.status == "MATCHED":
+                    self.matches.matched(index, player_name, update.opponent_name)
+                    unpaired = False
+                yield response
+        finally:
+            if unpaired:
+                self.matches.left(index, player_name)
+
+    def _routed_stream(method, request_type):
+        async def handler(self, request, context):
+            address = self._owner(request_type, request)
+            async for response in self._stream(address, method, "unary_stream", request, context):
+                yield response
+        handler.__name__ = method
+        return handler
+
+    SubscribeToGameUpdates = _routed_stream("SubscribeToGameUpdates", game_pb2.SubscribeRequest)
+    StreamGameUpdates = _routed_stream("StreamGameUpdates", game_pb2.SubscribeRequest)
+    WatchGame = _routed_stream("WatchGame", game_pb2.WatchRequest)
+    del _routed_stream
+
+    async def PlayGame(self, requests, context):
+        # Roteado pela primeira mensagem (join); o resto é repassado como chega
+        requests = requests.__aiter__()
+        try:
+            first = await requests.__anext__()
+        except StopAsyncIteration:
+            return
+        address = self.ring.owner(game_pb2.PlayRequest.FromString(first).join.room_id)
+
+        async def upstream():
+            yield first
+            async for request in requests:
+                yield request
+
+        async for response in self._stream(address, "PlayGame", "stream_stream", upstream(), context):
+            yield response
+
+HANDLERS = {
+    "GetLobbies": grpc.unary_unary_rpc_method_handler,
+    "CreateRoom": grpc.unary_unary_rpc_method_handler,
+    "JoinRoom": grpc.unary_unary_rpc_method_handler,
+    "MakeMove": grpc.unary_unary_rpc_method_handler,
+    "FindMatch": grpc.unary_stream_rpc_method_handler,
+    "SubscribeToGameUpdates": grpc.unary_stream_rpc_method_handler,
+    "StreamGameUpdates": grpc.unary_stream_rpc_method_handler,
+    "WatchGame": grpc.unary_stream_rpc_method_handler,
+    "PlayGame": grpc.stream_stream_rpc_method_handler,
+}
+
+async def serve(args):
+    gamelog.configure_from_env()
+    ports = [args.base_port + i for i in range(args.workers)]
+    addresses = [f"{args.host}:{port}" for port in ports]
+    supervisor = Supervisor(args.worker_module, addresses, ports, METRICS_PORT)
+    supervisor.start()
+
+    front = Front(addresses, supervisor.secret)
+    handlers = {name: factory(getattr(front, name)) for name, factory in HANDLERS.items()}
+    server = grpc.aio.server(interceptors=(AsyncMetricsInterceptor(REGISTRY),), options=SERVER_OPTIONS)
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE, handlers),))
+    server.add_insecure_port(f"[::]:{args.port}")
+    await server.start()
+    start_http_server(REGISTRY, METRICS_PORT)
+    LOG.info("cluster_started", "Frente do cluster iniciada", port=args.port, workers=addresses,
+             metrics=f"http://127.0.0.1:{METRICS_PORT}/metrics")
+    # SIGTERM (ex: systemd, docker stop) para a frente e os workers como o Ctrl+C
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    try:
+        while not stopping.is_set():
+            try:
+                await asyncio.wait_for(stopping.wait(), CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                supervisor.check()
+        LOG.info("cluster_stopping", "Cluster parando...")
+    finally:
+        await server.stop(0)
+        supervisor.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=50051, help="Porta da frente")
+    parser.add_argument("--base-port", type=int, default=50100, help="Porta do primeiro worker")
+    parser.add_argument("--host", default="localhost",
+                        help="Host dos workers, como os clientes o alcançam (vai no RoomInfo.server_address)")
+    parser.add_argument("--worker-module", default="server.py", help="server.py ou server_aio.py")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        LOG.info("cluster_stopping", "Cluster parando...")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Conexão do cliente com o servidor: keepalive, retries e reconexão.
+
+- Keepalive: o canal manda pings HTTP/2 a cada KEEPALIVE_TIME_MS, mesmo com
+  o stream parado esperando a vez do oponente, então uma conexão morta
+  (Wi-Fi que caiu, NAT que esqueceu a conexão) é detectada em segundos em
+  vez de deixar o stream pendurado. O servidor precisa aceitar pings nesse
+  ritmo (ver server.SERVER_OPTIONS).
+- Retries: o service config repete sozinho as chamadas idempotentes que
+  falham com UNAVAILABLE ou RESOURCE_EXHAUSTED (respeitando a espera que o
+  servidor pede): GetLobbies e MakeMove (a repetição leva o mesmo sequence,
+  e o servidor devolve o resultado da primeira vez). CreateRoom e
+  JoinRoom não entram: repetir uma chamada que chegou ao servidor criaria
+  outra sala. Timeouts do MakeMove são repetidos pelo GameSession.send, com
+  RETRY_CODES.
+- Reconexão dos streams: o GameSession (client.py) usa Backoff para
+  reinscrever na mesma sala com resume_from_version quando o stream cai
+  com um dos RESUBSCRIBE_CODES.
+- Cluster (cluster.py): room_stub leva as chamadas de uma sala direto ao
+  worker dono dela (RoomInfo.server_address), sem passar pela frente.
+"""
+import json
+import random
+import threading
+import time
+
+import grpc
+
+import game_pb2_grpc
+
+KEEPALIVE_TIME_MS = 20000 # Intervalo entre pings
+KEEPALIVE_TIMEOUT_MS = 5000 # Sem resposta ao ping nesse tempo = conexão morta
+
+SERVICE_CONFIG = {
+    "methodConfig": [{
+        "name": [{"service": "game.GameServer", "method": "GetLobbies"},
+                 {"service": "game.GameServer", "method": "MakeMove"}],
+        "timeout": "5s",
+        "retryPolicy": {
+            "maxAttempts": 4,
+            "initialBackoff": "0.2s",
+            "maxBackoff": "2s",
+            "backoffMultiplier": 2,
+            # RESOURCE_EXHAUSTED: limite do servidor (ratelimit.py), que diz
+            # quanto esperar no trailer grpc-retry-pushback-ms
+            "retryableStatusCodes": ["UNAVAILABLE", "RESOURCE_EXHAUSTED"],
+        },
+    }],
+}
+
+CHANNEL_OPTIONS = (
+    ("grpc.keepalive_time_ms", KEEPALIVE_TIME_MS),
+    ("grpc.keepalive_timeout_ms", KEEPALIVE_TIMEOUT_MS),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0), # Pings mesmo sem dados indo e vindo
+    ("grpc.enable_retries", 1),
+    ("grpc.service_config", json.dumps(SERVICE_CONFIG)),
+    # O canal reconecta sozinho; estes limites valem para o TCP/HTTP2
+    ("grpc.initial_reconnect_backoff_ms", 500),
+    ("grpc.max_reconnect_backoff_ms", 5000),
+)
+
+# Do lado do servidor (server.py e a frente do cluster.py): aceita os pings
+# de keepalive dos clientes. Sem isso o gRPC só tolera um ping a cada 5
+# minutos em conexões sem dados e derruba (GOAWAY "too_many_pings") quem
+# espera a vez num stream parado.
+SERVER_OPTIONS = (
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", 10000),
+    ("grpc.http2.max_ping_strikes", 2),
+)
+
+# Erros de stream que valem uma nova inscrição (queda de rede, servidor
+# reiniciando, cliente lento desconectado pelo servidor)
+RESUBSCRIBE_CODES = frozenset((
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+))
+
+# Erros depois dos quais uma chamada idempotente pode ser repetida
+RETRY_CODES = frozenset((grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED))
+
+def open_channel(target, own_connection=False):
+    options = CHANNEL_OPTIONS
+    if own_connection:
+        # Canais para o mesmo destino dividem a conexão TCP dentro do
+        # processo; este abre a dele (ex: cada bot do client.py --bots)
+        options += (("grpc.use_local_subchannel_pool", 1),)
+    return grpc.insecure_channel(target, options=options)
+
+_ROOM_STUBS = {} # server_address -> stub (um canal por worker, compartilhado)
+_ROOM_STUBS_LOCK = threading.Lock()
+
+def room_stub(stub, info):
+    """Stub para as chamadas da sala do RoomInfo 'info': o do worker dono
+    dela, se o servidor é um cluster; senão o próprio 'stub'."""
+    if not info.server_address:
+        return stub
+    with _ROOM_STUBS_LOCK:
+        direct = _ROOM_STUBS.get(info.server_address)
+        if direct is None:
+            direct = game_pb2_grpc.GameServerStub(open_channel(info.server_address))
+            _ROOM_STUBS[info.server_address] = direct
+        return direct
+
+def session_metadata(session_token):
+    # Sessão de quem chama, para os limites por jogador do servidor (nas RPCs
+    # em que o pedido não leva o token). Sem token, o servidor usa a conexão
+    return (("session-token", session_token),) if session_token else ()
+
+class Backoff:
+    """Espera exponencial com jitter entre tentativas de reconexão.
+
+    next() retorna quantos segundos esperar, ou None depois de 'give_up_after'
+    segundos tentando sem sucesso; reset() depois de uma reconexão que deu
+    certo."""
+
+    def __init__(self, initial=0.5, maximum=10.0, multiplier=2.0, jitter=0.2, give_up_after=120.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.give_up_after = give_up_after
+        self.reset()
+
+    def reset(self):
+        self._delay = self.initial
+        self._failing_since = None
+
+    def next(self):
+        now = time.monotonic()
+        if self._failing_since is None:
+            self._failing_since = now
+        elif now - self._failing_since > self.give_up_after:
+            return None
+        delay = self._delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self._delay = min(self.maximum, self._delay * self.multiplier)
+        return delay
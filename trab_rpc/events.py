@@ -0,0 +1,117 @@
+"""Eventos das jogadas e o GameState v2 (compacto).
+
+O GameRoom registra o que aconteceu em cada versão como um Event (tipo,
+assentos, bala real ou festim, dano) em vez de montar o texto do log dentro
+da jogada. O GameStateV2 leva esse registro, o status em enum e os jogadores
+como assentos (1 e 2); sala e nomes só vão no primeiro estado do stream e
+quando mudam. O texto em português sai de describe(): no servidor, para o
+last_action_log do GameState v1; no cliente v2, localmente (expand).
+"""
+import collections
+import functools
+
+import game_pb2
+
+SCHEMA_V2 = 2 # SubscribeRequest.schema_version que pede o GameStateV2
+
+# O que aconteceu numa versão (game_pb2.GameEvent):
+#   kind: game_pb2.EventKind
+#   actor: assento de quem agiu (1 ou 2)
+#   target: assento de quem levou o tiro (SHOT_FIRED)
+#   live: a bala era real
+#   damage: vidas que o alvo perdeu
+#   game_over: o evento terminou a partida
+Event = collections.namedtuple("Event", ["kind", "actor", "target", "live", "damage", "game_over"],
+                               defaults=(0, False, 0, False))
+
+NOBODY = "Ninguém" # Vencedor de quem desistiu sem oponente
+
+def describe(event, names, bullets, live_bullets, turn, winner):
+    """Texto do log de um Event (o antigo last_action_log do make_move).
+
+    'names' é (player1, player2); 'turn' e 'winner' são nomes. 'bullets' e
+    'live_bullets' são os do estado depois do evento (o pente novo, em
+    GAME_STARTED e CLIP_RELOADED)."""
+    kind, actor, target, live, damage, game_over = event
+    actor_name = names[actor - 1] if actor else ""
+    if kind == game_pb2.PLAYER_JOINED:
+        text = f"{actor_name} entrou na sala. Esperando oponente..."
+    elif kind == game_pb2.GAME_STARTED:
+        text = f"Jogo iniciado! {bullets} balas no pente ({live_bullets} reais). Vez de {turn}."
+    elif kind == game_pb2.CLIP_RELOADED:
+        text = f"Pente vazio. Recarregando! {bullets} balas ({live_bullets} reais)."
+    elif kind == game_pb2.PLAYER_QUIT:
+        text = f"{actor_name} desistiu."
+    elif kind == game_pb2.SHOT_FIRED and target == actor:
+        if live:
+            text = f"{actor_name} atirou em si mesmo... ERA REAL! -{damage} vida. A vez passa."
+        else:
+            text = f"{actor_name} atirou em si mesmo... FESTIM! A vez continua."
+    elif kind == game_pb2.SHOT_FIRED:
+        target_name = names[target - 1]
+        if live:
+            text = f"{actor_name} atirou em {target_name}... ERA REAL! {target_name} perdeu {damage} vida."
+        else:
+            text = f"{actor_name} atirou em {target_name}... FESTIM! Ninguém se feriu."
+    else:
+        text = ""
+    if game_over:
+        text += f" FIM DE JOGO! {winner} venceu!"
+    return text
+
+@functools.lru_cache(maxsize=512)
+def event_field(event):
+    """Bytes de um GameStateV2 só com o campo 'event', para somar aos demais
+    campos. Há poucas centenas de eventos diferentes (tipo x assentos x bala
+    x dano), então cada um é codificado uma vez só."""
+    kind, actor, target, live, damage, game_over = event
+    return game_pb2.GameStateV2(event=game_pb2.GameEvent(
+        kind=kind, actor_seat=actor, target_seat=target, live=live,
+        damage=damage, game_over=game_over)).SerializeToString()
+
+def expand(compact, previous=None):
+    """GameState (v1) equivalente a um GameStateV2, para o cliente desenhar.
+
+    Sala e nomes que não vieram na mensagem são os de 'previous' (o último
+    estado que o cliente montou)."""
+    room_id = compact.room_id or (previous.room_id if previous is not None else "")
+    names = (compact.player1_name or (previous.player1_name if previous is not None else ""),
+             compact.player2_name or (previous.player2_name if previous is not None else ""))
+    status = game_pb2.GameStatus.Name(compact.status)
+    turn = names[compact.turn_seat - 1] if compact.turn_seat else ""
+    if compact.winner_seat:
+        winner = names[compact.winner_seat - 1]
+    else:
+        winner = NOBODY if compact.status == game_pb2.GAME_OVER else ""
+    e = compact.event
+    log = describe((e.kind, e.actor_seat, e.target_seat, e.live, e.damage, e.game_over),
+                   names, compact.bullets_in_clip, compact.live_bullets_in_clip, turn, winner)
+    return game_pb2.GameState(
+        room_id=room_id,
+        status=status,
+        player1_name=names[0],
+        player2_name=names[1],
+        player1_lives=compact.player1_lives,
+        player2_lives=compact.player2_lives,
+        current_turn_player_id=turn,
+        bullets_in_clip=compact.bullets_in_clip,
+        live_bullets_in_clip=compact.live_bullets_in_clip,
+        last_action_log=log,
+        winner_id=winner,
+        version=compact.version,
+    )
+
+def apply_update(update, previous=None):
+    """GameState depois de um GameUpdate do StreamGameUpdates (estado
+    completo, delta sobre 'previous' ou GameStateV2)."""
+    payload = update.WhichOneof("payload")
+    if payload == "compact":
+        return expand(update.compact, previous)
+    if payload == "snapshot":
+        return update.snapshot
+    state = game_pb2.GameState()
+    if previous is not None:
+        state.CopyFrom(previous)
+    for field, value in update.delta.ListFields():
+        setattr(state, field.name, value)
+    return state
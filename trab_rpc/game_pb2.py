@@ -24,33 +24,61 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ngame.proto\x12\x04game\"\x07\n\x05\x45mpty\";\n\x11\x43reateRoomRequest\x12\x13\n\x0bplayer_name\x18\x01 \x01(\t\x12\x11\n\troom_name\x18\x02 \x01(\t\"7\n\x0fJoinRoomRequest\x12\x13\n\x0bplayer_name\x18\x01 \x01(\t\x12\x0f\n\x07room_id\x18\x02 \x01(\t\"T\n\x08RoomInfo\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x11\n\troom_name\x18\x02 \x01(\t\x12\x14\n\x0cplayer_count\x18\x03 \x01(\x05\x12\x0e\n\x06status\x18\x04 \x01(\t\"*\n\tLobbyList\x12\x1d\n\x05rooms\x18\x01 \x03(\x0b\x32\x0e.game.RoomInfo\"6\n\x10SubscribeRequest\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x11\n\tplayer_id\x18\x02 \x01(\t\"U\n\x0bMoveRequest\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x11\n\tplayer_id\x18\x02 \x01(\t\x12\"\n\x06\x61\x63tion\x18\x03 \x01(\x0e\x32\x12.game.PlayerAction\"6\n\x0cMoveResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\"\x89\x02\n\tGameState\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x14\n\x0cplayer1_name\x18\x03 \x01(\t\x12\x14\n\x0cplayer2_name\x18\x04 \x01(\t\x12\x15\n\rplayer1_lives\x18\x05 \x01(\x05\x12\x15\n\rplayer2_lives\x18\x06 \x01(\x05\x12\x1e\n\x16\x63urrent_turn_player_id\x18\x07 \x01(\t\x12\x17\n\x0f\x62ullets_in_clip\x18\x08 \x01(\x05\x12\x1c\n\x14live_bullets_in_clip\x18\t \x01(\x05\x12\x17\n\x0flast_action_log\x18\n \x01(\t\x12\x11\n\twinner_id\x18\x0b \x01(\t*A\n\x0cPlayerAction\x12\x12\n\x0eSHOOT_OPPONENT\x10\x00\x12\x0e\n\nSHOOT_SELF\x10\x01\x12\r\n\tQUIT_GAME\x10\x02\x32\x9a\x02\n\nGameServer\x12*\n\nGetLobbies\x12\x0b.game.Empty\x1a\x0f.game.LobbyList\x12\x35\n\nCreateRoom\x12\x17.game.CreateRoomRequest\x1a\x0e.game.RoomInfo\x12\x31\n\x08JoinRoom\x12\x15.game.JoinRoomRequest\x1a\x0e.game.RoomInfo\x12\x31\n\x08MakeMove\x12\x11.game.MoveRequest\x1a\x12.game.MoveResponse\x12\x43\n\x16SubscribeToGameUpdates\x12\x16.game.SubscribeRequest\x1a\x0f.game.GameState0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ngame.proto\x12\x04game\"\x07\n\x05\x45mpty\"R\n\x11\x43reateRoomRequest\x12\x13\n\x0bplayer_name\x18\x01 \x01(\t\x12\x11\n\troom_name\x18\x02 \x01(\t\x12\x15\n\rsession_token\x18\x03 \x01(\t\"N\n\x0fJoinRoomRequest\x12\x13\n\x0bplayer_name\x18\x01 \x01(\t\x12\x0f\n\x07room_id\x18\x02 \x01(\t\x12\x15\n\rsession_token\x18\x03 \x01(\t\"\x83\x01\n\x08RoomInfo\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x11\n\troom_name\x18\x02 \x01(\t\x12\x14\n\x0cplayer_count\x18\x03 \x01(\x05\x12\x0e\n\x06status\x18\x04 \x01(\t\x12\x15\n\rsession_token\x18\x05 \x01(\t\x12\x16\n\x0eserver_address\x18\x06 \x01(\t\"J\n\x0cLobbyRequest\x12\x11\n\tpage_size\x18\x01 \x01(\x05\x12\x12\n\npage_token\x18\x02 \x01(\t\x12\x13\n\x0bname_prefix\x18\x03 \x01(\t\"C\n\tLobbyList\x12\x1d\n\x05rooms\x18\x01 \x03(\x0b\x32\x0e.game.RoomInfo\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\":\n\x0cMatchRequest\x12\x13\n\x0bplayer_name\x18\x01 \x01(\t\x12\x15\n\rsession_token\x18\x02 \x01(\t\"R\n\x0bMatchUpdate\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x1c\n\x04room\x18\x02 \x01(\x0b\x32\x0e.game.RoomInfo\x12\x15\n\ropponent_name\x18\x03 \x01(\t\"\x82\x01\n\x10SubscribeRequest\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x11\n\tplayer_id\x18\x02 \x01(\t\x12\x15\n\rsession_token\x18\x05 \x01(\t\x12\x1b\n\x13resume_from_version\x18\x03 \x01(\x03\x12\x16\n\x0eschema_version\x18\x04 \x01(\x05\"~\n\x0bMoveRequest\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x11\n\tplayer_id\x18\x02 \x01(\t\x12\"\n\x06\x61\x63tion\x18\x03 \x01(\x0e\x32\x12.game.PlayerAction\x12\x10\n\x08sequence\x18\x04 \x01(\x03\x12\x15\n\rsession_token\x18\x05 \x01(\t\"`\n\x0cMoveResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\x12\x15\n\rstate_version\x18\x03 \x01(\x03\x12\x11\n\tduplicate\x18\x04 \x01(\x08\"6\n\x0cWatchRequest\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x15\n\rdelay_seconds\x18\x02 \x01(\x01\"]\n\x0bPlayRequest\x12&\n\x04join\x18\x01 \x01(\x0b\x32\x16.game.SubscribeRequestH\x00\x12\x1e\n\x04move\x18\x02 \x01(\x0b\x32\x0e.game.PlayMoveH\x00\x42\x06\n\x04kind\"S\n\x08PlayMove\x12\x11\n\taction_id\x18\x01 \x01(\x03\x12\"\n\x06\x61\x63tion\x18\x02 \x01(\x0e\x32\x12.game.PlayerAction\x12\x10\n\x08sequence\x18\x03 \x01(\x03\"p\n\tActionAck\x12\x11\n\taction_id\x18\x01 \x01(\x03\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x15\n\rerror_message\x18\x03 \x01(\t\x12\x15\n\rstate_version\x18\x04 \x01(\x03\x12\x11\n\tduplicate\x18\x05 \x01(\x08\"{\n\tPlayEvent\x12 \n\x05state\x18\x01 \x01(\x0b\x32\x0f.game.GameStateH\x00\x12\x1e\n\x03\x61\x63k\x18\x02 \x01(\x0b\x32\x0f.game.ActionAckH\x00\x12$\n\x07\x63ompact\x18\x03 \x01(\x0b\x32\x11.game.GameStateV2H\x00\x42\x06\n\x04kind\"\x9a\x02\n\tGameState\x12\x0f\n\x07room_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x14\n\x0cplayer1_name\x18\x03 \x01(\t\x12\x14\n\x0cplayer2_name\x18\x04 \x01(\t\x12\x15\n\rplayer1_lives\x18\x05 \x01(\x05\x12\x15\n\rplayer2_lives\x18\x06 \x01(\x05\x12\x1e\n\x16\x63urrent_turn_player_id\x18\x07 \x01(\t\x12\x17\n\x0f\x62ullets_in_clip\x18\x08 \x01(\x05\x12\x1c\n\x14live_bullets_in_clip\x18\t \x01(\x05\x12\x17\n\x0flast_action_log\x18\n \x01(\t\x12\x11\n\twinner_id\x18\x0b \x01(\t\x12\x0f\n\x07version\x18\x0c \x01(\x03\"\xfb\x03\n\x0eGameStateDelta\x12\x0f\n\x07version\x18\x01 \x01(\x03\x12\x13\n\x06status\x18\x02 \x01(\tH\x00\x88\x01\x01\x12\x19\n\x0cplayer1_name\x18\x03 \x01(\tH\x01\x88\x01\x01\x12\x19\n\x0cplayer2_name\x18\x04 \x01(\tH\x02\x88\x01\x01\x12\x1a\n\rplayer1_lives\x18\x05 \x01(\x05H\x03\x88\x01\x01\x12\x1a\n\rplayer2_lives\x18\x06 \x01(\x05H\x04\x88\x01\x01\x12#\n\x16\x63urrent_turn_player_id\x18\x07 \x01(\tH\x05\x88\x01\x01\x12\x1c\n\x0f\x62ullets_in_clip\x18\x08 \x01(\x05H\x06\x88\x01\x01\x12!\n\x14live_bullets_in_clip\x18\t \x01(\x05H\x07\x88\x01\x01\x12\x1c\n\x0flast_action_log\x18\n \x01(\tH\x08\x88\x01\x01\x12\x16\n\twinner_id\x18\x0b \x01(\tH\t\x88\x01\x01\x42\t\n\x07_statusB\x0f\n\r_player1_nameB\x0f\n\r_player2_nameB\x10\n\x0e_player1_livesB\x10\n\x0e_player2_livesB\x19\n\x17_current_turn_player_idB\x12\n\x10_bullets_in_clipB\x17\n\x15_live_bullets_in_clipB\x12\n\x10_last_action_logB\x0c\n\n_winner_id\"\x89\x01\n\nGameUpdate\x12#\n\x08snapshot\x18\x01 \x01(\x0b\x32\x0f.game.GameStateH\x00\x12%\n\x05\x64\x65lta\x18\x02 \x01(\x0b\x32\x14.game.GameStateDeltaH\x00\x12$\n\x07\x63ompact\x18\x03 \x01(\x0b\x32\x11.game.GameStateV2H\x00\x42\t\n\x07payload\"\x84\x01\n\tGameEvent\x12\x1d\n\x04kind\x18\x01 \x01(\x0e\x32\x0f.game.EventKind\x12\x12\n\nactor_seat\x18\x02 \x01(\x05\x12\x13\n\x0btarget_seat\x18\x03 \x01(\x05\x12\x0c\n\x04live\x18\x04 \x01(\x08\x12\x0e\n\x06\x64\x61mage\x18\x05 \x01(\x05\x12\x11\n\tgame_over\x18\x06 \x01(\x08\"\xaa\x02\n\x0bGameStateV2\x12\x0f\n\x07version\x18\x01 \x01(\x03\x12 \n\x06status\x18\x02 \x01(\x0e\x32\x10.game.GameStatus\x12\x15\n\rplayer1_lives\x18\x03 \x01(\x05\x12\x15\n\rplayer2_lives\x18\x04 \x01(\x05\x12\x11\n\tturn_seat\x18\x05 \x01(\x05\x12\x17\n\x0f\x62ullets_in_clip\x18\x06 \x01(\x05\x12\x1c\n\x14live_bullets_in_clip\x18\x07 \x01(\x05\x12\x13\n\x0bwinner_seat\x18\x08 \x01(\x05\x12\x1e\n\x05\x65vent\x18\t \x01(\x0b\x32\x0f.game.GameEvent\x12\x0f\n\x07room_id\x18\n \x01(\t\x12\x14\n\x0cplayer1_name\x18\x0b \x01(\t\x12\x14\n\x0cplayer2_name\x18\x0c \x01(\t*A\n\x0cPlayerAction\x12\x12\n\x0eSHOOT_OPPONENT\x10\x00\x12\x0e\n\nSHOOT_SELF\x10\x01\x12\r\n\tQUIT_GAME\x10\x02*5\n\nGameStatus\x12\x0b\n\x07WAITING\x10\x00\x12\x0b\n\x07IN_GAME\x10\x01\x12\r\n\tGAME_OVER\x10\x02*r\n\tEventKind\x12\x0c\n\x08NO_EVENT\x10\x00\x12\x11\n\rPLAYER_JOINED\x10\x01\x12\x10\n\x0cGAME_STARTED\x10\x02\x12\x11\n\rCLIP_RELOADED\x10\x03\x12\x0e\n\nSHOT_FIRED\x10\x04\x12\x0f\n\x0bPLAYER_QUIT\x10\x05\x32\x80\x04\n\nGameServer\x12\x31\n\nGetLobbies\x12\x12.game.LobbyRequest\x1a\x0f.game.LobbyList\x12\x35\n\nCreateRoom\x12\x17.game.CreateRoomRequest\x1a\x0e.game.RoomInfo\x12\x31\n\x08JoinRoom\x12\x15.game.JoinRoomRequest\x1a\x0e.game.RoomInfo\x12\x34\n\tFindMatch\x12\x12.game.MatchRequest\x1a\x11.game.MatchUpdate0\x01\x12\x31\n\x08MakeMove\x12\x11.game.MoveRequest\x1a\x12.game.MoveResponse\x12\x43\n\x16SubscribeToGameUpdates\x12\x16.game.SubscribeRequest\x1a\x0f.game.GameState0\x01\x12?\n\x11StreamGameUpdates\x12\x16.game.SubscribeRequest\x1a\x10.game.GameUpdate0\x01\x12\x32\n\x08PlayGame\x12\x11.game.PlayRequest\x1a\x0f.game.PlayEvent(\x01\x30\x01\x12\x32\n\tWatchGame\x12\x12.game.WatchRequest\x1a\x0f.game.GameState0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'game_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_PLAYERACTION']._serialized_start=744
-  _globals['_PLAYERACTION']._serialized_end=809
+  _globals['_PLAYERACTION']._serialized_start=2821
+  _globals['_PLAYERACTION']._serialized_end=2886
+  _globals['_GAMESTATUS']._serialized_start=2888
+  _globals['_GAMESTATUS']._serialized_end=2941
+  _globals['_EVENTKIND']._serialized_start=2943
+  _globals['_EVENTKIND']._serialized_end=3057
   _globals['_EMPTY']._serialized_start=20
   _globals['_EMPTY']._serialized_end=27
   _globals['_CREATEROOMREQUEST']._serialized_start=29
-  _globals['_CREATEROOMREQUEST']._serialized_end=88
-  _globals['_JOINROOMREQUEST']._serialized_start=90
-  _globals['_JOINROOMREQUEST']._serialized_end=145
-  _globals['_ROOMINFO']._serialized_start=147
-  _globals['_ROOMINFO']._serialized_end=231
-  _globals['_LOBBYLIST']._serialized_start=233
-  _globals['_LOBBYLIST']._serialized_end=275
-  _globals['_SUBSCRIBEREQUEST']._serialized_start=277
-  _globals['_SUBSCRIBEREQUEST']._serialized_end=331
-  _globals['_MOVEREQUEST']._serialized_start=333
-  _globals['_MOVEREQUEST']._serialized_end=418
-  _globals['_MOVERESPONSE']._serialized_start=420
-  _globals['_MOVERESPONSE']._serialized_end=474
-  _globals['_GAMESTATE']._serialized_start=477
-  _globals['_GAMESTATE']._serialized_end=742
-  _globals['_GAMESERVER']._serialized_start=812
-  _globals['_GAMESERVER']._serialized_end=1094
+  _globals['_CREATEROOMREQUEST']._serialized_end=111
+  _globals['_JOINROOMREQUEST']._serialized_start=113
+  _globals['_JOINROOMREQUEST']._serialized_end=191
+  _globals['_ROOMINFO']._serialized_start=194
+  _globals['_ROOMINFO']._serialized_end=325
+  _globals['_LOBBYREQUEST']._serialized_start=327
+  _globals['_LOBBYREQUEST']._serialized_end=401
+  _globals['_LOBBYLIST']._serialized_start=403
+  _globals['_LOBBYLIST']._serialized_end=470
+  _globals['_MATCHREQUEST']._serialized_start=472
+  _globals['_MATCHREQUEST']._serialized_end=530
+  _globals['_MATCHUPDATE']._serialized_start=532
+  _globals['_MATCHUPDATE']._serialized_end=614
+  _globals['_SUBSCRIBEREQUEST']._serialized_start=617
+  _globals['_SUBSCRIBEREQUEST']._serialized_end=747
+  _globals['_MOVEREQUEST']._serialized_start=749
+  _globals['_MOVEREQUEST']._serialized_end=875
+  _globals['_MOVERESPONSE']._serialized_start=877
+  _globals['_MOVERESPONSE']._serialized_end=973
+  _globals['_WATCHREQUEST']._serialized_start=975
+  _globals['_WATCHREQUEST']._serialized_end=1029
+  _globals['_PLAYREQUEST']._serialized_start=1031
+  _globals['_PLAYREQUEST']._serialized_end=1124
+  _globals['_PLAYMOVE']._serialized_start=1126
+  _globals['_PLAYMOVE']._serialized_end=1209
+  _globals['_ACTIONACK']._serialized_start=1211
+  _globals['_ACTIONACK']._serialized_end=1323
+  _globals['_PLAYEVENT']._serialized_start=1325
+  _globals['_PLAYEVENT']._serialized_end=1448
+  _globals['_GAMESTATE']._serialized_start=1451
+  _globals['_GAMESTATE']._serialized_end=1733
+  _globals['_GAMESTATEDELTA']._serialized_start=1736
+  _globals['_GAMESTATEDELTA']._serialized_end=2243
+  _globals['_GAMEUPDATE']._serialized_start=2246
+  _globals['_GAMEUPDATE']._serialized_end=2383
+  _globals['_GAMEEVENT']._serialized_start=2386
+  _globals['_GAMEEVENT']._serialized_end=2518
+  _globals['_GAMESTATEV2']._serialized_start=2521
+  _globals['_GAMESTATEV2']._serialized_end=2819
+  _globals['_GAMESERVER']._serialized_start=3060
+  _globals['_GAMESERVER']._serialized_end=3572
 # @@protoc_insertion_point(module_scope)
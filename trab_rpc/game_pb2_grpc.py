@@ -38,7 +38,7 @@ class GameServerStub(object):
         """
         self.GetLobbies = channel.unary_unary(
                 '/game.GameServer/GetLobbies',
-                request_serializer=game__pb2.Empty.SerializeToString,
+                request_serializer=game__pb2.LobbyRequest.SerializeToString,
                 response_deserializer=game__pb2.LobbyList.FromString,
                 _registered_method=True)
         self.CreateRoom = channel.unary_unary(
@@ -51,6 +51,11 @@ class GameServerStub(object):
                 request_serializer=game__pb2.JoinRoomRequest.SerializeToString,
                 response_deserializer=game__pb2.RoomInfo.FromString,
                 _registered_method=True)
+        self.FindMatch = channel.unary_stream(
+                '/game.GameServer/FindMatch',
+                request_serializer=game__pb2.MatchRequest.SerializeToString,
+                response_deserializer=game__pb2.MatchUpdate.FromString,
+                _registered_method=True)
         self.MakeMove = channel.unary_unary(
                 '/game.GameServer/MakeMove',
                 request_serializer=game__pb2.MoveRequest.SerializeToString,
@@ -61,6 +66,21 @@ class GameServerStub(object):
                 request_serializer=game__pb2.SubscribeRequest.SerializeToString,
                 response_deserializer=game__pb2.GameState.FromString,
                 _registered_method=True)
+        self.StreamGameUpdates = channel.unary_stream(
+                '/game.GameServer/StreamGameUpdates',
+                request_serializer=game__pb2.SubscribeRequest.SerializeToString,
+                response_deserializer=game__pb2.GameUpdate.FromString,
+                _registered_method=True)
+        self.PlayGame = channel.stream_stream(
+                '/game.GameServer/PlayGame',
+                request_serializer=game__pb2.PlayRequest.SerializeToString,
+                response_deserializer=game__pb2.PlayEvent.FromString,
+                _registered_method=True)
+        self.WatchGame = channel.unary_stream(
+                '/game.GameServer/WatchGame',
+                request_serializer=game__pb2.WatchRequest.SerializeToString,
+                response_deserializer=game__pb2.GameState.FromString,
+                _registered_method=True)
 
 
 class GameServerServicer(object):
@@ -69,7 +89,8 @@ class GameServerServicer(object):
     """
 
     def GetLobbies(self, request, context):
-        """Cliente pede a lista de salas disponíveis
+        """Cliente pede a lista de salas disponíveis (só as que estão esperando
+        oponente), com paginação e filtro opcionais
         """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
@@ -90,6 +111,16 @@ class GameServerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def FindMatch(self, request, context):
+        """Matchmaking: o cliente entra na fila e fica no stream até o servidor
+        formar a partida com outro jogador da fila. O servidor manda QUEUED ao
+        entrar na fila e MATCHED com a sala já criada (os dois já estão nela);
+        depois disso o stream termina. Fechar o stream antes sai da fila.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def MakeMove(self, request, context):
         """--- Funções do Jogo ---
 
@@ -108,12 +139,40 @@ class GameServerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamGameUpdates(self, request, context):
+        """Igual ao SubscribeToGameUpdates, mas depois do primeiro estado completo
+        envia só os campos que mudaram (GameStateDelta)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PlayGame(self, request_iterator, context):
+        """Jogadas e atualizações no MESMO stream: o cliente manda um 'join' e
+        depois suas ações; o servidor manda os GameStates e uma confirmação
+        (ActionAck) para cada ação, com a versão do estado que ela gerou
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchGame(self, request, context):
+        """Espectador: acompanha uma sala sem jogar. Os espectadores da sala
+        compartilham o mesmo stream (um único inscrito na sala), então muitos
+        espectadores não atrasam as jogadas. Um espectador lento pula versões
+        e recebe sempre o estado mais novo; acima de um limite por sala, os
+        novos espectadores recebem no máximo um estado por segundo.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_GameServerServicer_to_server(servicer, server):
     rpc_method_handlers = {
             'GetLobbies': grpc.unary_unary_rpc_method_handler(
                     servicer.GetLobbies,
-                    request_deserializer=game__pb2.Empty.FromString,
+                    request_deserializer=game__pb2.LobbyRequest.FromString,
                     response_serializer=game__pb2.LobbyList.SerializeToString,
             ),
             'CreateRoom': grpc.unary_unary_rpc_method_handler(
@@ -126,6 +185,11 @@ def add_GameServerServicer_to_server(servicer, server):
                     request_deserializer=game__pb2.JoinRoomRequest.FromString,
                     response_serializer=game__pb2.RoomInfo.SerializeToString,
             ),
+            'FindMatch': grpc.unary_stream_rpc_method_handler(
+                    servicer.FindMatch,
+                    request_deserializer=game__pb2.MatchRequest.FromString,
+                    response_serializer=game__pb2.MatchUpdate.SerializeToString,
+            ),
             'MakeMove': grpc.unary_unary_rpc_method_handler(
                     servicer.MakeMove,
                     request_deserializer=game__pb2.MoveRequest.FromString,
@@ -136,6 +200,21 @@ def add_GameServerServicer_to_server(servicer, server):
                     request_deserializer=game__pb2.SubscribeRequest.FromString,
                     response_serializer=game__pb2.GameState.SerializeToString,
             ),
+            'StreamGameUpdates': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamGameUpdates,
+                    request_deserializer=game__pb2.SubscribeRequest.FromString,
+                    response_serializer=game__pb2.GameUpdate.SerializeToString,
+            ),
+            'PlayGame': grpc.stream_stream_rpc_method_handler(
+                    servicer.PlayGame,
+                    request_deserializer=game__pb2.PlayRequest.FromString,
+                    response_serializer=game__pb2.PlayEvent.SerializeToString,
+            ),
+            'WatchGame': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchGame,
+                    request_deserializer=game__pb2.WatchRequest.FromString,
+                    response_serializer=game__pb2.GameState.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'game.GameServer', rpc_method_handlers)
@@ -164,7 +243,7 @@ class GameServer(object):
             request,
             target,
             '/game.GameServer/GetLobbies',
-            game__pb2.Empty.SerializeToString,
+            game__pb2.LobbyRequest.SerializeToString,
             game__pb2.LobbyList.FromString,
             options,
             channel_credentials,
@@ -230,6 +309,33 @@ class GameServer(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def FindMatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/game.GameServer/FindMatch',
+            game__pb2.MatchRequest.SerializeToString,
+            game__pb2.MatchUpdate.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def MakeMove(request,
             target,
@@ -283,3 +389,84 @@ class GameServer(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def StreamGameUpdates(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/game.GameServer/StreamGameUpdates',
+            game__pb2.SubscribeRequest.SerializeToString,
+            game__pb2.GameUpdate.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PlayGame(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/game.GameServer/PlayGame',
+            game__pb2.PlayRequest.SerializeToString,
+            game__pb2.PlayEvent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchGame(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/game.GameServer/WatchGame',
+            game__pb2.WatchRequest.SerializeToString,
+            game__pb2.GameState.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
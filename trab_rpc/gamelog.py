@@ -0,0 +1,193 @@
+"""Logs estruturados do servidor, escritos por uma thread separada.
+
+Cada log é um evento com nome ("broadcast", "room_created", ...) e campos,
+escrito como uma linha JSON. Quem joga nunca espera pelo stdout:
+- o evento vira uma tupla num deque (append sem lock no CPython); a thread
+  de escrita acorda a cada FLUSH_INTERVAL, formata o lote inteiro e faz uma
+  única escrita;
+- com o buffer cheio, o evento é descartado (e contado em
+  game_log_dropped_total) em vez de bloquear;
+- eventos abaixo do nível configurado ou fora da amostragem custam só uma
+  comparação.
+
+Os níveis são os do módulo logging (DEBUG, INFO, ...). Antes de configure(),
+só WARNING ou mais grave é escrito, direto no stderr.
+
+Eventos em SECRET_EVENTS (ex: o conteúdo do pente) só são escritos com
+configure(secrets=True) / GAME_LOG_SECRETS=1, nunca nos logs padrão.
+
+Configuração por variáveis de ambiente (ver configure_from_env):
+  GAME_LOG_LEVEL=INFO
+  GAME_LOG_SAMPLE=broadcast=100,move_rejected=10   (1 a cada N eventos)
+  GAME_LOG_SECRETS=0
+"""
+import atexit
+import collections
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from metrics import REGISTRY
+
+BUFFER_SIZE = 10000 # Eventos esperando a thread de escrita
+FLUSH_INTERVAL = 0.1 # Segundos entre as escritas em lote
+
+# Amostragem padrão: escreve 1 a cada N eventos do tipo
+DEFAULT_SAMPLE_EVERY = {"broadcast": 100, "move_rejected": 10}
+# Eventos que revelam informação secreta do jogo
+SECRET_EVENTS = frozenset({"clip_contents"})
+
+class _Config:
+    level = logging.WARNING
+    sample_every = dict(DEFAULT_SAMPLE_EVERY)
+    secrets = False
+    buffer_size = BUFFER_SIZE
+
+_config = _Config()
+_sample_counters = {}
+_buffer = collections.deque() # (ts, level, logger, event, msg, fields)
+_writer = None
+
+_dropped_lock = threading.Lock()
+_dropped = 0
+
+class EventLogger:
+    """Logger de eventos de um módulo (ex: get_logger("room"))."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def debug(self, event, msg="", **fields):
+        self._log(logging.DEBUG, event, msg, fields)
+
+    def info(self, event, msg="", **fields):
+        self._log(logging.INFO, event, msg, fields)
+
+    def warning(self, event, msg="", **fields):
+        self._log(logging.WARNING, event, msg, fields)
+
+    def error(self, event, msg="", **fields):
+        self._log(logging.ERROR, event, msg, fields)
+
+    def enabled(self, level, event):
+        # Para quem precisa montar campos caros: testa antes de montar
+        if level < _config.level:
+            return False
+        return _config.secrets or event not in SECRET_EVENTS
+
+    def _log(self, level, event, msg, fields):
+        if not self.enabled(level, event):
+            return
+        every = _config.sample_every.get(event)
+        if every and every > 1:
+            # next() de um itertools.count é atômico no CPython
+            counter = _sample_counters.get(event)
+            if counter is None:
+                counter = _sample_counters.setdefault(event, itertools.count())
+            if next(counter) % every:
+                return
+
+        record = (time.time(), level, self.name, event, msg, fields)
+        if _writer is None:
+            # Sem configure(): só chegam aqui WARNING ou mais graves
+            sys.stderr.write(format_record(record) + "\n")
+        elif len(_buffer) < _config.buffer_size:
+            _buffer.append(record)
+        else:
+            _drop()
+
+def _drop():
+    global _dropped
+    with _dropped_lock:
+        _dropped += 1
+
+def get_logger(name):
+    return EventLogger(name)
+
+def format_record(record):
+    # Uma linha JSON por evento
+    ts, level, logger, event, msg, fields = record
+    data = {"ts": round(ts, 6), "level": logging.getLevelName(level), "logger": logger, "event": event}
+    if msg:
+        data["msg"] = msg
+    data.update(fields)
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+class _Writer:
+    """Thread que esvazia o buffer em lotes."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="gamelog-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        lines = []
+        while _buffer:
+            lines.append(format_record(_buffer.popleft()))
+        if lines:
+            try:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            except Exception as e:
+                sys.stderr.write(f"gamelog: erro ao escrever {len(lines)} eventos: {e}\n")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+def configure(level=logging.INFO, sample_every=None, secrets=False, stream=None, buffer_size=BUFFER_SIZE):
+    """Liga a escrita em background. Chamar de novo troca nível, amostragem e
+    segredos; o stream só muda depois de shutdown()."""
+    global _writer
+    if isinstance(level, str):
+        level = logging.getLevelName(level) # "INFO" -> 20
+    _config.level = level
+    _config.sample_every = dict(DEFAULT_SAMPLE_EVERY if sample_every is None else sample_every)
+    _config.secrets = secrets
+    _config.buffer_size = buffer_size
+    _sample_counters.clear()
+
+    if _writer is None:
+        _writer = _Writer(stream or sys.stdout)
+        atexit.register(shutdown)
+
+def configure_from_env(environ=os.environ):
+    sample_every = dict(DEFAULT_SAMPLE_EVERY)
+    for item in environ.get("GAME_LOG_SAMPLE", "").split(","):
+        name, _, every = item.partition("=")
+        if name.strip() and every.strip().isdigit():
+            sample_every[name.strip()] = int(every)
+    configure(
+        level=environ.get("GAME_LOG_LEVEL", "INFO").upper(),
+        sample_every=sample_every,
+        secrets=environ.get("GAME_LOG_SECRETS", "0") == "1",
+    )
+
+def dropped():
+    return _dropped
+
+def shutdown():
+    # Escreve o que ainda está no buffer e para a thread; volta ao padrão
+    # (só WARNING ou mais grave, no stderr)
+    global _writer
+    if _writer is not None:
+        _config.level = logging.WARNING
+        writer, _writer = _writer, None
+        writer.stop()
+        writer.flush() # Eventos que entraram durante o stop
+
+REGISTRY.gauge("game_log_dropped_total", "Eventos de log descartados com o buffer cheio",
+               dropped, kind="counter")
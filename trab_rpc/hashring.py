@@ -0,0 +1,30 @@
+"""Anel de hash consistente: qual worker do cluster é dono de cada sala.
+
+Cada worker ocupa VNODES pontos do anel (hash de "endereço#i"); o dono de
+uma chave é o primeiro ponto depois do hash dela. Com vários pontos por
+worker as salas se dividem quase por igual, e mudar o número de workers só
+muda o dono de ~1/N das chaves. O hash é o blake2b e não o hash() do
+Python, que muda a cada processo (PYTHONHASHSEED): a frente e todos os
+workers precisam chegar no mesmo dono.
+"""
+import bisect
+import hashlib
+
+VNODES = 100 # Pontos de cada worker no anel
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    def __init__(self, nodes, vnodes=VNODES):
+        if not nodes:
+            raise ValueError("O anel precisa de pelo menos um nó")
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key):
+        """Nó dono de 'key' (ex: um room_id)."""
+        index = bisect.bisect(self._hashes, _hash(key))
+        return self._owners[index % len(self._owners)]
@@ -0,0 +1,258 @@
+"""Journal (log append-only em disco) e snapshots das salas.
+
+Cada mudança de uma sala (criação, entrada de jogador, jogada — que inclui
+as recargas do pente) vira um registro com o estado completo da sala depois
+da mudança (GameRoom.dump_state). Como o registro diz "a sala ficou assim",
+reaplicar registros é idempotente e a recuperação não depende de sortear o
+pente de novo.
+
+- record() só coloca o registro numa lista, com um lock curto; a thread do
+  journal grava o lote e faz um único fsync a cada FSYNC_INTERVAL. Uma
+  jogada confirmada ao cliente pode se perder se o processo cair antes do
+  fsync seguinte (no máximo FSYNC_INTERVAL de jogadas).
+- A cada SNAPSHOT_INTERVAL o journal troca de segmento e grava um snapshot
+  de todas as salas. Os segmentos e snapshots anteriores são apagados.
+- recover() carrega o snapshot mais recente e reaplica só os registros
+  depois dele.
+
+Os registros de jogada levam também [jogador, ação], para o replay.py
+auditar as partidas (semente + jogadas) sem o servidor.
+
+Arquivos em 'directory':
+  journal-<seq inicial>.log   uma linha JSON por registro: [seq, tipo, room_id, estado(, [jogador, ação])]
+  snapshot-<seq>.json         cabeçalho {"seq", "rooms"} + uma linha por sala
+"""
+import json
+import os
+import threading
+import time
+
+from gamelog import get_logger
+from metrics import REGISTRY
+
+LOG = get_logger("journal")
+
+FSYNC_INTERVAL = 0.05 # Segundos entre os fsyncs em lote
+SNAPSHOT_INTERVAL = 60.0 # Segundos entre snapshots
+
+RECORDS = REGISTRY.counter("game_journal_records_total", "Registros gravados no journal")
+FSYNC_TIME = REGISTRY.histogram("game_journal_fsync_seconds", "Duracao de cada escrita+fsync em lote")
+SNAPSHOT_TIME = REGISTRY.histogram("game_journal_snapshot_seconds", "Duracao de cada snapshot")
+
+def _segment_name(start_seq):
+    return f"journal-{start_seq:012d}.log"
+
+def _snapshot_name(seq):
+    return f"snapshot-{seq:012d}.json"
+
+def _seq_of(name):
+    return int(name.rsplit("-", 1)[1].split(".", 1)[0])
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class Journal:
+    """Journal de um servidor. Criado desligado: record() não faz nada até
+    start()."""
+
+    def __init__(self, directory, fsync_interval=FSYNC_INTERVAL, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock() # Protege _seq e _pending
+        self._seq = 0
+        self._pending = []
+        self._io_lock = threading.Lock() # Uma escrita/troca de segmento por vez
+        self._file = None
+        self._rooms = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Gravação ---
+
+    def record(self, kind, room, move=None):
+        # Chamado com o lock da sala, logo depois da mudança;
+        # 'move' é (jogador, ação) nos registros de jogada
+        if self._file is None:
+            return
+        state = room.dump_state()
+        with self._lock:
+            self._seq += 1
+            if move is None:
+                self._pending.append((self._seq, kind, room.room_id, state))
+            else:
+                self._pending.append((self._seq, kind, room.room_id, state, move))
+
+    def record_removal(self, room_id):
+        # Listener de RoomLifecycle.removal_listeners
+        if self._file is None:
+            return
+        with self._lock:
+            self._seq += 1
+            self._pending.append((self._seq, "remove", room_id, None))
+
+    def flush(self):
+        # Grava o que está pendente com um único fsync
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            self._write(batch)
+
+    def _write(self, batch):
+        # Chamado com _io_lock
+        if not batch or self._file is None:
+            return
+        start = time.perf_counter()
+        self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        FSYNC_TIME.observe(time.perf_counter() - start)
+        RECORDS.inc(amount=len(batch))
+
+    # --- Snapshots ---
+
+    def snapshot(self):
+        """Troca de segmento e grava o estado de todas as salas.
+
+        O snapshot é "difuso": as salas são copiadas uma a uma enquanto o
+        jogo continua, então algumas já podem estar depois de 'seq'. Como os
+        registros guardam o estado completo, reaplicar os posteriores a
+        'seq' por cima deixa cada sala no estado certo."""
+        start = time.perf_counter()
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                seq = self._seq
+            self._write(batch)
+            self._open_segment(seq + 1)
+
+        path = os.path.join(self.directory, _snapshot_name(seq))
+        count = 0
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            rooms = self._rooms.values()
+            f.write(json.dumps({"seq": seq, "rooms": len(rooms)}) + "\n")
+            for room in rooms:
+                with room.lock:
+                    state = room.dump_state()
+                f.write(json.dumps(state, ensure_ascii=False) + "\n")
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        _fsync_dir(self.directory)
+
+        # Tudo até 'seq' está no snapshot: o resto pode sair
+        for name in os.listdir(self.directory):
+            if ((name.startswith("journal-") and _seq_of(name) <= seq)
+                    or (name.startswith("snapshot-") and name.endswith(".json") and _seq_of(name) < seq)):
+                os.remove(os.path.join(self.directory, name))
+
+        SNAPSHOT_TIME.observe(time.perf_counter() - start)
+        LOG.info("snapshot", "Snapshot gravado", seq=seq, rooms=count)
+        return seq
+
+    def _open_segment(self, start_seq):
+        # Chamado com _io_lock
+        if self._file is not None:
+            self._file.close()
+        self._file = open(os.path.join(self.directory, _segment_name(start_seq)), "a", encoding="utf-8")
+        _fsync_dir(self.directory)
+
+    # --- Thread ---
+
+    def start(self, rooms, last_seq=0, snapshot_now=False):
+        """Começa a gravar depois de 'last_seq' (o último registro recuperado)."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._rooms = rooms
+        self._seq = last_seq
+        with self._io_lock:
+            self._open_segment(last_seq + 1)
+        if snapshot_now:
+            self.snapshot() # Compacta o que acabou de ser recuperado
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.flush()
+                if time.monotonic() >= next_snapshot:
+                    self.snapshot()
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+            except Exception as e:
+                LOG.error("journal_failed", "Erro ao gravar o journal", error=str(e))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+# --- Recuperação ---
+
+def _read_snapshot(path):
+    # Retorna (seq, {room_id: estado}) ou None se o arquivo estiver incompleto
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        states = {}
+        for line in f:
+            state = json.loads(line)
+            states[state[0]] = state
+    if len(states) != header["rooms"]:
+        return None
+    return header["seq"], states
+
+def recover(directory):
+    """Lê o snapshot mais recente e o journal depois dele.
+
+    Retorna (estados, último seq): estados é {room_id: tupla de dump_state}
+    para passar ao GameRoom.restore."""
+    if not os.path.isdir(directory):
+        return {}, 0
+    names = os.listdir(directory)
+
+    seq, states = 0, {}
+    for name in sorted((n for n in names if n.startswith("snapshot-") and n.endswith(".json")), reverse=True):
+        try:
+            loaded = _read_snapshot(os.path.join(directory, name))
+        except (ValueError, KeyError):
+            loaded = None
+        if loaded is not None:
+            seq, states = loaded
+            break
+        LOG.warning("snapshot_invalid", "Snapshot incompleto ignorado", file=name)
+
+    last_seq = seq
+    replayed = 0
+    for name in sorted(n for n in names if n.startswith("journal-")):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record_seq, kind, room_id, state = json.loads(line)[:4]
+                except ValueError:
+                    # Linha cortada pela queda do processo: o resto do segmento não vale
+                    LOG.warning("journal_truncated", "Registro incompleto no journal", file=name)
+                    break
+                if record_seq <= seq:
+                    continue
+                if kind == "remove":
+                    states.pop(room_id, None)
+                else:
+                    states[room_id] = state
+                last_seq = max(last_seq, record_seq)
+                replayed += 1
+
+    LOG.info("recovered", "Salas recuperadas do disco", rooms=len(states), snapshot_seq=seq, replayed=replayed)
+    return states, last_seq
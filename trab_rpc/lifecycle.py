@@ -0,0 +1,166 @@
+import math
+import threading
+import time
+
+from gamelog import get_logger
+
+LOG = get_logger("lifecycle")
+
+class TimerWheel:
+    """Agendador em "roda de tempo" com uma única thread.
+
+    O tempo é dividido em ticks; cada slot da roda guarda os timers que vencem
+    naquele tick (com o número de voltas que ainda faltam, para atrasos
+    maiores que a roda). Agendar é O(1) e a thread só olha um slot por tick,
+    não importa quantas salas existam.
+    """
+
+    def __init__(self, tick=1.0, slots=256):
+        self.tick = tick
+        self._slots = [[] for _ in range(slots)]
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def schedule(self, delay, callback, *args):
+        ticks = max(1, math.ceil(delay / self.tick))
+        with self._lock:
+            slot = (self._cursor + ticks) % len(self._slots)
+            rounds = (ticks - 1) // len(self._slots)
+            self._slots[slot].append([rounds, callback, args])
+
+    def advance(self):
+        # Anda um tick e executa (fora do lock) os timers que venceram
+        with self._lock:
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            due = []
+            pending = []
+            for timer in self._slots[self._cursor]:
+                if timer[0] == 0:
+                    due.append(timer)
+                else:
+                    timer[0] -= 1
+                    pending.append(timer)
+            self._slots[self._cursor] = pending
+
+        for _, callback, args in due:
+            try:
+                callback(*args)
+            except Exception as e:
+                LOG.error("timer_failed", "Erro no timer", callback=callback.__name__, error=str(e))
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+            self.advance()
+            next_tick += self.tick
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="timer-wheel", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+class RoomLifecycle:
+    """Remove do registro as salas que não servem mais para nada.
+
+    - Salas em GAME_OVER expiram depois de 'finished_ttl' segundos (tempo para
+      os clientes receberem o estado final).
+    - Salas sem nenhum inscrito e sem nenhuma jogada (a versão do estado não
+      mudou) durante 'idle_ttl' segundos são recolhidas, como um WAITING cujo
+      host sumiu ou uma partida abandonada.
+    """
+
+    def __init__(self, rooms, finished_ttl=60.0, idle_ttl=300.0, wheel=None):
+        self.rooms = rooms
+        self.finished_ttl = finished_ttl
+        self.idle_ttl = idle_ttl
+        self.wheel = wheel or TimerWheel()
+        # Funções chamadas com o room_id de cada sala removida
+        self.removal_listeners = []
+        # Funções chamadas com o room_id de uma sala ociosa aqui; se alguma
+        # retornar True, a sala está em uso em outro processo e fica
+        # (ver store.SQLiteStore.in_use)
+        self.busy_checks = []
+
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.reaped = 0
+
+    def start(self):
+        self.wheel.start()
+
+    def stop(self):
+        self.wheel.stop()
+
+    def track(self, room):
+        # Chamado com o lock da sala, logo depois de registrá-la
+        room.status_listeners.append(self._on_status)
+        if room.status == "GAME_OVER":
+            self._on_status(room) # Sala recuperada já finalizada
+        else:
+            self.wheel.schedule(self.idle_ttl, self._check_idle, room.room_id, room.version)
+
+    def stats(self):
+        with self._lock:
+            return {"live": len(self.rooms), "expired": self.expired, "reaped": self.reaped}
+
+    def _on_status(self, room):
+        if room.status == "GAME_OVER":
+            self.wheel.schedule(self.finished_ttl, self._expire, room.room_id)
+
+    def _expire(self, room_id):
+        if self.remove(room_id, "expirou"):
+            with self._lock:
+                self.expired += 1
+
+    def _check_idle(self, room_id, seen_version):
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+
+        # Só a decisão fica com o lock da sala: as checagens de outros
+        # processos e os listeners (STORE.in_use e STORE.discard no SQLite)
+        # podem esperar o banco, e quem espera pela sala não pode travar junto
+        if self._in_use(room, seen_version):
+            return
+        if any(check(room_id) for check in self.busy_checks):
+            self.wheel.schedule(self.idle_ttl, self._check_idle, room_id, seen_version)
+            return
+        with room.lock:
+            if self._in_use(room, seen_version):
+                return
+            # Nenhuma jogada ou entrada vale a partir daqui
+            room.closed = True
+
+        if self.remove(room_id, "abandonada"):
+            with self._lock:
+                self.reaped += 1
+
+    def _in_use(self, room, seen_version):
+        # True (e já reagendado, se for o caso) se a sala não está ociosa
+        with room.lock:
+            if room.status == "GAME_OVER":
+                return True # A expiração de sala finalizada já está agendada
+            if room.subscribers or room.version != seen_version:
+                # Sala em uso: olha de novo mais tarde
+                self.wheel.schedule(self.idle_ttl, self._check_idle, room.room_id, room.version)
+                return True
+            return False
+
+    def remove(self, room_id, reason):
+        # Tira a sala do registro e avisa os listeners; False se ela já tinha saído
+        room = self.rooms.remove(room_id)
+        if room is None:
+            return False
+        room.closed = True
+        LOG.info("room_removed", "Sala removida", room_id=room_id, reason=reason)
+        for listener in self.removal_listeners:
+            listener(room_id)
+        return True
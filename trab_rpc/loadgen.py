@@ -0,0 +1,295 @@
+"""Gerador de carga headless para o servidor do jogo.
+
+Cria N salas com dois bots cada (host cria a sala, convidado procura no
+lobby e entra), joga partidas com uma política aleatória ou roteirizada e
+mede:
+- move_to_broadcast: do envio da jogada até o estado resultante chegar no
+  stream de quem jogou;
+- lobby (GetLobbies), join (JoinRoom) e create (CreateRoom).
+
+O resultado (vazão e p50/p95/p99) é gravado em JSON para comparar modos do
+servidor e regressões. Para medir a capacidade do servidor (e não os limites
+por jogador do ratelimit.py), rode o servidor com GAME_RATE_LIMITS=0.
+
+Uso:
+  python loadgen.py --rooms 50 --matches 5 --move-rate 10 --output resultado.json
+  python loadgen.py --mode play --policy script:OOS
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import grpc
+
+# Importa as classes geradas
+import game_pb2
+import game_pb2_grpc
+
+from connection import session_metadata, room_stub
+
+ACTIONS = {"O": game_pb2.SHOOT_OPPONENT, "S": game_pb2.SHOOT_SELF}
+
+class Stats:
+    """Amostras de latência por nome, seguras entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def error(self, name):
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except grpc.RpcError:
+            self.error(name)
+            raise
+        self.record(name, time.perf_counter() - start)
+        return result
+
+def _percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))
+    return sorted_values[index]
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": _percentile(values, 50) * 1000,
+        "p95_ms": _percentile(values, 95) * 1000,
+        "p99_ms": _percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+def make_policy(spec, rng):
+    """'random' ou 'script:<letras>' (O = atirar no oponente, S = em si mesmo)."""
+    if spec == "random":
+        return lambda turn: rng.choice((game_pb2.SHOOT_OPPONENT, game_pb2.SHOOT_SELF))
+    if spec.startswith("script:") and spec[7:] and set(spec[7:]) <= set(ACTIONS):
+        script = [ACTIONS[c] for c in spec[7:]]
+        return lambda turn: script[turn % len(script)]
+    raise ValueError(f"Política inválida: {spec}")
+
+class Bot:
+    """Um jogador: mantém o stream da sala aberto e o último estado recebido."""
+
+    def __init__(self, stub, name, mode, timeout):
+        self.stub = stub
+        self.name = name
+        self.mode = mode
+        self.timeout = timeout
+        self.room_id = None
+        self.session_token = "" # Devolvido pelo CreateRoom/JoinRoom
+        self.state = None
+        self._cond = threading.Condition()
+        self._requests = None # Fila do PlayGame (modo 'play')
+        self._thread = None
+
+    def listen(self, info):
+        self.stub = room_stub(self.stub, info) # Num cluster, direto no worker da sala
+        self.room_id = info.room_id
+        self.session_token = info.session_token
+        self.state = None
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        try:
+            if self.mode == "play":
+                self._requests = queue.Queue()
+                events = self.stub.PlayGame(self._play_requests(self._requests),
+                                            metadata=session_metadata(self.session_token))
+                states = (e.state for e in events if e.WhichOneof("kind") == "state")
+            else:
+                request = game_pb2.SubscribeRequest(room_id=self.room_id, player_id=self.name,
+                                                    session_token=self.session_token)
+                states = self.stub.SubscribeToGameUpdates(request)
+
+            for state in states:
+                with self._cond:
+                    self.state = state
+                    self._cond.notify_all()
+        except grpc.RpcError:
+            pass
+        finally:
+            if self._requests is not None:
+                self._requests.put(None)
+            with self._cond:
+                self._cond.notify_all()
+
+    def _play_requests(self, requests):
+        yield game_pb2.PlayRequest(join=game_pb2.SubscribeRequest(room_id=self.room_id, player_id=self.name,
+                                                                  session_token=self.session_token))
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            yield request
+
+    def wait_for(self, predicate, timeout):
+        # Espera até predicate(state) ser verdadeiro; retorna o estado (ou None)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.state is None or not predicate(self.state):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    return None
+                self._cond.wait(remaining)
+            return self.state
+
+    def move(self, action, action_id):
+        if self.mode == "play":
+            self._requests.put(game_pb2.PlayRequest(move=game_pb2.PlayMove(action_id=action_id, action=action)))
+        else:
+            request = game_pb2.MoveRequest(room_id=self.room_id, player_id=self.name, action=action,
+                                           session_token=self.session_token)
+            self.stub.MakeMove(request, timeout=self.timeout)
+
+    def close(self):
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+def play_room(stub, index, args, stats, stop):
+    rng = random.Random(args.seed + index)
+    policy = make_policy(args.policy, rng)
+    interval = 1.0 / args.move_rate if args.move_rate > 0 else 0.0
+    counts = {"moves": 0, "matches": 0}
+
+    for match in range(args.matches):
+        if stop.is_set():
+            break
+        # Nomes únicos por execução: os de uma execução anterior ainda são das
+        # sessões dela enquanto as salas não expiram (ver sessions.py)
+        host = Bot(stub, f"bot{os.getpid()}-{index}-{match}-a", args.mode, args.timeout)
+        guest = Bot(stub, f"bot{os.getpid()}-{index}-{match}-b", args.mode, args.timeout)
+        try:
+            room_name = f"load-{index}-{match}"
+            info = stats.timed("create", stub.CreateRoom,
+                               game_pb2.CreateRoomRequest(player_name=host.name, room_name=room_name),
+                               timeout=args.timeout)
+            host.listen(info)
+            # O convidado procura a sala no lobby, como um cliente de verdade
+            stats.timed("lobby", stub.GetLobbies, game_pb2.LobbyRequest(page_size=10, name_prefix=room_name),
+                        timeout=args.timeout, metadata=session_metadata(guest.session_token))
+            joined = stats.timed("join", room_stub(stub, info).JoinRoom,
+                                 game_pb2.JoinRoomRequest(player_name=guest.name, room_id=info.room_id),
+                                 timeout=args.timeout)
+            guest.listen(joined)
+            bots = {host.name: host, guest.name: guest}
+
+            turn = 0
+            state = host.wait_for(lambda s: s.status != "WAITING", args.timeout)
+            while state is not None and state.status == "IN_GAME" and not stop.is_set():
+                mover = bots[state.current_turn_player_id]
+                # O stream do jogador da vez precisa estar em dia antes de medir
+                current = mover.wait_for(lambda s: s.version >= state.version, args.timeout)
+                if current is None:
+                    stats.error("move")
+                    break
+
+                started = time.perf_counter()
+                try:
+                    mover.move(policy(turn), turn + 1)
+                except grpc.RpcError:
+                    stats.error("move")
+                    break
+                state = mover.wait_for(lambda s: s.version > current.version, args.timeout)
+                if state is None:
+                    stats.error("move")
+                    break
+                stats.record("move_to_broadcast", time.perf_counter() - started)
+                counts["moves"] += 1
+                turn += 1
+
+                if interval:
+                    time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+            if state is not None and state.status == "GAME_OVER":
+                counts["matches"] += 1
+        except grpc.RpcError:
+            pass # Já contado em stats.errors
+        finally:
+            host.close()
+            guest.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="localhost:50051")
+    parser.add_argument("--rooms", type=int, default=20, help="Salas jogando ao mesmo tempo")
+    parser.add_argument("--matches", type=int, default=3, help="Partidas seguidas por sala")
+    parser.add_argument("--move-rate", type=float, default=0.0, help="Jogadas/s por sala (0 = sem limite)")
+    parser.add_argument("--policy", default="random", help="'random' ou 'script:OOS...'")
+    parser.add_argument("--mode", choices=("unary", "play"), default="unary",
+                        help="unary = MakeMove + SubscribeToGameUpdates; play = PlayGame")
+    parser.add_argument("--channels", type=int, default=4, help="Canais gRPC compartilhados pelos bots")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=0.0, help="Para depois de N segundos (0 = sem limite)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadgen_result.json")
+    args = parser.parse_args()
+    make_policy(args.policy, random.Random()) # Valida antes de começar
+
+    channels = [grpc.insecure_channel(args.target) for _ in range(args.channels)]
+    stubs = [game_pb2_grpc.GameServerStub(channel) for channel in channels]
+    stats = Stats()
+    stop = threading.Event()
+    results = [None] * args.rooms
+
+    def worker(i):
+        results[i] = play_room(stubs[i % len(stubs)], i, args, stats, stop)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.rooms)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    if args.duration:
+        stop.wait(args.duration)
+        stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    moves = sum(r["moves"] for r in results if r)
+    matches = sum(r["matches"] for r in results if r)
+    report = {
+        "config": vars(args),
+        "elapsed_s": elapsed,
+        "moves": moves,
+        "matches": matches,
+        "moves_per_s": moves / elapsed if elapsed else 0.0,
+        "errors": stats.errors,
+        "latency": {name: summarize(values) for name, values in stats.samples.items()},
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{moves} jogadas, {matches} partidas em {elapsed:.1f}s ({report['moves_per_s']:.0f} jogadas/s)")
+    for name, summary in sorted(report["latency"].items()):
+        if summary["count"]:
+            print(f"  {name:<18} n={summary['count']:<6} p50={summary['p50_ms']:.2f}ms "
+                  f"p95={summary['p95_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms")
+    if stats.errors:
+        print(f"  erros: {stats.errors}")
+    print(f"Resultado salvo em {args.output}")
+
+    for channel in channels:
+        channel.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import bisect
+import threading
+
+# Importa as classes geradas
+import game_pb2
+
+MAX_PAGE_SIZE = 100 # Limite de salas por página pedido pelo cliente
+MAX_CACHED_QUERIES = 256 # Quantas respostas diferentes ficam em cache por versão
+
+class LobbyIndex:
+    """Índice das salas em que ainda dá para entrar (status WAITING).
+
+    O GameRoom avisa o índice quando muda de status (ver
+    GameRoom.status_listeners), então o GetLobbies não precisa percorrer
+    todas as salas do servidor. As respostas já serializadas (LobbyList) ficam
+    em cache até o índice mudar.
+
+    A paginação segue a ordem de entrada no índice; o page_token é o número
+    de sequência da última sala da página anterior.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {} # room_id -> (seq, RoomInfo)
+        self._next_seq = 1
+        self._version = 0
+
+        # Reconstruídos só quando o índice muda (ver _ordered)
+        self._ordered_version = -1
+        self._seqs = []  # seqs em ordem crescente
+        self._infos = [] # RoomInfo na mesma ordem de _seqs
+        self._cache = {} # (page_size, page_token, name_prefix) -> bytes do LobbyList
+
+    def update(self, room):
+        # Listener de status do GameRoom
+        if room.status == "WAITING":
+            self.add(room)
+        else:
+            self.discard(room.room_id)
+
+    def add(self, room):
+        info = game_pb2.RoomInfo(
+            room_id=room.room_id,
+            room_name=room.room_name,
+            player_count=room.player_count,
+            status=room.status,
+        )
+        with self._lock:
+            entry = self._entries.get(room.room_id)
+            seq = entry[0] if entry else self._next_seq
+            if not entry:
+                self._next_seq += 1
+            self._entries[room.room_id] = (seq, info)
+            self._changed()
+
+    def discard(self, room_id):
+        with self._lock:
+            if self._entries.pop(room_id, None) is not None:
+                self._changed()
+
+    def _changed(self):
+        # Chamado com o lock: invalida as respostas em cache
+        self._version += 1
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _ordered(self):
+        # Chamado com o lock. Como os seqs só crescem, a ordem de inserção
+        # no dict já é a ordem de seq.
+        if self._ordered_version != self._version:
+            entries = list(self._entries.values())
+            self._seqs = [seq for seq, _ in entries]
+            self._infos = [info for _, info in entries]
+            self._ordered_version = self._version
+        return self._seqs, self._infos
+
+    def query(self, page_size=0, page_token="", name_prefix=""):
+        """Retorna os bytes de um LobbyList.
+
+        page_size 0 devolve todas as salas (compatível com o GetLobbies antigo).
+        """
+        page_size = min(page_size, MAX_PAGE_SIZE) if page_size > 0 else 0
+        key = (page_size, page_token, name_prefix)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+            seqs, infos = self._ordered()
+            after = int(page_token) if page_token.isdigit() else 0
+            start = bisect.bisect_right(seqs, after)
+
+            rooms = []
+            next_token = ""
+            for i in range(start, len(infos)):
+                if name_prefix and not infos[i].room_name.startswith(name_prefix):
+                    continue
+                if page_size and len(rooms) == page_size:
+                    # Ainda há salas depois desta página
+                    next_token = str(seqs[i - 1])
+                    break
+                rooms.append(infos[i])
+
+            data = game_pb2.LobbyList(rooms=rooms, next_page_token=next_token).SerializeToString()
+            if len(self._cache) < MAX_CACHED_QUERIES:
+                self._cache[key] = data
+            return data
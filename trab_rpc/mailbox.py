@@ -0,0 +1,87 @@
+"""Caixa de entrada limitada dos inscritos (base de server.Subscriber e
+server_aio.AsyncSubscriber).
+
+Por padrão a caixa entrega todas as versões, cada uma com o seu delta e o
+seu evento (os clientes v2 e quem volta com resume_from_version dependem
+disso). Só quem recebe apenas snapshots completos (o SubscribeToGameUpdates
+v1) usa SNAPSHOT_POLICY:
+- coalesce: se o último item ainda não enviado é um estado, o novo estado
+  toma o lugar dele (como snapshot completo, já que o delta dependeria da
+  versão descartada). Acks do PlayGame nunca são descartados nem pulados,
+  então a ordem estado -> ack continua valendo;
+- capacity: limite de itens na caixa; estourar desconecta o inscrito;
+- lag_budget: segundos que a caixa pode ficar com itens sem o stream
+  consumir nenhum; passar disso também desconecta.
+
+Ao desconectar, os itens pendentes são liberados na hora e push() lança
+SlowConsumer; o GameRoom trata isso removendo o inscrito. O stream termina
+com RESOURCE_EXHAUSTED e o cliente pode voltar com resume_from_version.
+"""
+import collections
+import time
+
+from metrics import REGISTRY
+from room import StateUpdate
+
+MailboxPolicy = collections.namedtuple("MailboxPolicy", ["capacity", "coalesce", "lag_budget"])
+
+DEFAULT_POLICY = MailboxPolicy(capacity=256, coalesce=False, lag_budget=30.0)
+SNAPSHOT_POLICY = DEFAULT_POLICY._replace(coalesce=True) # Streams que só mandam o estado completo
+
+COALESCED = REGISTRY.counter(
+    "game_mailbox_coalesced_total", "Estados substituidos por um mais novo antes do envio")
+DROPPED = REGISTRY.counter(
+    "game_mailbox_dropped_total", "Itens descartados ao desconectar inscritos lentos")
+DISCONNECTS = REGISTRY.counter(
+    "game_mailbox_disconnects_total", "Inscritos lentos desconectados", ("reason",))
+
+class SlowConsumer(Exception):
+    pass
+
+class Mailbox:
+    """Política da caixa; a sincronização fica com as subclasses, que chamam
+    _offer/_took com o seu lock (ou no event loop)."""
+
+    def __init__(self, policy=None):
+        self.policy = policy or DEFAULT_POLICY
+        self.items = collections.deque() # StateUpdates (ou bytes prontos) ainda não enviados
+        self.closed = False
+        self.close_reason = None # Motivo, quando a caixa foi fechada por lentidão
+        self._waiting_since = 0.0 # Última vez que a caixa ficou não vazia ou o stream consumiu
+
+    def _offer(self, update):
+        if self.closed:
+            if self.close_reason:
+                raise SlowConsumer(self.close_reason)
+            return # Cliente já desconectou; o stream remove a inscrição
+
+        items = self.items
+        if items:
+            if time.monotonic() - self._waiting_since > self.policy.lag_budget:
+                self._disconnect("lag", f"sem consumir há mais de {self.policy.lag_budget:g}s")
+            if (self.policy.coalesce and isinstance(update, StateUpdate)
+                    and isinstance(items[-1], StateUpdate)):
+                items[-1] = update._replace(delta=None)
+                COALESCED.inc()
+                return
+            if len(items) >= self.policy.capacity:
+                self._disconnect("capacity", f"mais de {self.policy.capacity} itens pendentes")
+        else:
+            self._waiting_since = time.monotonic()
+        items.append(update)
+
+    def _took(self):
+        # O stream consumiu um item: o atraso conta a partir de agora
+        self._waiting_since = time.monotonic()
+
+    def _disconnect(self, reason, details):
+        self.closed = True
+        self.close_reason = f"Cliente lento: {details}"
+        DROPPED.inc(amount=len(self.items))
+        DISCONNECTS.inc((reason,))
+        self.items.clear()
+        self._wake()
+        raise SlowConsumer(self.close_reason)
+
+    def _wake(self):
+        pass # As subclasses acordam o stream que espera em get()
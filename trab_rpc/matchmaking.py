@@ -0,0 +1,100 @@
+import collections
+import threading
+import time
+
+# Importa as classes geradas
+import game_pb2
+
+from metrics import REGISTRY
+
+# Espera na fila: de instantânea (fila cheia) a minutos (horário vazio)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+WAIT_TIME = REGISTRY.histogram(
+    "game_matchmaking_wait_seconds", "Tempo na fila do FindMatch ate a partida ser formada",
+    buckets=WAIT_BUCKETS)
+MATCHES = REGISTRY.counter("game_matchmaking_matches_total", "Partidas formadas pelo FindMatch")
+CANCELLED = REGISTRY.counter(
+    "game_matchmaking_cancelled_total", "Jogadores que sairam da fila antes de formar partida")
+
+class Ticket:
+    """Um jogador na fila. 'subscriber' é a caixa de entrada do stream do
+    FindMatch (server.Subscriber ou server_aio.AsyncSubscriber), que recebe o
+    MatchUpdate(MATCHED) já serializado. 'session_token' é o que o jogador
+    mandou; create_room troca pelo token da sessão dele na sala nova."""
+
+    __slots__ = ("player_name", "subscriber", "session_token", "enqueued_at", "room_id")
+
+    def __init__(self, player_name, subscriber, session_token=""):
+        self.player_name = player_name
+        self.subscriber = subscriber
+        self.session_token = session_token
+        self.enqueued_at = time.monotonic()
+        self.room_id = None # Preenchido quando a partida é formada
+
+class MatchQueue:
+    """Fila do FindMatch: pareia por ordem de chegada.
+
+    Os jogadores esperando ficam num OrderedDict (nome -> Ticket): entrar,
+    sair e parear com quem espera há mais tempo são O(1). Quem chega com a
+    fila vazia espera; quem chega com alguém esperando forma a partida na
+    hora, com 'create_room(host, convidado)' (os Tickets), que devolve a sala
+    já com os dois jogadores (ver server.create_match_room).
+    """
+
+    def __init__(self, create_room, server_address=""):
+        self._create_room = create_room
+        self._server_address = server_address # RoomInfo.server_address das partidas
+        self._lock = threading.Lock()
+        self._waiting = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._waiting)
+
+    def enqueue(self, player_name, subscriber, session_token=""):
+        """Entra na fila ou forma a partida; retorna o Ticket (room_id já
+        preenchido se pareou na hora). ValueError se o nome já está na fila."""
+        ticket = Ticket(player_name, subscriber, session_token)
+        with self._lock:
+            if player_name in self._waiting:
+                raise ValueError(f"{player_name} já está na fila")
+            opponent = None
+            while self._waiting:
+                _, waiting = self._waiting.popitem(last=False)
+                if not waiting.subscriber.closed:
+                    opponent = waiting
+                    break
+                CANCELLED.inc() # Desconectou e o stream ainda não tirou da fila
+            if opponent is None:
+                self._waiting[player_name] = ticket
+                return ticket
+
+        try:
+            room = self._create_room(opponent, ticket)
+        except Exception:
+            # Devolve o oponente para o começo da fila
+            with self._lock:
+                self._waiting[opponent.player_name] = opponent
+                self._waiting.move_to_end(opponent.player_name, last=False)
+            raise
+        self._notify(room, opponent, ticket)
+        return ticket
+
+    def cancel(self, ticket):
+        # Tira da fila quem desistiu (não faz nada se já pareou)
+        with self._lock:
+            if self._waiting.get(ticket.player_name) is ticket:
+                del self._waiting[ticket.player_name]
+                CANCELLED.inc()
+
+    def _notify(self, room, host, guest):
+        now = time.monotonic()
+        for ticket, other in ((host, guest), (guest, host)):
+            info = game_pb2.RoomInfo(room_id=room.room_id, room_name=room.room_name, player_count=room.player_count,
+                                     status=room.status, session_token=ticket.session_token,
+                                     server_address=self._server_address)
+            ticket.room_id = room.room_id
+            WAIT_TIME.observe(now - ticket.enqueued_at)
+            update = game_pb2.MatchUpdate(status="MATCHED", room=info, opponent_name=other.player_name)
+            ticket.subscriber.push(update.SerializeToString())
+        MATCHES.inc()
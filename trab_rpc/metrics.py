@@ -0,0 +1,382 @@
+"""Métricas do servidor em memória, expostas no formato texto do Prometheus.
+
+- MetricsRegistry guarda contadores, histogramas e gauges calculados na hora
+  da coleta (funções chamadas a cada GET /metrics).
+- MetricsInterceptor / AsyncMetricsInterceptor medem a latência e o código
+  de status de cada RPC (para streams, a duração do stream inteiro).
+- TimedLock embrulha um Lock/RLock e registra quanto tempo as threads
+  esperaram por ele.
+
+Uso: curl http://127.0.0.1:9464/metrics
+"""
+import asyncio
+import bisect
+import http.server
+import math
+import os
+import threading
+import time
+
+import grpc
+
+METRICS_PORT = int(os.environ.get("GAME_METRICS_PORT", "9464")) # Um por processo (ver store.py)
+
+# Limites (em segundos) dos buckets dos histogramas
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 60.0)
+LOCK_WAIT_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 0.001, 0.005, 0.01, 0.05, 0.1, 1.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {} # tupla de labels -> valor
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        lines = self.header()
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # tupla de labels -> [contagem por bucket..., +Inf, soma]
+
+    def observe(self, value, labels=()):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        names = self.labelnames + ("le",)
+        lines = self.header()
+        for labels, values in series:
+            # O formato do Prometheus usa contagens acumuladas
+            total = 0
+            for bound, count in zip(self.buckets + (math.inf,), values):
+                total += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(float(bound)),))} {total}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{label_text} {total}")
+        return lines
+
+class Callback(_Metric):
+    """Valor calculado na coleta: fn() retorna um número ou, com labels, um
+    dict {tupla de labels: número}."""
+
+    def __init__(self, name, help_text, fn, labelnames=(), kind="gauge"):
+        super().__init__(name, help_text, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self):
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = self.header()
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Collector:
+    """Várias gauges calculadas juntas: fn() roda uma vez por coleta e
+    retorna {nome: número}, então os valores saem da mesma leitura (e o
+    trabalho de calcular não se repete para cada gauge)."""
+
+    def __init__(self, fn, gauges):
+        self.fn = fn
+        self.gauges = tuple(gauges) # (nome, ajuda)
+        self.name = self.gauges[0][0]
+
+    def render(self):
+        values = self.fn()
+        lines = []
+        for name, help_text in self.gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_value(values[name])}"]
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise KeyError(f"Métrica {metric.name} já existe")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn, labelnames=(), kind="gauge"):
+        return self._register(Callback(name, help_text, fn, labelnames, kind))
+
+    def collector(self, fn, gauges):
+        """Registra as gauges [(nome, ajuda)] de um Collector."""
+        collector = Collector(fn, gauges)
+        with self._lock:
+            for name, _ in collector.gauges:
+                if name in self._metrics:
+                    raise KeyError(f"Métrica {name} já existe")
+            self._metrics[collector.name] = collector
+        return collector
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# Erro ao coletar {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+# Registro global: cada módulo cria as suas métricas nele
+REGISTRY = MetricsRegistry()
+
+class TimedLock:
+    """Lock (ou RLock) que mede a espera de quem não conseguiu pegá-lo de
+    primeira. A aquisição sem disputa não mede nada, então o caminho comum
+    custa só uma tentativa não bloqueante."""
+
+    __slots__ = ("_lock", "_wait")
+
+    def __init__(self, lock, wait_histogram):
+        self._lock = lock
+        self._wait = wait_histogram
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        self._wait.observe(time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+# --- RPCs ---
+
+def method_name(handler_call_details):
+    # "/game.GameServer/MakeMove" -> "MakeMove"
+    return handler_call_details.method.rsplit("/", 1)[-1]
+
+def _code_name(code):
+    if code is None:
+        return "OK"
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    for status in grpc.StatusCode: # O grpc.aio pode devolver o código como int
+        if status.value[0] == code:
+            return status.name
+    return str(code)
+
+class _RpcMetrics:
+    def __init__(self, registry):
+        self.latency = registry.histogram(
+            "grpc_server_handling_seconds",
+            "Duracao das RPCs (streams: do inicio ao fim do stream)", ("method",))
+        self.handled = registry.counter(
+            "grpc_server_handled_total", "RPCs terminadas, por codigo de status", ("method", "code"))
+
+    def record(self, method, start, code):
+        self.latency.observe(time.perf_counter() - start, (method,))
+        self.handled.inc((method, code))
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Interceptor do grpc.server (com threads)."""
+
+    def __init__(self, registry=REGISTRY):
+        self._metrics = _RpcMetrics(registry)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        record = self._metrics.record
+
+        def finish(start, context, failed):
+            code = context.code()
+            if code is None and failed:
+                code = grpc.StatusCode.UNKNOWN
+            elif code is None and not context.is_active():
+                code = grpc.StatusCode.CANCELLED
+            record(method, start, _code_name(code))
+
+        def unary(behavior):
+            def wrapper(request, context):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    response = behavior(request, context)
+                    failed = False
+                    return response
+                finally:
+                    finish(start, context, failed)
+            return wrapper
+
+        def streaming(behavior):
+            def wrapper(request, context):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    yield from behavior(request, context)
+                    failed = False
+                except GeneratorExit:
+                    failed = False # O gRPC fechou o stream (cliente cancelou)
+                    raise
+                finally:
+                    finish(start, context, failed)
+            return wrapper
+
+        return wrap_handler(handler, unary, streaming)
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """Interceptor do grpc.aio.server; os handlers precisam ser 'async def'
+    (como os do AsyncGameServerImpl)."""
+
+    def __init__(self, registry=REGISTRY):
+        self._metrics = _RpcMetrics(registry)
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        record = self._metrics.record
+
+        def finish(start, context, code):
+            record(method, start, _code_name(context.code() or code))
+
+        def unary(behavior):
+            async def wrapper(request, context):
+                start = time.perf_counter()
+                code = grpc.StatusCode.UNKNOWN
+                try:
+                    response = await behavior(request, context)
+                    code = None
+                    return response
+                except asyncio.CancelledError:
+                    code = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    finish(start, context, code)
+            return wrapper
+
+        def streaming(behavior):
+            async def wrapper(request, context):
+                start = time.perf_counter()
+                code = grpc.StatusCode.UNKNOWN
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                    code = None
+                except (asyncio.CancelledError, GeneratorExit):
+                    code = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    finish(start, context, code)
+            return wrapper
+
+        return wrap_handler(handler, unary, streaming)
+
+def wrap_handler(handler, unary, streaming):
+    # Troca o comportamento do RpcMethodHandler pela versão embrulhada
+    # (também usado pelos interceptors do ratelimit.py)
+    if handler.unary_unary:
+        return handler._replace(unary_unary=unary(handler.unary_unary))
+    if handler.stream_unary:
+        return handler._replace(stream_unary=unary(handler.stream_unary))
+    if handler.unary_stream:
+        return handler._replace(unary_stream=streaming(handler.unary_stream))
+    return handler._replace(stream_stream=streaming(handler.stream_stream))
+
+# --- HTTP ---
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Sem uma linha de log por coleta
+
+def start_http_server(registry=REGISTRY, port=METRICS_PORT, host="127.0.0.1"):
+    """Serve GET /metrics numa thread separada; retorna o HTTPServer."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    httpd = http.server.ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return httpd
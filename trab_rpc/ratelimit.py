@@ -0,0 +1,288 @@
+"""Controle de admissão do servidor: limites por jogador e teto de streams.
+
+- Cada (método, quem chama) tem um token bucket (METHOD_LIMITS: taxa por
+  segundo e rajada). Quem chama é a sessão do session_token, se o servidor
+  a conhece (o token vem do pedido ou, nas RPCs cujo pedido não o tem, como
+  GetLobbies, WatchGame e PlayGame, do metadata 'session-token'); sem uma
+  sessão válida, a conexão do cliente (context.peer(), ou a que a frente do
+  cluster.py repassa no metadata 'forwarded-peer', assinada com o segredo
+  do cluster). Nunca um nome dito pelo cliente: com ele, qualquer um
+  gastaria os limites de outro jogador ou fugiria dos próprios trocando de
+  nome.
+- Cada stream aberto (inscrições, PlayGame, WatchGame, FindMatch) ocupa uma
+  thread do grpc.server até fechar. Há um teto global (max_streams) e outro
+  por quem chama (MAX_PLAYER_STREAMS, por sessão ou por conexão). Assim um
+  cliente não toma todas as threads e as RPCs unárias dos outros não ficam
+  na fila.
+- Os streams de espectador (SPECTATOR_METHODS) são contados à parte, com o
+  teto MAX_SPECTATOR_STREAMS por quem chama: todos os espectadores de uma
+  sala leem o mesmo feed do SpectatorHub, então acompanhar várias salas
+  pelo mesmo canal custa pouco e não deve gastar os streams de jogo. Eles
+  continuam limitados pelo teto global e pela parte dele que não é
+  reservada aos jogadores (abaixo). O servidor com threads usa um teto
+  menor, porque lá cada stream ainda prende uma thread (ver server.py).
+- Uma parte do teto global (PLAYER_STREAM_SHARE) fica só para os streams de
+  jogadores com sessão: espectadores (WatchGame) e chamadas sem sessão
+  usam o resto. Muitos espectadores ou clientes anônimos não impedem um
+  jogador de acompanhar a própria partida.
+- Recusas terminam com RESOURCE_EXHAUSTED e o trailer grpc-retry-pushback-ms,
+  que a política de retry do cliente (connection.py) respeita antes de
+  repetir.
+"""
+import hmac
+import threading
+import time
+
+import grpc
+
+from metrics import REGISTRY, method_name, wrap_handler
+from sessions import sign
+
+# método: (chamadas por segundo, rajada) por jogador; métodos fora daqui não têm limite
+METHOD_LIMITS = {
+    "GetLobbies": (5.0, 20),
+    "CreateRoom": (1.0, 5),
+    "JoinRoom": (2.0, 10),
+    "FindMatch": (2.0, 10),
+    "MakeMove": (10.0, 20),
+    "SubscribeToGameUpdates": (5.0, 20),
+    "StreamGameUpdates": (5.0, 20),
+    "PlayGame": (5.0, 20),
+    "WatchGame": (20.0, 100),
+}
+MAX_PLAYER_STREAMS = 4 # Streams abertos ao mesmo tempo por jogador (ou conexão, sem sessão)
+MAX_SPECTATOR_STREAMS = 32 # Streams de espectador por jogador ou conexão, contados à parte
+PLAYER_STREAM_SHARE = 0.25 # Parte do teto de streams reservada aos jogadores com sessão
+STREAM_RETRY_AFTER = 1.0 # Sugestão de espera (segundos) quando o teto de streams recusa
+SWEEP_INTERVAL = 30.0 # Segundos entre as limpezas dos buckets parados
+
+SPECTATOR_METHODS = frozenset(("WatchGame",)) # Streams de espectador: teto próprio e sem a reserva dos jogadores
+
+SESSION_METADATA = "session-token"
+FORWARDED_METADATA = "forwarded-peer"
+PUSHBACK_METADATA = "grpc-retry-pushback-ms"
+
+REJECTED = REGISTRY.counter(
+    "game_admission_rejected_total", "RPCs recusadas pelo controle de admissao", ("method", "reason"))
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, rate, burst, now):
+        """Gasta um token; retorna 0 ou quantos segundos faltam para ter um."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / rate
+
+def _metadata(context, key):
+    for name, value in context.invocation_metadata() or ():
+        if name == key:
+            return value
+    return ""
+
+def forwarded_peer(peer, secret):
+    # Valor do metadata 'forwarded-peer' que a frente do cluster manda ao worker
+    return f"{peer} {sign(secret, peer)}"
+
+def peer_of(context, secret=b""):
+    """Conexão do cliente: a repassada pela frente do cluster, se a
+    assinatura confere com o segredo; senão context.peer()."""
+    forwarded = _metadata(context, FORWARDED_METADATA) if secret else ""
+    if forwarded:
+        peer, _, signature = forwarded.rpartition(" ")
+        if peer and hmac.compare_digest(signature, sign(secret, peer)):
+            return peer
+    return context.peer()
+
+def caller_key(request, context, sessions, secret=b""):
+    """(chave, jogador): a chave dos limites da chamada e o nome do jogador
+    da sessão, ou (conexão, None) sem um token de sessão válido."""
+    token = getattr(request, "session_token", "") or _metadata(context, SESSION_METADATA)
+    player = sessions.player_of(token) if sessions is not None and token else None
+    if player is not None:
+        return f"session:{token}", player
+    return peer_of(context, secret), None
+
+class AdmissionControl:
+    """Estado dos limites, compartilhado pelos interceptors (com threads e asyncio)."""
+
+    def __init__(self, max_streams, limits=METHOD_LIMITS, max_player_streams=MAX_PLAYER_STREAMS, sessions=None,
+                 secret="", max_spectator_streams=MAX_SPECTATOR_STREAMS):
+        self.max_streams = max_streams
+        self.limits = limits
+        self.max_player_streams = max_player_streams
+        self.max_spectator_streams = max_spectator_streams
+        self.sessions = sessions # SessionRegistry que confere os tokens (ver caller_key)
+        self.secret = secret.encode() # Segredo do cluster, para o 'forwarded-peer' da frente
+        self.streams = 0 # Streams abertos agora
+        self.other_streams = 0 # Dos quais de espectadores ou sem sessão
+        self._player_streams = {} # (jogador, espectador?) -> streams abertos
+        self._buckets = {} # (método, jogador) -> TokenBucket
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL
+
+    def caller(self, request, context):
+        return caller_key(request, context, self.sessions, self.secret)
+
+    def take(self, method, player):
+        """0 se a chamada pode seguir; senão, os segundos até o próximo token."""
+        limit = self.limits.get(method)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((method, player))
+            if bucket is None:
+                bucket = self._buckets[(method, player)] = TokenBucket(burst, now)
+            wait = bucket.take(rate, burst, now)
+            if now >= self._next_sweep:
+                self._sweep(now)
+        if wait:
+            REJECTED.inc((method, "rate"))
+        return wait
+
+    def _sweep(self, now):
+        # Chamado com _lock: esquece os buckets que já encheram de novo (um
+        # bucket novo começa cheio, então nada muda para o jogador)
+        for (method, player), bucket in list(self._buckets.items()):
+            rate, burst = self.limits[method]
+            if bucket.tokens + (now - bucket.updated) * rate >= burst:
+                del self._buckets[(method, player)]
+        self._next_sweep = now + SWEEP_INTERVAL
+
+    def open_stream(self, method, player, seated):
+        """Reserva um lugar para o stream; retorna None ou o motivo da recusa.
+        'seated': stream de um jogador com sessão (pode usar a reserva)."""
+        key = (player, method in SPECTATOR_METHODS)
+        limit = self.max_spectator_streams if key[1] else self.max_player_streams
+        with self._lock:
+            shared = self.max_streams - int(self.max_streams * PLAYER_STREAM_SHARE)
+            if self.streams >= self.max_streams:
+                reason = f"Servidor com o máximo de {self.max_streams} streams abertos"
+            elif not seated and self.other_streams >= shared:
+                reason = f"Servidor com o máximo de {shared} streams de espectadores e clientes sem sessão"
+            elif self._player_streams.get(key, 0) >= limit:
+                kind = "de espectador " if key[1] else ""
+                reason = f"Já há {limit} streams {kind}abertos por este jogador"
+            else:
+                self.streams += 1
+                if not seated:
+                    self.other_streams += 1
+                self._player_streams[key] = self._player_streams.get(key, 0) + 1
+                return None
+        REJECTED.inc((method, "streams"))
+        return reason
+
+    def close_stream(self, method, player, seated):
+        key = (player, method in SPECTATOR_METHODS)
+        with self._lock:
+            self.streams -= 1
+            if not seated:
+                self.other_streams -= 1
+            count = self._player_streams.pop(key) - 1
+            if count:
+                self._player_streams[key] = count
+
+    def stats(self):
+        return {"streams": self.streams, "other_streams": self.other_streams, "buckets": len(self._buckets)}
+
+def _pushback(context, seconds):
+    context.set_trailing_metadata(((PUSHBACK_METADATA, str(max(1, int(seconds * 1000)))),))
+
+def _rate_message(method, wait):
+    return f"Muitas chamadas de {method}; tente de novo em {wait:.1f}s"
+
+class RateLimitInterceptor(grpc.ServerInterceptor):
+    """Interceptor do grpc.server (com threads)."""
+
+    def __init__(self, control):
+        self.control = control
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        control = self.control
+
+        def unary(behavior):
+            def wrapper(request, context):
+                player, _ = control.caller(request, context)
+                wait = control.take(method, player)
+                if wait:
+                    _pushback(context, wait)
+                    context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rate_message(method, wait))
+                return behavior(request, context)
+            return wrapper
+
+        def streaming(behavior):
+            def wrapper(request, context):
+                player, name = control.caller(request, context)
+                seated = name is not None and method not in SPECTATOR_METHODS
+                wait = control.take(method, player)
+                if wait:
+                    _pushback(context, wait)
+                    context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rate_message(method, wait))
+                reason = control.open_stream(method, player, seated)
+                if reason:
+                    _pushback(context, STREAM_RETRY_AFTER)
+                    context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, reason)
+                try:
+                    yield from behavior(request, context)
+                finally:
+                    control.close_stream(method, player, seated)
+            return wrapper
+
+        return wrap_handler(handler, unary, streaming)
+
+class AsyncRateLimitInterceptor(grpc.aio.ServerInterceptor):
+    """Interceptor do grpc.aio.server (handlers 'async def')."""
+
+    def __init__(self, control):
+        self.control = control
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        control = self.control
+
+        def unary(behavior):
+            async def wrapper(request, context):
+                player, _ = control.caller(request, context)
+                wait = control.take(method, player)
+                if wait:
+                    _pushback(context, wait)
+                    await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rate_message(method, wait))
+                return await behavior(request, context)
+            return wrapper
+
+        def streaming(behavior):
+            async def wrapper(request, context):
+                player, name = control.caller(request, context)
+                seated = name is not None and method not in SPECTATOR_METHODS
+                wait = control.take(method, player)
+                if wait:
+                    _pushback(context, wait)
+                    await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rate_message(method, wait))
+                reason = control.open_stream(method, player, seated)
+                if reason:
+                    _pushback(context, STREAM_RETRY_AFTER)
+                    await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, reason)
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                finally:
+                    control.close_stream(method, player, seated)
+            return wrapper
+
+        return wrap_handler(handler, unary, streaming)
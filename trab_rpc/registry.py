@@ -0,0 +1,57 @@
+import threading
+
+from metrics import REGISTRY, LOCK_WAIT_BUCKETS, TimedLock
+
+DEFAULT_SHARDS = 16
+
+SHARD_LOCK_WAIT = REGISTRY.histogram(
+    "game_registry_lock_wait_seconds", "Espera pelos locks dos shards do RoomRegistry",
+    buckets=LOCK_WAIT_BUCKETS)
+
+class RoomRegistry:
+    """Registro das salas do servidor (room_id -> GameRoom), dividido em shards.
+
+    Cada sala fica no shard escolhido pelo hash do room_id. Buscas pontuais
+    (get) não pegam lock nenhum: um dict.get é atômico no CPython. Escritas
+    pegam só o lock do shard da sala, e a listagem copia um shard de cada
+    vez, então percorrer o lobby nunca trava MakeMove/Subscribe das outras
+    salas.
+    """
+
+    def __init__(self, shard_count=DEFAULT_SHARDS):
+        self._shards = [{} for _ in range(shard_count)]
+        self._locks = [TimedLock(threading.Lock(), SHARD_LOCK_WAIT) for _ in range(shard_count)]
+
+    def _shard_index(self, room_id):
+        return hash(room_id) % len(self._shards)
+
+    def get(self, room_id):
+        # Leitura sem lock
+        return self._shards[self._shard_index(room_id)].get(room_id)
+
+    def add(self, room):
+        i = self._shard_index(room.room_id)
+        with self._locks[i]:
+            if room.room_id in self._shards[i]:
+                raise KeyError(f"Sala {room.room_id} já existe")
+            self._shards[i][room.room_id] = room
+
+    def remove(self, room_id):
+        # Retorna a sala removida (ou None se não existia)
+        i = self._shard_index(room_id)
+        with self._locks[i]:
+            return self._shards[i].pop(room_id, None)
+
+    def values(self):
+        # Cópia das salas, um shard por vez (lock curto por shard)
+        rooms = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                rooms.extend(shard.values())
+        return rooms
+
+    def __contains__(self, room_id):
+        return self.get(room_id) is not None
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
@@ -0,0 +1,103 @@
+"""Desenho do estado do jogo no terminal, guiado pelos eventos do stream.
+
+Em vez de limpar a tela a cada estado (os.system('clear') abre um processo
+por mensagem) e imprimir tudo de novo, o AnsiRenderer guarda as linhas da
+última tela e reescreve só as que mudaram, com sequências ANSI de
+posicionamento do cursor. O cursor é salvo e restaurado em volta dessas
+atualizações, então o prompt (abaixo do quadro) não é atrapalhado enquanto
+o jogador digita.
+"""
+import shutil
+import sys
+import threading
+
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+CLEAR_LINE = "\x1b[2K"
+CLEAR_BELOW = "\x1b[J"
+SAVE_CURSOR = "\x1b7"
+RESTORE_CURSOR = "\x1b8"
+
+def move_to(row):
+    return f"\x1b[{row};1H"
+
+def game_lines(state, player_name):
+    """Linhas do quadro do jogo (o mesmo conteúdo do antigo print_game_state)."""
+    lines = [
+        "================ BUCKSHOT ROULETTE (gRPC) ================",
+        f"Sala: {state.room_id} | Status: {state.status}",
+        f"Log: {state.last_action_log}",
+        "",
+        # Pente
+        "--- PENTE ATUAL ---",
+        f"Balas Totais: {state.bullets_in_clip}",
+        f"Balas Reais:  {state.live_bullets_in_clip}",
+        f"Balas Festim: {state.bullets_in_clip - state.live_bullets_in_clip}",
+        "",
+        # Jogadores
+        "--- JOGADORES ---",
+        f"  {state.player1_name}: {state.player1_lives} vidas",
+    ]
+    if state.player2_name:
+        lines.append(f"  {state.player2_name}: {state.player2_lives} vidas")
+    lines += ["-------------------", ""]
+
+    # Turno / Fim de Jogo
+    if state.status == "GAME_OVER":
+        lines += ["!!!!!!!! FIM DE JOGO !!!!!!!!", f"{state.winner_id} VENCEU!",
+                  "=========================================================="]
+    elif state.status == "IN_GAME":
+        if state.current_turn_player_id == player_name:
+            lines.append(f">>>> É A SUA VEZ, {player_name}! <<<<")
+        else:
+            lines.append(f">>>> Esperando a jogada de {state.current_turn_player_id}... <<<<")
+    elif state.status == "WAITING":
+        lines.append(">>>> Esperando outro jogador entrar na sala... <<<<")
+    return lines
+
+class AnsiRenderer:
+    """Quadro no topo da tela; prompts e mensagens ficam logo abaixo dele."""
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self._lines = None # Linhas na tela (None = a tela precisa ser desenhada inteira)
+        self._lock = threading.Lock() # A thread do stream e a do input escrevem na tela
+
+    def clear(self):
+        with self._lock:
+            self.out.write(CLEAR_SCREEN)
+            self.out.flush()
+            self._lines = None
+
+    def draw(self, lines):
+        # Linhas maiores que o terminal quebrariam e desalinhariam as posições
+        width = shutil.get_terminal_size().columns
+        lines = [line[:width] for line in lines]
+        with self._lock:
+            if self._lines is None:
+                self.out.write(CLEAR_SCREEN + "\n".join(lines) + "\n\n")
+            else:
+                parts = [SAVE_CURSOR]
+                for row in range(max(len(lines), len(self._lines))):
+                    new = lines[row] if row < len(lines) else ""
+                    old = self._lines[row] if row < len(self._lines) else ""
+                    if new != old:
+                        parts.append(move_to(row + 1) + CLEAR_LINE + new)
+                parts.append(RESTORE_CURSOR)
+                self.out.write("".join(parts))
+            self.out.flush()
+            self._lines = lines
+
+    def status(self, text):
+        # Linha em branco logo abaixo do quadro (ex: "Reconectando..."), sem mexer no prompt
+        with self._lock:
+            if self._lines is None:
+                return
+            self.out.write(SAVE_CURSOR + move_to(len(self._lines) + 1) + CLEAR_LINE + text + RESTORE_CURSOR)
+            self.out.flush()
+
+    def prompt_area(self):
+        # Cursor logo abaixo do quadro, apagando prompts e mensagens antigos
+        with self._lock:
+            rows = len(self._lines) if self._lines else 0
+            self.out.write(move_to(rows + 2) + CLEAR_BELOW)
+            self.out.flush()
@@ -0,0 +1,257 @@
+"""Motor de replay: refaz partidas a partir da semente e das jogadas.
+
+replay() reexecuta as regras do GameRoom.make_move num laço enxuto (sem
+gRPC, locks, broadcast nem logs), com os mesmos sorteios (rules.py), e
+devolve o estado final. Serve para:
+- auditar o journal: cada sala criada dentro dos segmentos guardados tem a
+  semente (registro 'create'), os jogadores ('join') e as jogadas ('move');
+  o estado refeito tem que bater com o último registro da sala;
+- análises em massa de partidas gravadas.
+
+Uso:
+  python replay.py --journal game_data       # audita o journal do servidor
+  python replay.py --bench 20000 --passes 10 # grava partidas com o GameRoom,
+                                             # confere o replay e mede a vazão
+"""
+import argparse
+import collections
+import json
+import os
+import random
+import time
+
+from events import NOBODY
+from rules import INITIAL_LIVES, QUIT_GAME, SHOOT_OPPONENT, SHOOT_SELF, first_turn_seat, load_clip, rng_value
+
+ReplayResult = collections.namedtuple("ReplayResult", [
+    "status", "winner_id", "player1_lives", "player2_lives", "current_turn_player_id",
+    "clip_bits", "clip_size", "clip_cursor", "clip_live", "rng_draws", "version", "rejected",
+])
+
+# Campos comparados com GameRoom.dump_state (ver room.PERSISTED_FIELDS)
+COMPARED_FIELDS = ReplayResult._fields[:-1]
+
+def replay(seed, players, actions):
+    """Refaz uma partida: 'players' é (host,) ou (host, convidado), na ordem
+    em que entraram; 'actions' é uma sequência de (jogador, ação).
+
+    Jogadas que o servidor recusaria (fora da vez, jogo parado, jogador de
+    fora) não mudam nada e são contadas em 'rejected'."""
+    p1 = players[0]
+    p2 = players[1] if len(players) > 1 else None
+    lives1 = lives2 = INITIAL_LIVES
+    status = "WAITING"
+    winner = None
+    turn = None
+    bits = size = cursor = live_left = 0
+    draws = 0
+    version = 1 # O broadcast da criação
+    rejected = 0
+
+    if p2 is not None:
+        # start_game: sorteia quem começa e o primeiro pente
+        status = "IN_GAME"
+        turn = p1 if first_turn_seat(rng_value(seed, 0)) == 0 else p2
+        bits, size, live_left = load_clip(rng_value(seed, 1))
+        draws = 2
+        version = 2
+
+    for player, action in actions:
+        if action == QUIT_GAME:
+            if player is None:
+                rejected += 1
+                continue
+            if player == p1:
+                lives1 = 0
+            elif player == p2:
+                lives2 = 0
+            else:
+                rejected += 1
+                continue
+            if status == "WAITING":
+                status = "GAME_OVER"
+                opponent = p2 if player == p1 else p1
+                winner = opponent if opponent else NOBODY
+        elif status != "IN_GAME" or player != turn:
+            rejected += 1
+            continue
+        elif cursor >= size:
+            bits, size, live_left = load_clip(rng_value(seed, draws))
+            draws += 1
+            cursor = 0
+        elif action == SHOOT_SELF:
+            live = (bits >> cursor) & 1
+            cursor += 1
+            if live:
+                live_left -= 1
+                if player == p1:
+                    lives1 -= 1
+                    turn = p2
+                else:
+                    lives2 -= 1
+                    turn = p1
+        elif action == SHOOT_OPPONENT:
+            live = (bits >> cursor) & 1
+            cursor += 1
+            opponent = p2 if player == p1 else p1
+            if live:
+                live_left -= 1
+                if opponent == p1:
+                    lives1 -= 1
+                else:
+                    lives2 -= 1
+            turn = opponent
+
+        version += 1
+        if status != "GAME_OVER":
+            loser = None
+            if lives1 <= 0:
+                loser = p1
+            elif p2 is not None and lives2 <= 0:
+                loser = p2
+            if loser is not None:
+                opponent = p2 if loser == p1 else p1
+                winner = opponent if opponent else NOBODY
+                status = "GAME_OVER"
+
+    return ReplayResult(status, winner, lives1, lives2, turn,
+                        bits, size, cursor, live_left, draws, version, rejected)
+
+def _state_fields(state):
+    # Tupla de dump_state -> {campo: valor}
+    from room import PERSISTED_FIELDS
+    return dict(zip(PERSISTED_FIELDS, state))
+
+def differences(result, state):
+    """Campos em que o replay difere de um estado de GameRoom.dump_state."""
+    fields = _state_fields(state)
+    return [name for name in COMPARED_FIELDS if getattr(result, name) != fields[name]]
+
+# --- Journal ---
+
+def games_from_journal(directory):
+    """Partidas completas nos segmentos do journal: gera
+    (room_id, semente, jogadores, jogadas, último estado)."""
+    from room import PERSISTED_FIELDS
+    seed_index = PERSISTED_FIELDS.index("seed")
+    p1_index = PERSISTED_FIELDS.index("player1_id")
+    p2_index = PERSISTED_FIELDS.index("player2_id")
+
+    games = {} # room_id -> [semente, jogadores, jogadas, último estado]
+    for name in sorted(n for n in os.listdir(directory) if n.startswith("journal-")):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break # Linha cortada no fim do segmento
+                kind, room_id, state = record[1], record[2], record[3]
+                if kind == "create":
+                    # Salas do FindMatch já são criadas com os dois jogadores
+                    players = (state[p1_index], state[p2_index]) if state[p2_index] else (state[p1_index],)
+                    games[room_id] = [state[seed_index], players, [], state]
+                    continue
+                game = games.get(room_id)
+                if game is None:
+                    continue # Criada antes do snapshot: sem a semente/jogadas do início
+                if kind == "remove":
+                    continue # O último estado continua valendo para a auditoria
+                if kind == "join":
+                    game[1] = (state[p1_index], state[p2_index])
+                elif kind == "move":
+                    game[2].append(tuple(record[4]))
+                game[3] = state
+
+    for room_id, (seed, players, actions, state) in games.items():
+        yield room_id, seed, players, actions, state
+
+def audit_journal(directory):
+    audited = 0
+    mismatches = []
+    for room_id, seed, players, actions, state in games_from_journal(directory):
+        result = replay(seed, players, actions)
+        audited += 1
+        diff = differences(result, state)
+        if result.rejected:
+            diff.append("rejected")
+        if diff:
+            mismatches.append((room_id, diff))
+    return audited, mismatches
+
+# --- Benchmark ---
+
+def record_games(n, seed=1):
+    """Joga n partidas com o GameRoom de verdade, com uma política aleatória
+    que às vezes erra a vez ou desiste; retorna (semente, jogadores, jogadas,
+    estado final)."""
+    from room import GameRoom
+    rng = random.Random(seed)
+    games = []
+    for i in range(n):
+        room = GameRoom("replay", "p1", seed=rng.getrandbits(64))
+        players = ("p1",)
+        if rng.random() < 0.98:
+            room.add_player("p2")
+            players = ("p1", "p2")
+        actions = []
+        for _ in range(200):
+            if room.status == "GAME_OVER":
+                break
+            roll = rng.random()
+            if roll < 0.02 or room.status == "WAITING":
+                action = (rng.choice(players), QUIT_GAME)
+            elif roll < 0.06:
+                action = (rng.choice(("p1", "p2", "intruso")), rng.choice((SHOOT_SELF, SHOOT_OPPONENT)))
+            else:
+                action = (room.current_turn_player_id, rng.choice((SHOOT_SELF, SHOOT_OPPONENT)))
+            actions.append(action)
+            try:
+                room.make_move(*action)
+            except Exception:
+                pass # Recusada pelo servidor; o replay também tem que recusar
+        games.append((room.seed, players, actions, room.dump_state()))
+    return games
+
+def bench(n, passes):
+    import logging
+    import gamelog
+    gamelog.configure(level=logging.WARNING)
+
+    start = time.perf_counter()
+    games = record_games(n)
+    record_time = time.perf_counter() - start
+    moves = sum(len(actions) for _, _, actions, _ in games)
+    print(f"{n} partidas gravadas com o GameRoom em {record_time:.1f}s ({moves} jogadas)")
+
+    mismatches = sum(1 for seed, players, actions, state in games
+                     if differences(replay(seed, players, actions), state))
+    print(f"replay diferente do GameRoom: {mismatches}")
+
+    start = time.perf_counter()
+    for _ in range(passes):
+        for seed, players, actions, _ in games:
+            replay(seed, players, actions)
+    elapsed = time.perf_counter() - start
+    total = n * passes
+    print(f"{total} replays em {elapsed:.2f}s: {total / elapsed * 60 / 1e6:.2f} milhões de partidas/min "
+          f"({total * moves / n / elapsed / 1e6:.2f} M jogadas/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--journal", help="Diretório do journal a auditar")
+    parser.add_argument("--bench", type=int, metavar="N", help="Grava N partidas e mede o replay")
+    parser.add_argument("--passes", type=int, default=10, help="Vezes que o benchmark refaz as partidas")
+    args = parser.parse_args()
+
+    if args.journal:
+        audited, mismatches = audit_journal(args.journal)
+        print(f"{audited} partidas auditadas, {len(mismatches)} divergentes")
+        for room_id, diff in mismatches[:20]:
+            print(f"  {room_id}: {', '.join(diff)}")
+    if args.bench:
+        bench(args.bench, args.passes)
+    if not args.journal and not args.bench:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,685 @@
+import logging
+import threading
+import random
+import time
+import uuid
+import collections
+
+# Importa as classes geradas
+import game_pb2
+
+from metrics import REGISTRY, LOCK_WAIT_BUCKETS, TimedLock
+from gamelog import get_logger
+import rules
+from rules import INITIAL_LIVES
+from events import Event, NOBODY, describe, event_field
+
+HISTORY_SIZE = 64 # Quantas versões cada sala guarda para reconexões
+MOVE_WINDOW = 32 # Resultados de jogadas com sequence guardados por sala (repetições)
+
+# Uma versão publicada do estado de uma sala, já serializada:
+#   state: bytes do GameState completo
+#   delta: bytes do GameUpdate com o delta em relação à versão anterior,
+#          ou None quando o inscrito precisa receber o estado completo
+#   final: True se é o estado de GAME_OVER
+#   compact: bytes do GameStateV2 (sala e nomes só se mudaram nesta versão)
+#   header: bytes do GameStateV2 só com sala e nomes (os mesmos para as
+#           versões com os mesmos nomes), somados ao compact quando o
+#           inscrito precisa do estado completo (ver compact_state)
+StateUpdate = collections.namedtuple("StateUpdate", ["version", "state", "delta", "final", "compact", "header"])
+
+def new_room_id():
+    return f"room-{uuid.uuid4().hex[:6]}"
+
+# Resultado de GameRoom.apply_move:
+#   error: mensagem de erro (None = jogada aceita)
+#   version: versão do estado depois da jogada
+#   duplicate: True se era a repetição de uma jogada já processada (não foi
+#              aplicada de novo; error e version são os da primeira vez)
+MoveResult = collections.namedtuple("MoveResult", ["error", "version", "duplicate"])
+
+# Campos do GameState que entram no GameStateDelta
+DELTA_FIELDS = (
+    "status", "player1_name", "player2_name", "player1_lives", "player2_lives",
+    "current_turn_player_id", "bullets_in_clip", "live_bullets_in_clip",
+    "last_action_log", "winner_id",
+)
+LOG = get_logger("room")
+
+# Atributos que descrevem uma sala por completo (journal e snapshots, ver
+# dump_state/restore). O histórico e os inscritos não são salvos.
+PERSISTED_FIELDS = (
+    "room_id", "room_name", "host_id", "status",
+    "player1_id", "player2_id", "player1_lives", "player2_lives", "current_turn_player_id",
+    "clip_bits", "clip_size", "clip_cursor", "clip_live",
+    "last_action_log", "winner_id", "version", "seed", "rng_draws",
+    "player1_sequence", "player2_sequence", "last_event",
+    "player1_session", "player2_session",
+)
+_VERSION_INDEX = PERSISTED_FIELDS.index("version")
+
+_SEEDS = random.SystemRandom() # Sementes das salas (imprevisíveis)
+
+# Valores padrão do GameState (base do delta da primeira versão)
+_EMPTY_FIELDS = ("", "", "", 0, 0, "", 0, 0, "", "")
+
+_STATUS_CODES = {"WAITING": game_pb2.WAITING, "IN_GAME": game_pb2.IN_GAME, "GAME_OVER": game_pb2.GAME_OVER}
+
+LOCK_WAIT = REGISTRY.histogram(
+    "game_room_lock_wait_seconds", "Espera por GameRoom.lock (so aquisicoes disputadas)",
+    buckets=LOCK_WAIT_BUCKETS)
+DUPLICATE_MOVES = REGISTRY.counter(
+    "game_duplicate_moves_total", "Jogadas repetidas (mesmo sequence) respondidas sem aplicar de novo")
+BROADCAST_TIME = REGISTRY.histogram(
+    "game_broadcast_seconds", "Duracao de _broadcast_state (serializacao + entrega aos inscritos)",
+    buckets=LOCK_WAIT_BUCKETS)
+
+def _encode_varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def embed_message(field_number, data):
+    """Bytes de uma mensagem com um único campo 'field_number' contendo a
+    submensagem já serializada 'data' (length-delimited), sem codificar de novo."""
+    return _encode_varint(field_number << 3 | 2) + _encode_varint(len(data)) + data
+
+def snapshot_update(update):
+    # GameUpdate(snapshot=<GameState>): o snapshot é o campo 1
+    return embed_message(1, update.state)
+
+def compact_state(update):
+    # GameStateV2 da versão; com sala e nomes quando o inscrito não tem a
+    # anterior (campos repetidos numa mensagem: vale o último, e são iguais)
+    if update.delta is None:
+        return update.compact + update.header
+    return update.compact
+
+# Classe interna do servidor para gerenciar o estado de UM jogo
+class GameRoom:
+    """Estado de uma partida, em formato compacto.
+
+    Com __slots__ e sem dicts por jogador, cada sala ocupa poucas centenas de
+    bytes (ver bench_room.py):
+    - Dois assentos fixos: player1_*/player2_* (o id é o nome do jogador).
+    - O pente é um inteiro usado como máscara de bits (bit i = bala i é
+      real) mais um cursor; os contadores de balas restantes/reais são
+      mantidos a cada tiro, então nada é recontado.
+    - Cada sala tem o próprio gerador (semente + contador de sorteios, ver
+      rules.py): com a semente e a sequência de jogadas, a partida pode ser
+      refeita fora do servidor (replay.py).
+    - As jogadas registram o que aconteceu em last_event (events.Event); o
+      texto do log é montado a partir dele no broadcast.
+    """
+
+    __slots__ = (
+        "room_id", "room_name", "host_id", "status", "status_listeners",
+        "player1_id", "player2_id", "player1_lives", "player2_lives",
+        "current_turn_player_id",
+        "clip_bits", "clip_size", "clip_cursor", "clip_live",
+        "last_action_log", "winner_id",
+        "version", "_last_fields", "history", "subscribers", "lock",
+        "seed", "rng_draws",
+        "player1_sequence", "player2_sequence", "move_results",
+        "last_event", "_header", "player1_session", "player2_session", "closed",
+    )
+
+    def __init__(self, room_name, host_name, seed=None, room_id=None):
+        self.room_id = room_id or new_room_id()
+        self.room_name = room_name
+        self.host_id = host_name
+        self.status = "WAITING"
+        # Funções chamadas (com o lock da sala) a cada mudança de status
+        self.status_listeners = []
+
+        # Assentos fixos (None = vazio), com o token da sessão de cada
+        # jogador (ver sessions.py; "" = sem sessão)
+        self.player1_id = None
+        self.player2_id = None
+        self.player1_session = ""
+        self.player2_session = ""
+        self.player1_lives = INITIAL_LIVES
+        self.player2_lives = INITIAL_LIVES
+        self.current_turn_player_id = None
+
+        # Gerador da sala: a semente não sai do servidor (diria os pentes)
+        self.seed = _SEEDS.getrandbits(64) if seed is None else seed
+        self.rng_draws = 0
+
+        # Pente vazio
+        self.clip_bits = 0
+        self.clip_size = 0
+        self.clip_cursor = 0
+        self.clip_live = 0
+
+        self.last_action_log = "Jogo criado. Esperando oponente..."
+        self.last_event = None # O que aconteceu na última versão (events.Event)
+        self.winner_id = None
+
+        # Último sequence de jogada processado de cada assento (ver apply_move)
+        # e os resultados recentes, criados só quando o cliente usa sequence
+        self.player1_sequence = 0
+        self.player2_sequence = 0
+        self.move_results = None
+
+        # Versão do estado: incrementa a cada broadcast
+        self.version = 0
+        self._last_fields = _EMPTY_FIELDS # Campos da versão anterior, base para o próximo delta
+        self._header = None # Sala e nomes do GameStateV2, serializados (None = mudaram)
+        # Últimas versões publicadas (StateUpdate), para reconexão sem perdas.
+        # Uma lista simples ocupa bem menos que um deque nas salas com poucas versões.
+        self.history = []
+
+        # Lista de "observadores" (clientes) para enviar updates (o stream do gRPC)
+        self.subscribers = []
+
+        # Lock individual para este jogo, essencial para concorrência
+        # (TimedLock mede o tempo de espera quando há disputa)
+        self.lock = TimedLock(threading.RLock(), LOCK_WAIT)
+        # True quando a sala saiu do registro (ver RoomLifecycle): quem ainda
+        # tem a referência não consegue mais mudá-la
+        self.closed = False
+
+        # Adiciona o host
+        self.add_player(host_name)
+
+    # --- Persistência ---
+
+    def dump_state(self):
+        # Tupla de valores simples, na ordem de PERSISTED_FIELDS
+        return (
+            self.room_id, self.room_name, self.host_id, self.status,
+            self.player1_id, self.player2_id, self.player1_lives, self.player2_lives,
+            self.current_turn_player_id,
+            self.clip_bits, self.clip_size, self.clip_cursor, self.clip_live,
+            self.last_action_log, self.winner_id, self.version, self.seed, self.rng_draws,
+            self.player1_sequence, self.player2_sequence, self.last_event,
+            self.player1_session, self.player2_session,
+        )
+
+    @classmethod
+    def restore(cls, state, version_gap=0):
+        """Recria uma sala a partir de dump_state(), sem sortear nada nem
+        passar pelo add_player. O estado é publicado de novo na versão salva
+        mais 'version_gap': o journal pode ter perdido as últimas versões que
+        os clientes já receberam, e sem o salto a sala voltaria a usar esses
+        números com outro conteúdo (quem reconectasse com resume_from_version
+        igual a um deles acharia que já está atualizado). Com o salto, quem
+        reconectar recebe o estado completo."""
+        room = cls.__new__(cls)
+        for field, value in zip(PERSISTED_FIELDS, state):
+            setattr(room, field, value)
+        room.status_listeners = []
+        room._last_fields = _EMPTY_FIELDS
+        room._header = None
+        room.history = []
+        room.subscribers = []
+        room.lock = TimedLock(threading.RLock(), LOCK_WAIT)
+        room.closed = False
+        room.move_results = None
+        if len(state) <= PERSISTED_FIELDS.index("seed"):
+            # Estado gravado antes do gerador por sala: começa um novo
+            room.seed = _SEEDS.getrandbits(64)
+            room.rng_draws = 0
+        if len(state) <= PERSISTED_FIELDS.index("player1_sequence"):
+            # Estado gravado antes dos sequences de jogada
+            room.player1_sequence = room.player2_sequence = 0
+        if len(state) <= PERSISTED_FIELDS.index("last_event"):
+            # Estado gravado antes dos eventos: o log salvo continua valendo
+            room.last_event = None
+        elif room.last_event is not None:
+            room.last_event = Event(*room.last_event) # O JSON devolve uma lista
+        if len(state) <= PERSISTED_FIELDS.index("player1_session"):
+            # Estado gravado antes das sessões
+            room.player1_session = room.player2_session = ""
+        room.version += version_gap - 1
+        room._broadcast_state()
+        return room
+
+    def draft(self):
+        """Cópia só do estado persistido (sem inscritos nem histórico), em que
+        uma mudança é calculada antes de ser publicada (ver store.SQLiteStore).
+        Chamado com o lock da sala."""
+        draft = RoomDraft.__new__(RoomDraft)
+        for field in PERSISTED_FIELDS:
+            setattr(draft, field, getattr(self, field))
+        draft.status_listeners = []
+        draft.lock = self.lock # RLock: quem chama já o tem
+        draft.closed = self.closed
+        draft._header = None
+        if self.move_results is not None:
+            draft.move_results = collections.OrderedDict(self.move_results)
+        else:
+            draft.move_results = None
+        return draft
+
+    def load_state(self, state):
+        """Publica um estado de fora deste processo (uma mudança calculada
+        num draft, ou gravada por outro servidor no store), na versão dele.
+        Retorna False se a sala já está nessa versão ou depois."""
+        with self.lock:
+            if state[_VERSION_INDEX] <= self.version:
+                return False
+            status, names = self.status, (self.player1_id, self.player2_id)
+            for field, value in zip(PERSISTED_FIELDS, state):
+                setattr(self, field, value)
+            if self.last_event is not None:
+                self.last_event = Event(*self.last_event) # O JSON devolve uma lista
+            if (self.player1_id, self.player2_id) != names:
+                self._header = None
+            skipped = self.version > self.history[-1].version + 1
+            self.version -= 1
+            if self.status != status:
+                self._set_status(self.status)
+            self._broadcast_state()
+            if skipped:
+                # Versões que este processo não viu: o delta publicado é sobre
+                # a última que ele viu (a dos inscritos daqui), então quem
+                # reconectar a partir de uma versão do meio recebe o estado
+                # completo
+                self.history = [self.history[-1]._replace(delta=None)]
+            return True
+
+    # --- Assentos ---
+
+    @property
+    def player_count(self):
+        return (self.player1_id is not None) + (self.player2_id is not None)
+
+    def seat(self, player_id):
+        # 1 = player1, 2 = player2, 0 = ninguém (GameStateV2)
+        if player_id is None:
+            return 0
+        if player_id == self.player1_id:
+            return 1
+        if player_id == self.player2_id:
+            return 2
+        return 0
+
+    def set_session(self, player_id, token):
+        # Token da sessão do jogador, no assento dele (ver sessions.py)
+        if player_id == self.player1_id:
+            self.player1_session = token
+        elif player_id == self.player2_id:
+            self.player2_session = token
+
+    def seat_sessions(self):
+        # (token, jogador) de cada assento com sessão (recuperação do journal)
+        return [(token, player_id) for token, player_id in
+                ((self.player1_session, self.player1_id), (self.player2_session, self.player2_id)) if token]
+
+    def has_player(self, player_id):
+        return player_id is not None and (player_id == self.player1_id or player_id == self.player2_id)
+
+    def get_opponent_id(self, player_id):
+        if player_id is None:
+            return None
+        if player_id == self.player1_id:
+            return self.player2_id
+        if player_id == self.player2_id:
+            return self.player1_id
+        return None
+
+    def _damage(self, player_id):
+        if player_id == self.player1_id:
+            self.player1_lives -= 1
+        else:
+            self.player2_lives -= 1
+
+    def add_player(self, player_name):
+        if self.closed:
+            raise Exception("Sala não existe mais")
+        # A lógica do jogo só aceita 2 jogadores
+        if self.player2_id is not None:
+            raise Exception("Sala está cheia")
+        if player_name == self.player1_id:
+            raise Exception("Já existe um jogador com esse nome na sala")
+
+        player_id = player_name # O nome é o ID na sala; quem o usa é provado pela sessão
+        if self.player1_id is None:
+            self.player1_id = player_id
+        else:
+            self.player2_id = player_id
+        self._header = None
+
+        if self.player2_id is not None:
+            self.start_game()
+        else:
+            self.last_event = Event(game_pb2.PLAYER_JOINED, self.seat(player_id))
+            self._broadcast_state()
+
+        return player_id
+
+    def start_game(self):
+        self._set_status("IN_GAME")
+        seat = rules.first_turn_seat(self._draw())
+        self.current_turn_player_id = self.player1_id if seat == 0 else self.player2_id
+        self._load_clip()
+        self.last_event = Event(game_pb2.GAME_STARTED, 2)
+        self._broadcast_state()
+
+    def _set_status(self, status):
+        self.status = status
+        for listener in self.status_listeners:
+            listener(self)
+
+    # --- Pente ---
+
+    @property
+    def bullets_in_clip(self):
+        return self.clip_size - self.clip_cursor
+
+    def _draw(self):
+        # Próximo valor do gerador da sala
+        value = rules.rng_value(self.seed, self.rng_draws)
+        self.rng_draws += 1
+        return value
+
+    def _load_clip(self):
+        # 2 a 8 balas, ~metade real, em posições sorteadas (ver rules.load_clip)
+        bits, total, live = rules.load_clip(self._draw())
+
+        self.clip_bits = bits
+        self.clip_size = total
+        self.clip_cursor = 0
+        self.clip_live = live
+        LOG.debug("clip_loaded", "Carregando pente", room_id=self.room_id, bullets=total, live=live)
+        if LOG.enabled(logging.DEBUG, "clip_contents"):
+            # Segredo do jogo: só com GAME_LOG_SECRETS=1
+            pente = format(bits, f"0{total}b")[::-1] # Bala 0 primeiro; 1 = real
+            LOG.debug("clip_contents", room_id=self.room_id, clip=pente)
+
+    def _next_bullet(self):
+        # Pega a próxima bala em O(1)
+        is_live = (self.clip_bits >> self.clip_cursor) & 1 == 1
+        self.clip_cursor += 1
+        if is_live:
+            self.clip_live -= 1
+        return is_live
+
+    # --- Jogadas ---
+
+    def apply_move(self, player_id, action, sequence=0):
+        """make_move idempotente; retorna um MoveResult em vez de levantar.
+
+        'sequence' é o número da jogada escolhido pelo cliente, crescente por
+        jogador (0 = sem deduplicação). Quem repete um sequence (retry depois
+        de um timeout, a mesma jogada mandada por dois caminhos) recebe o
+        resultado da primeira vez, sem a jogada ser aplicada de novo. Os
+        últimos MOVE_WINDOW resultados ficam guardados; um sequence mais
+        antigo que isso (ou de antes de o servidor reiniciar: só o último de
+        cada assento vai para o journal) conta como já processado."""
+        with self.lock:
+            if sequence:
+                key = (player_id, sequence)
+                if self.move_results is not None and key in self.move_results:
+                    DUPLICATE_MOVES.inc()
+                    error, version = self.move_results[key]
+                    return MoveResult(error, version, True)
+                if sequence <= self._last_sequence(player_id):
+                    DUPLICATE_MOVES.inc()
+                    return MoveResult(None, self.version, True)
+
+            try:
+                self.make_move(player_id, action)
+                error = None
+            except Exception as e:
+                error = str(e)
+
+            if sequence:
+                if player_id == self.player1_id:
+                    self.player1_sequence = sequence
+                elif player_id == self.player2_id:
+                    self.player2_sequence = sequence
+                if self.move_results is None:
+                    self.move_results = collections.OrderedDict()
+                self.move_results[key] = (error, self.version)
+                if len(self.move_results) > MOVE_WINDOW:
+                    self.move_results.popitem(last=False)
+            return MoveResult(error, self.version, False)
+
+    def _last_sequence(self, player_id):
+        if player_id is None:
+            return 0
+        if player_id == self.player1_id:
+            return self.player1_sequence
+        if player_id == self.player2_id:
+            return self.player2_sequence
+        return 0
+
+    def make_move(self, player_id, action):
+        with self.lock:
+            if self.closed:
+                # Recolhida enquanto a jogada esperava o lock
+                raise Exception("Sala não existe mais")
+
+            # --- LÓGICA DE AÇÃO DO JOGO ---
+            # 1. Checa por desistência PRIMEIRO.
+            #    Isso é permitido a qualquer momento.
+            if action == game_pb2.QUIT_GAME:
+                if player_id is None:
+                    raise Exception("Jogador não está nesta sala")
+                if player_id == self.player1_id:
+                    self.player1_lives = 0
+                elif player_id == self.player2_id:
+                    self.player2_lives = 0
+                else:
+                    raise Exception("Jogador não está nesta sala")
+                self.last_event = Event(game_pb2.PLAYER_QUIT, self.seat(player_id))
+
+                # Se o jogo nem começou, apenas define o vencedor como "Ninguém"
+                # ou o outro jogador, se ele existir
+                if self.status == "WAITING":
+                    self._set_status("GAME_OVER")
+                    opponent = self.get_opponent_id(player_id)
+                    self.winner_id = opponent if opponent else NOBODY
+
+                # A checagem de vitória normal (abaixo)
+                # vai cuidar da lógica se o jogo estava IN_GAME.
+
+            # 2. Se não for desistência, faz as validações normais.
+            elif self.status != "IN_GAME":
+                raise Exception("Jogo não está ativo")
+            elif player_id != self.current_turn_player_id:
+                raise Exception("Não é o seu turno")
+
+            # 3. Executa a ação (apenas se não for desistência)
+            elif self.clip_cursor >= self.clip_size: # 'elif' é importante aqui
+                self._load_clip()
+                self.last_event = Event(game_pb2.CLIP_RELOADED, self.seat(player_id))
+                # O turno continua com o mesmo jogador
+
+            elif action == game_pb2.SHOOT_SELF:
+                seat = self.seat(player_id)
+                if self._next_bullet(): # Pega a próxima bala
+                    self._damage(player_id)
+                    self.last_event = Event(game_pb2.SHOT_FIRED, seat, seat, True, 1)
+                    self.current_turn_player_id = self.get_opponent_id(player_id)
+                else:
+                    self.last_event = Event(game_pb2.SHOT_FIRED, seat, seat, False, 0)
+                    # O turno não muda
+
+            elif action == game_pb2.SHOOT_OPPONENT:
+                opponent_id = self.get_opponent_id(player_id)
+                seat = self.seat(player_id)
+                if self._next_bullet(): # Pega a próxima bala
+                    self._damage(opponent_id)
+                    self.last_event = Event(game_pb2.SHOT_FIRED, seat, 3 - seat, True, 1)
+                else:
+                    self.last_event = Event(game_pb2.SHOT_FIRED, seat, 3 - seat, False, 0)
+
+                # A vez sempre passa
+                self.current_turn_player_id = opponent_id
+
+            # --- FIM DA LÓGICA DE AÇÃO ---
+
+            # 4. Checa condição de vitória
+            # Só se o jogo ainda não acabou, para não definir o vencedor duas vezes
+            if self.status != "GAME_OVER":
+                loser = None
+                if self.player1_id is not None and self.player1_lives <= 0:
+                    loser = self.player1_id
+                elif self.player2_id is not None and self.player2_lives <= 0:
+                    loser = self.player2_id
+
+                if loser is not None:
+                    self.winner_id = self.get_opponent_id(loser)
+                    if not self.winner_id: # Se não achou oponente (ex: desistiu no lobby)
+                        self.winner_id = NOBODY
+
+                    self._set_status("GAME_OVER")
+                    self.last_event = self.last_event._replace(game_over=True)
+
+            # 5. Notifica todos os clientes
+            self._broadcast_state()
+
+    # --- Inscritos e broadcast ---
+
+    def subscribe(self, subscriber, resume_from_version=0):
+        # Inscreve e entrega o estado inicial de forma atômica, para que
+        # nenhum broadcast chegue antes dele
+        with self.lock:
+            self.subscribers.append(subscriber)
+            current = self.history[-1]
+
+            oldest = self.history[0].version
+            if resume_from_version and oldest - 1 <= resume_from_version < self.version:
+                # Reconexão: reenvia só o que o cliente perdeu
+                for update in self.history:
+                    if update.version > resume_from_version:
+                        subscriber.push(update)
+            elif resume_from_version == self.version and not current.final:
+                pass # Cliente já está atualizado; espera a próxima versão
+            else:
+                # Primeira inscrição (ou versão fora do histórico): estado completo
+                subscriber.push(current._replace(delta=None))
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def _broadcast_state(self):
+        # Envia o estado atual para TODOS os observadores
+        with self.lock:
+            start = time.perf_counter()
+            # Serializa UMA vez por versão; todos recebem os mesmos bytes
+            self.version += 1
+            if self.last_event is not None:
+                # O texto do GameState v1 (os clientes v2 montam o deles)
+                self.last_action_log = self._describe(self.last_event)
+            fields = self._state_fields()
+            compact = self._get_compact_proto(fields).SerializeToString()
+            if self.last_event is not None:
+                compact += event_field(self.last_event)
+            if self._header is None:
+                # Primeira versão ou alguém entrou: os nomes vão nesta versão
+                self._header = game_pb2.GameStateV2(
+                    room_id=self.room_id, player1_name=fields[1], player2_name=fields[2]).SerializeToString()
+                compact += self._header
+            update = StateUpdate(
+                version=self.version,
+                state=self._get_state_proto(fields).SerializeToString(),
+                delta=self._get_delta_proto(fields).SerializeToString(),
+                final=self.status == "GAME_OVER",
+                compact=compact,
+                header=self._header,
+            )
+            self._last_fields = fields
+            self.history.append(update)
+            if len(self.history) > HISTORY_SIZE:
+                del self.history[0]
+            LOG.info("broadcast", "Transmitindo estado", room_id=self.room_id, version=self.version,
+                     subscribers=len(self.subscribers), action=self.last_action_log)
+
+            # Itera sobre uma cópia, caso a lista seja modificada
+            for sub in list(self.subscribers):
+                try:
+                    sub.push(update)
+                except Exception as e:
+                    LOG.warning("push_failed", "Erro ao entregar estado, removendo inscrito",
+                                room_id=self.room_id, error=str(e))
+                    # Se der erro (ex: cliente desconectou), remove o inscrito
+                    self.unsubscribe(sub)
+
+            BROADCAST_TIME.observe(time.perf_counter() - start)
+
+    def _state_fields(self):
+        # Valores do estado na ordem de DELTA_FIELDS
+        return (
+            self.status,
+            self.player1_id or "",
+            self.player2_id or "",
+            self.player1_lives if self.player1_id is not None else 0,
+            self.player2_lives if self.player2_id is not None else 0,
+            self.current_turn_player_id or "",
+            self.clip_size - self.clip_cursor,
+            self.clip_live,
+            self.last_action_log,
+            self.winner_id or "",
+        )
+
+    def _get_state_proto(self, fields=None):
+        # Converte o estado interno da classe para a mensagem gRPC
+        if fields is None:
+            fields = self._state_fields()
+        (status, p1_name, p2_name, p1_lives, p2_lives, turn,
+         bullets, live_bullets, log, winner) = fields
+        return game_pb2.GameState(
+            room_id=self.room_id,
+            status=status,
+            player1_name=p1_name,
+            player2_name=p2_name,
+            player1_lives=p1_lives,
+            player2_lives=p2_lives,
+            current_turn_player_id=turn,
+            bullets_in_clip=bullets,
+            live_bullets_in_clip=live_bullets,
+            last_action_log=log,
+            winner_id=winner,
+            version=self.version,
+        )
+
+    def _describe(self, event):
+        return describe(event, (self.player1_id or "", self.player2_id or ""), self.clip_size - self.clip_cursor,
+                        self.clip_live, self.current_turn_player_id or "", self.winner_id or "")
+
+    def _get_compact_proto(self, fields):
+        # GameStateV2 sem sala, nomes e evento (ver _broadcast_state)
+        (status, p1_name, p2_name, p1_lives, p2_lives, turn,
+         bullets, live_bullets, log, winner) = fields
+        return game_pb2.GameStateV2(
+            version=self.version,
+            status=_STATUS_CODES[status],
+            player1_lives=p1_lives,
+            player2_lives=p2_lives,
+            turn_seat=self.seat(self.current_turn_player_id),
+            bullets_in_clip=bullets,
+            live_bullets_in_clip=live_bullets,
+            winner_seat=self.seat(self.winner_id),
+        )
+
+    def _get_delta_proto(self, fields):
+        # GameUpdate só com os campos que mudaram desde o último broadcast
+        delta = game_pb2.GameStateDelta(version=self.version)
+        last = self._last_fields
+        for i, field in enumerate(DELTA_FIELDS):
+            if fields[i] != last[i]:
+                setattr(delta, field, fields[i])
+        return game_pb2.GameUpdate(delta=delta)
+
+class RoomDraft(GameRoom):
+    """Cópia de trabalho de uma sala (GameRoom.draft): as jogadas mudam o
+    estado normalmente, mas o "broadcast" só conta a versão e monta o log,
+    sem serializar nem entregar nada. A sala publica o resultado com
+    load_state(draft.dump_state())."""
+
+    __slots__ = ()
+
+    def _broadcast_state(self):
+        self.version += 1
+        if self.last_event is not None:
+            self.last_action_log = self._describe(self.last_event)
@@ -0,0 +1,56 @@
+"""Regras do jogo que não dependem de uma sala: constantes e sorteios.
+
+Usado pelo GameRoom (servidor), pelo replay.py (auditoria) e pelo simulador,
+para que todos sorteiem exatamente a mesma coisa a partir da mesma semente.
+
+Gerador da sala: SplitMix64 indexado. O sorteio número 'draw' depende só da
+semente e da posição (rng_value), então o estado do gerador é só um contador
+de sorteios. Cada sala guarda a semente e o contador em dois inteiros, em
+vez de um random.Random (~2.5 KB).
+"""
+import game_pb2
+
+INITIAL_LIVES = 3
+MIN_BULLETS = 2
+MAX_BULLETS = 8
+
+SHOOT_OPPONENT = game_pb2.SHOOT_OPPONENT
+SHOOT_SELF = game_pb2.SHOOT_SELF
+QUIT_GAME = game_pb2.QUIT_GAME
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+def rng_value(seed, draw):
+    """Inteiro de 64 bits do sorteio número 'draw' (0, 1, 2, ...) da semente."""
+    z = (seed + (draw + 1) * GOLDEN_GAMMA) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def first_turn_seat(value):
+    # 0 = player1 começa, 1 = player2
+    return value & 1
+
+def clip_patterns(size, live):
+    # Todas as máscaras de 'size' bits com 'live' bits ligados (bit i = bala i é real)
+    return tuple(bits for bits in range(1 << size) if bin(bits).count("1") == live)
+
+CLIP_PATTERNS = {
+    (size, live): clip_patterns(size, live)
+    for size in range(MIN_BULLETS, MAX_BULLETS + 1)
+    for live in {size // 2, size // 2 + size % 2}
+}
+
+def load_clip(value):
+    """Pente sorteado com um único valor: (bits, balas, reais).
+
+    MIN_BULLETS a MAX_BULLETS balas, metade reais; com total ímpar, uma
+    moeda decide se a bala extra é real. As posições das reais são
+    uniformes entre todas as combinações."""
+    size = MIN_BULLETS + (value & 0xFFFF) % (MAX_BULLETS - MIN_BULLETS + 1)
+    live = size // 2
+    if size % 2 and (value >> 16) & 1:
+        live += 1
+    patterns = CLIP_PATTERNS[(size, live)]
+    return patterns[(value >> 17) % len(patterns)], size, live
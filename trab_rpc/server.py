@@ -1,246 +1,279 @@
 import grpc
 from concurrent import futures
-import time
+import os
 import threading
-import random
-import uuid
-import queue
 
 # Importa as classes geradas
 import game_pb2
 import game_pb2_grpc
 
-INITIAL_LIVES = 3
-
-# Classe interna do servidor para gerenciar o estado de UM jogo
-class GameRoom:
-    def __init__(self, room_name, host_name):
-        self.room_id = f"room-{uuid.uuid4().hex[:6]}"
-        self.room_name = room_name
-        self.players = {} # Dicionário de player_id -> { "name": str, "lives": int }
-        self.host_id = host_name
-        self.status = "WAITING"
-        self.clip = [] # Lista de booleanos: True = Real, False = Festim
-        self.current_turn_player_id = None
-        self.last_action_log = "Jogo criado. Esperando oponente..."
-        self.winner_id = None
-        
-        # Lista de "observadores" (clientes) para enviar updates (o stream do gRPC)
-        self.subscriber_queues = [] 
-        
-        # Lock individual para este jogo, essencial para concorrência
-        self.lock = threading.RLock() 
-        
-        # Adiciona o host
-        self.add_player(host_name)
+from registry import RoomRegistry
+from lobby import LobbyIndex
+from lifecycle import RoomLifecycle
+from journal import Journal
+from store import MemoryStore, SQLiteStore
+from room import GameRoom, new_room_id, embed_message, snapshot_update, compact_state
+from events import SCHEMA_V2
+from mailbox import Mailbox, SNAPSHOT_POLICY
+from matchmaking import MatchQueue
+from spectators import SpectatorHub, MAX_DELAY
+from metrics import REGISTRY, METRICS_PORT, MetricsInterceptor, start_http_server
+from ratelimit import AdmissionControl, RateLimitInterceptor, METHOD_LIMITS
+from sessions import SessionRegistry
+from hashring import HashRing
+from connection import SERVER_OPTIONS
+import gamelog
+
+LOG = gamelog.get_logger("server")
+
+FINISHED_ROOM_TTL = 60.0 # Segundos que uma sala em GAME_OVER continua existindo
+IDLE_ROOM_TTL = 300.0 # Segundos sem inscritos e sem jogadas até a sala ser recolhida
+DATA_DIR = os.environ.get("GAME_DATA_DIR", "game_data") # Journal e snapshots das salas
+# "sqlite": salas num banco compartilhado por vários processos (ver store.py)
+STORE_KIND = os.environ.get("GAME_STORE", "memory")
+STORE_PATH = os.environ.get("GAME_STORE_PATH", os.path.join(DATA_DIR, "rooms.db"))
+PORT = int(os.environ.get("GAME_PORT", "50051"))
+# Worker de um cluster (cluster.py): endereços de todos os workers e o deste
+CLUSTER = [address for address in os.environ.get("GAME_CLUSTER", "").split(",") if address]
+SERVER_ADDRESS = os.environ.get("GAME_SERVER_ADDRESS", "")
+CLUSTER_SECRET = os.environ.get("GAME_CLUSTER_SECRET", "") # Assina os tokens de sessão (ver sessions.py)
+RECOVERY_VERSION_GAP = 1000 # Versões puladas por uma sala recuperada do journal (ver GameRoom.restore)
+MAX_WORKERS = 64 # Threads do grpc.server
+# Cada stream aberto prende uma thread; as demais ficam livres para as RPCs unárias
+MAX_STREAMS = MAX_WORKERS - 16
+# Aqui cada espectador também prende uma thread: um canal não assiste mais
+# salas que isso (o servidor asyncio usa o ratelimit.MAX_SPECTATOR_STREAMS)
+MAX_SPECTATOR_STREAMS = 8
+RATE_LIMITS = os.environ.get("GAME_RATE_LIMITS", "1") != "0" # 0 desliga os limites por jogador (ex: para o loadgen.py)
+
+class Subscriber(Mailbox):
+    """Caixa de entrada de um stream de updates (versão com threads).
+
+    Recebe StateUpdates já serializados: o broadcast codifica o estado uma
+    única vez e entrega os mesmos bytes para todos os inscritos. A thread do
+    stream dorme em get() até chegar um estado novo ou o cliente desconectar
+    (close), sem acordar periodicamente. Limites e descarte: ver mailbox.py.
+    """
+
+    def __init__(self, policy=None):
+        super().__init__(policy)
+        self._cond = threading.Condition(threading.Lock())
+
+    def push(self, update):
+        with self._cond:
+            self._offer(update)
+            self._cond.notify()
+
+    def _wake(self):
+        self._cond.notify() # Chamado por _offer, já com o lock
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def get(self):
+        # Retorna o próximo StateUpdate, ou None se o stream foi fechado
+        with self._cond:
+            while not self.items and not self.closed:
+                self._cond.wait()
+            if not self.items:
+                return None
+            self._took()
+            return self.items.popleft()
+
+    def drain(self):
+        # Tudo o que já está na caixa, sem esperar
+        with self._cond:
+            items = list(self.items)
+            self.items.clear()
+            return items
 
-    def add_player(self, player_name):
-        # A lógica do jogo só aceita 2 jogadores
-        if len(self.players) >= 2:
-            raise Exception("Sala está cheia")
-        
-        player_id = player_name # Usando o nome como ID por simplicidade
-        self.players[player_id] = {"name": player_name, "lives": INITIAL_LIVES}
-        
-        if len(self.players) == 2:
-            self.start_game()
-        else:
-            self.last_action_log = f"{player_name} entrou na sala. Esperando oponente..."
-            self._broadcast_state()
-        
-        return player_id
-
-    def start_game(self):
-        self.status = "IN_GAME"
-        player_ids = list(self.players.keys())
-        self.current_turn_player_id = random.choice(player_ids)
-        self._load_clip()
-        self.last_action_log = f"Jogo iniciado! {len(self.clip)} balas no pente ({self.clip.count(True)} reais). Vez de {self.current_turn_player_id}."
-        self._broadcast_state()
-
-    def _load_clip(self):
-        # Lógica simples: 2 a 8 balas, ~metade real
-        total = random.randint(2, 8)
-        live = total // 2
-        if total % 2 != 0 and random.choice([True, False]): # Aleatoriedade extra
-             live += 1
-             
-        self.clip = [True] * live + [False] * (total - live)
-        random.shuffle(self.clip)
-        print(f"Sala {self.room_id}: Carregando pente. {total} balas, {live} reais. Pente: {self.clip}")
-
-    def get_opponent_id(self, player_id):
-        for pid in self.players.keys():
-            if pid != player_id:
-                return pid
-        return None
-
-    def make_move(self, player_id, action):
-        with self.lock:
-            # --- LÓGICA DE AÇÃO DO JOGO ---
-            # 1. Checa por desistência PRIMEIRO.
-            #    Isso é permitido a qualquer momento.
-            if action == game_pb2.QUIT_GAME:
-                self.players[player_id]["lives"] = 0
-                self.last_action_log = f"{player_id} desistiu."
-                
-                # Se o jogo nem começou, apenas define o vencedor como "Ninguém"
-                # ou o outro jogador, se ele existir
-                if self.status == "WAITING":
-                    self.status = "GAME_OVER"
-                    opponent = self.get_opponent_id(player_id)
-                    self.winner_id = opponent if opponent else "Ninguém"
-                    
-                # A checagem de vitória normal (abaixo)
-                # vai cuidar da lógica se o jogo estava IN_GAME.
-
-            # 2. Se não for desistência, faz as validações normais.
-            elif self.status != "IN_GAME":
-                raise Exception("Jogo não está ativo")
-            elif player_id != self.current_turn_player_id:
-                raise Exception("Não é o seu turno")
-
-            # 3. Executa a ação (apenas se não for desistência)
-            elif not self.clip: # 'elif' é importante aqui
-                self._load_clip()
-                self.last_action_log = f"Pente vazio. Recarregando! {len(self.clip)} balas ({self.clip.count(True)} reais)."
-                # O turno continua com o mesmo jogador
-            
-            elif action == game_pb2.SHOOT_SELF:
-                if not self.clip: # Checagem dupla por segurança
-                     self.last_action_log = "Pente vazio, mas _load_clip falhou?" # Log de segurança
-                     self._broadcast_state()
-                     return
-
-                is_live = self.clip.pop(0) # Pega a próxima bala
-                if is_live:
-                    self.players[player_id]["lives"] -= 1
-                    self.last_action_log = f"{player_id} atirou em si mesmo... ERA REAL! -1 vida. A vez passa."
-                    self.current_turn_player_id = self.get_opponent_id(player_id)
-                else:
-                    self.last_action_log = f"{player_id} atirou em si mesmo... FESTIM! A vez continua."
-                    # O turno não muda
-                    
-            elif action == game_pb2.SHOOT_OPPONENT:
-                if not self.clip: # Checagem dupla por segurança
-                     self.last_action_log = "Pente vazio, mas _load_clip falhou?" # Log de segurança
-                     self._broadcast_state()
-                     return
-                     
-                opponent_id = self.get_opponent_id(player_id)
-                is_live = self.clip.pop(0) # Pega a próxima bala
-                if is_live:
-                    self.players[opponent_id]["lives"] -= 1
-                    self.last_action_log = f"{player_id} atirou em {opponent_id}... ERA REAL! {opponent_id} perdeu 1 vida."
-                else:
-                    self.last_action_log = f"{player_id} atirou em {opponent_id}... FESTIM! Ninguém se feriu."
-                
-                # A vez sempre passa
-                self.current_turn_player_id = opponent_id
-            
-            # --- FIM DA LÓGICA DE AÇÃO ---
-
-            # 4. Checa condição de vitória
-            # Adiciona 'and self.status != "GAME_OVER"' para evitar definir o vencedor duas vezes
-            for pid, data in self.players.items():
-                if data["lives"] <= 0 and self.status != "GAME_OVER":
-                    self.winner_id = self.get_opponent_id(pid)
-                    if not self.winner_id: # Se não achou oponente (ex: desistiu no lobby)
-                        self.winner_id = "Ninguém"
-                        
-                    self.status = "GAME_OVER"
-                    self.last_action_log += f" FIM DE JOGO! {self.winner_id} venceu!"
-                    break # Encontrou um perdedor, pode parar
-
-            # 5. Notifica todos os clientes
-            self._broadcast_state()
-
-    def _broadcast_state(self):
-        # Envia o estado atual para TODOS os observadores
-        state_proto = self._get_state_proto()
-        print(f"Sala {self.room_id}: Transmitindo estado -> {self.last_action_log}")
-        
-        with self.lock:
-            # Itera sobre uma cópia, caso a lista seja modificada
-            for q in list(self.subscriber_queues):
-                try:
-                    q.put(state_proto) # Coloca o estado na fila do cliente
-                except Exception as e:
-                    print(f"Erro ao colocar na fila: {e}, removendo fila.")
-                    # Se der erro (ex: cliente desconectou), remove a fila
-                    if q in self.subscriber_queues:
-                        self.subscriber_queues.remove(q)
-
-    def _get_state_proto(self):
-        # Converte o estado interno da classe para a mensagem gRPC
-        pids = list(self.players.keys())
-        p1_name = ""
-        p1_lives = 0
-        p2_name = ""
-        p2_lives = 0
-
-        if len(pids) > 0:
-            p1_name = self.players[pids[0]]["name"]
-            p1_lives = self.players[pids[0]]["lives"]
-        if len(pids) > 1:
-            p2_name = self.players[pids[1]]["name"]
-            p2_lives = self.players[pids[1]]["lives"]
-
-        return game_pb2.GameState(
-            room_id=self.room_id,
-            status=self.status,
-            player1_name=p1_name,
-            player2_name=p2_name,
-            player1_lives=p1_lives,
-            player2_lives=p2_lives,
-            current_turn_player_id=self.current_turn_player_id or "",
-            bullets_in_clip=len(self.clip),
-            live_bullets_in_clip=self.clip.count(True),
-            last_action_log=self.last_action_log,
-            winner_id=self.winner_id or "",
-        )
-        
 # --- Implementação do Servidor gRPC ---
 
 # O "Gerenciador de Salas" global
-ROOMS = {} # Dicionário de room_id -> GameRoom
-ROOMS_LOCK = threading.Lock() # Lock para proteger o dicionário ROOMS
+ROOMS = RoomRegistry() # room_id -> GameRoom, dividido em shards (buscas sem lock)
+LOBBY = LobbyIndex() # Só as salas WAITING, atualizado pelos próprios GameRooms
+# Expira salas finalizadas e recolhe as abandonadas (uma thread para todas)
+LIFECYCLE = RoomLifecycle(ROOMS, finished_ttl=FINISHED_ROOM_TTL, idle_ttl=IDLE_ROOM_TTL)
+LIFECYCLE.removal_listeners.append(LOBBY.discard)
+# Grava as mudanças das salas em disco (ligado em serve, depois da recuperação)
+JOURNAL = Journal(DATA_DIR)
+# Onde as mudanças das salas ficam guardadas: ROOMS + JOURNAL, ou um banco
+# compartilhado com outros processos (ver store.py)
+if STORE_KIND == "sqlite":
+    STORE = SQLiteStore(ROOMS, STORE_PATH)
+    LIFECYCLE.busy_checks.append(STORE.in_use)
+else:
+    STORE = MemoryStore(ROOMS, JOURNAL)
+LIFECYCLE.removal_listeners.append(STORE.discard)
+# Tokens dos jogadores e índices jogador <-> sala (ver sessions.py)
+SESSIONS = SessionRegistry(CLUSTER_SECRET)
+LIFECYCLE.removal_listeners.append(SESSIONS.discard_room)
+
+# Dono de cada room_id no cluster (None num servidor sozinho)
+RING = HashRing(CLUSTER) if CLUSTER else None
+
+def owned_room_id():
+    """room_id novo para uma sala deste processo: num cluster, sorteia até
+    cair num que o anel manda para este worker, para a frente (e quem só
+    souber o room_id) achar a sala nele."""
+    while True:
+        room_id = new_room_id()
+        if RING is None or RING.owner(room_id) == SERVER_ADDRESS:
+            return room_id
+
+def register_room(room):
+    # Chamado com o lock da sala, logo depois de ROOMS.add. Registra o
+    # listener e entra no índice juntos, para não perder uma mudança de
+    # status que aconteça no meio
+    room.status_listeners.append(LOBBY.update)
+    LOBBY.update(room)
+    LIFECYCLE.track(room)
+
+def restore_sessions(room):
+    # Sessões dos assentos de uma sala que veio do disco ou de outro processo
+    for token, player_id in room.seat_sessions():
+        SESSIONS.restore(token, player_id, room.room_id)
+
+def adopt_room(room):
+    # Sala recuperada ou criada por outro processo (já em ROOMS, com o lock dela)
+    register_room(room)
+    restore_sessions(room)
+
+def drop_deleted_room(room_id):
+    # Sala apagada do banco compartilhado por outro processo
+    LIFECYCLE.remove(room_id, "apagada em outro processo")
+
+if STORE.shared:
+    STORE.loaded_listeners.append(adopt_room)
+    STORE.refreshed_listeners.append(restore_sessions)
+    STORE.deleted_listeners.append(drop_deleted_room)
+
+def create_match_room(host, guest):
+    """Sala de uma partida do FindMatch (host e guest são os Tickets). Os
+    dois jogadores entram antes da sala ir para o registro: ninguém a vê
+    esperando oponente no lobby nem consegue entrar no lugar do convidado."""
+    host_name, guest_name = host.player_name, guest.player_name
+    room = GameRoom(f"{host_name} x {guest_name}", host_name, room_id=owned_room_id())
+    room.add_player(guest_name)
+    host_session = SESSIONS.join(host_name, host.session_token, room.room_id)
+    try:
+        guest_session = SESSIONS.join(guest_name, guest.session_token, room.room_id)
+    except ValueError:
+        SESSIONS.leave(host_session, room.room_id)
+        raise
+    for ticket, session in ((host, host_session), (guest, guest_session)):
+        room.set_session(session.player_name, session.token)
+        ticket.session_token = session.token
+    STORE.add(room)
+    with room.lock:
+        register_room(room)
+    LOG.info("match_created", "Partida formada pelo matchmaking", room_id=room.room_id,
+             player_id=host_name, opponent_id=guest_name)
+    return room
+
+# Fila do FindMatch
+MATCHMAKER = MatchQueue(create_match_room, SERVER_ADDRESS)
+# Um stream compartilhado por sala para os espectadores (WatchGame)
+SPECTATORS = SpectatorHub()
+# Limites por jogador e teto de streams (ver ratelimit.py)
+ADMISSION = AdmissionControl(MAX_STREAMS, METHOD_LIMITS if RATE_LIMITS else {}, sessions=SESSIONS,
+                             secret=CLUSTER_SECRET, max_spectator_streams=MAX_SPECTATOR_STREAMS)
+
+def recover_rooms():
+    """Recria em ROOMS as salas salvas (journal em DATA_DIR ou o banco
+    compartilhado); retorna o último seq, para o STORE.start."""
+    states, last_seq = STORE.recover()
+    # No banco compartilhado as versões continuam as mesmas dos outros processos
+    version_gap = 0 if STORE.shared else RECOVERY_VERSION_GAP
+    for state in states.values():
+        room = GameRoom.restore(state, version_gap)
+        ROOMS.add(room)
+        with room.lock:
+            adopt_room(room)
+    return last_seq
+
+# --- Métricas calculadas na coleta (GET /metrics) ---
+
+def subscriber_stats():
+    """Percorre as salas sem pegar os locks delas (só lê tamanhos)."""
+    stats = {"game_subscribers": 0, "game_room_subscribers_max": 0, "game_subscriber_queued": 0,
+             "game_subscriber_queue_depth_max": 0}
+    for room in ROOMS.values():
+        subscribers = list(room.subscribers)
+        stats["game_subscribers"] += len(subscribers)
+        stats["game_room_subscribers_max"] = max(stats["game_room_subscribers_max"], len(subscribers))
+        for subscriber in subscribers:
+            depth = len(subscriber.items)
+            stats["game_subscriber_queued"] += depth
+            stats["game_subscriber_queue_depth_max"] = max(stats["game_subscriber_queue_depth_max"], depth)
+    return stats
+
+REGISTRY.gauge("game_rooms", "Salas no registro", lambda: len(ROOMS))
+REGISTRY.gauge("game_lobby_rooms", "Salas esperando oponente", lambda: len(LOBBY))
+REGISTRY.gauge("game_rooms_expired_total", "Salas finalizadas que expiraram",
+               lambda: LIFECYCLE.stats()["expired"], kind="counter")
+REGISTRY.gauge("game_rooms_reaped_total", "Salas abandonadas recolhidas",
+               lambda: LIFECYCLE.stats()["reaped"], kind="counter")
+REGISTRY.gauge("game_matchmaking_queue", "Jogadores esperando partida no FindMatch",
+               lambda: len(MATCHMAKER))
+REGISTRY.gauge("game_spectators", "Streams do WatchGame (total)",
+               lambda: SPECTATORS.stats()["spectators"])
+REGISTRY.gauge("game_spectated_rooms", "Salas com espectadores",
+               lambda: SPECTATORS.stats()["rooms"])
+REGISTRY.gauge("game_sessions", "Sessoes de jogadores com salas no registro",
+               lambda: SESSIONS.stats()["sessions"])
+REGISTRY.gauge("game_open_streams", "Streams abertos (contados pelo controle de admissao)",
+               lambda: ADMISSION.stats()["streams"])
+# Uma passada pelas salas por coleta, para as quatro
+REGISTRY.collector(subscriber_stats, (
+    ("game_subscribers", "Streams inscritos em salas (total)"),
+    ("game_room_subscribers_max", "Maior numero de inscritos numa sala"),
+    ("game_subscriber_queued", "Estados/acks esperando envio (todas as caixas)"),
+    ("game_subscriber_queue_depth_max", "Maior caixa de entrada de um inscrito"),
+))
 
 class GameServerImpl(game_pb2_grpc.GameServerServicer):
 
     def GetLobbies(self, request, context):
-        lobbies = []
-        with ROOMS_LOCK:
-            for room in ROOMS.values():
-                lobbies.append(game_pb2.RoomInfo(
-                    room_id=room.room_id,
-                    room_name=room.room_name,
-                    player_count=len(room.players),
-                    status=room.status
-                ))
-        return game_pb2.LobbyList(rooms=lobbies)
+        # Resposta já serializada, vinda do cache do índice
+        return LOBBY.query(request.page_size, request.page_token, request.name_prefix)
 
     def CreateRoom(self, request, context):
         try:
-            room = GameRoom(request.room_name, request.player_name)
-            with ROOMS_LOCK:
-                ROOMS[room.room_id] = room
+            room = GameRoom(request.room_name, request.player_name, room_id=owned_room_id())
+            session = SESSIONS.join(request.player_name, request.session_token, room.room_id)
+            room.set_session(request.player_name, session.token)
+            try:
+                STORE.add(room)
+            except KeyError:
+                SESSIONS.leave(session, room.room_id)
+                raise
+            with room.lock:
+                register_room(room)
             
-            print(f"Sala criada: {room.room_name} ({room.room_id}) por {request.player_name}")
+            LOG.info("room_created", "Sala criada", room_id=room.room_id,
+                     room_name=room.room_name, player_id=request.player_name)
             return game_pb2.RoomInfo(
                 room_id=room.room_id,
                 room_name=room.room_name,
                 player_count=1,
-                status=room.status
+                status=room.status,
+                session_token=session.token,
+                server_address=SERVER_ADDRESS,
             )
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+            context.set_details(str(e))
+            return game_pb2.RoomInfo()
         except Exception as e:
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"Erro ao criar sala: {e}")
             return game_pb2.RoomInfo()
 
     def JoinRoom(self, request, context):
-        with ROOMS_LOCK:
-            room = ROOMS.get(request.room_id)
+        room = STORE.get(request.room_id)
         
         if not room:
             context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -249,99 +282,396 @@ class GameServerImpl(game_pb2_grpc.GameServerServicer):
             
         try:
             with room.lock: # Garante que ninguém mais entre ao mesmo tempo
-                room.add_player(request.player_name)
+                session = SESSIONS.join(request.player_name, request.session_token, room.room_id)
+
+                def seat_player(target):
+                    target.add_player(request.player_name)
+                    target.set_session(request.player_name, session.token)
+
+                try:
+                    STORE.update(room, "join", seat_player)
+                except Exception:
+                    if not room.has_player(request.player_name):
+                        SESSIONS.leave(session, room.room_id)
+                    raise
             
-            print(f"{request.player_name} entrou na sala {room.room_name}")
+            LOG.info("room_joined", "Entrou na sala", room_id=room.room_id, player_id=request.player_name)
             return game_pb2.RoomInfo(
                 room_id=room.room_id,
                 room_name=room.room_name,
-                player_count=len(room.players),
-                status=room.status
+                player_count=room.player_count,
+                status=room.status,
+                session_token=session.token,
+                server_address=SERVER_ADDRESS,
             )
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+            context.set_details(str(e))
+            return game_pb2.RoomInfo()
         except Exception as e:
             context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
             context.set_details(f"Erro ao entrar na sala: {e}")
             return game_pb2.RoomInfo()
 
+    def FindMatch(self, request, context):
+        ticket = self._match_enqueue(request, context, Subscriber())
+        if ticket is None:
+            return
+        subscriber = ticket.subscriber
+        if not context.add_callback(subscriber.close):
+            MATCHMAKER.cancel(ticket)
+            return # O RPC já terminou
+
+        try:
+            if ticket.room_id is None:
+                yield QUEUED
+            # Dorme até o matchmaking formar a partida (ou o cliente desistir)
+            update = subscriber.get()
+            if update is None:
+                end_slow_stream(subscriber, context)
+                return
+            yield update
+        finally:
+            MATCHMAKER.cancel(ticket)
+
+    def _match_enqueue(self, request, context, subscriber):
+        # Coloca o jogador na fila; retorna o Ticket ou None com o erro no context
+        if not request.player_name:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Informe o player_name")
+            return None
+        try:
+            # Falha logo se o nome é de outro jogador, em vez de só ao parear
+            SESSIONS.check(request.player_name, request.session_token)
+            ticket = MATCHMAKER.enqueue(request.player_name, subscriber, request.session_token)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+            context.set_details(str(e))
+            return None
+        LOG.info("match_queued", "Entrou na fila do matchmaking", player_id=request.player_name,
+                 matched=ticket.room_id is not None)
+        return ticket
+
     def MakeMove(self, request, context):
-        with ROOMS_LOCK:
-            room = ROOMS.get(request.room_id)
+        room = STORE.get(request.room_id)
             
         if not room:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details("Sala não encontrada")
             return game_pb2.MoveResponse(success=False, error_message="Sala não encontrada")
+        player_id = self._authorize(request.room_id, request.player_id, request.session_token, context)
+        if player_id is None:
+            return game_pb2.MoveResponse(success=False, error_message=SESSION_DENIED)
 
-        try:
-            room.make_move(request.player_id, request.action)
-            return game_pb2.MoveResponse(success=True)
-        except Exception as e:
-            print(f"Erro na jogada: {e}")
+        # Com sequence, um retry da mesma jogada recebe o resultado da primeira vez
+        result = STORE.apply_move(room, player_id, request.action, request.sequence)
+
+        if result.error is not None:
+            LOG.info("move_rejected", "Erro na jogada", room_id=request.room_id,
+                     player_id=player_id, error=result.error, duplicate=result.duplicate)
             context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
-            context.set_details(str(e))
-            return game_pb2.MoveResponse(success=False, error_message=str(e))
+            context.set_details(result.error)
+            return game_pb2.MoveResponse(success=False, error_message=result.error,
+                                         state_version=result.version, duplicate=result.duplicate)
+        return game_pb2.MoveResponse(success=True, state_version=result.version, duplicate=result.duplicate)
+
+    def _authorize(self, room_id, player_id, session_token, context):
+        """Jogador do token, se ele está na sala (e é o player_id, quando
+        informado); senão None com PERMISSION_DENIED no context."""
+        player = SESSIONS.player_in(session_token, room_id)
+        if player is None or (player_id and player_id != player):
+            context.set_code(grpc.StatusCode.PERMISSION_DENIED)
+            context.set_details(SESSION_DENIED)
+            return None
+        return player
+
+    def _subscribe_allowed(self, request, context):
+        # Quem se inscreve como jogador (player_id ou token) precisa da sessão;
+        # sem nenhum dos dois, só acompanha a sala
+        if not request.player_id and not request.session_token:
+            return True
+        return self._authorize(request.room_id, request.player_id, request.session_token, context) is not None
 
     def SubscribeToGameUpdates(self, request, context):
-        with ROOMS_LOCK:
-            room = ROOMS.get(request.room_id)
+        # Só snapshots completos: versões atrasadas podem ser puladas
+        return self._stream_updates(request, context, lambda update: update.state, SNAPSHOT_POLICY)
+
+    def StreamGameUpdates(self, request, context):
+        return self._stream_updates(request, context, update_encoder(request.schema_version))
+
+    def _stream_updates(self, request, context, encode, policy=None):
+        # Corpo comum dos dois streams; 'encode' escolhe os bytes de cada
+        # StateUpdate e 'policy' a da caixa de entrada (ver mailbox.py)
+        room = STORE.get(request.room_id)
 
         if not room:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details("Sala não encontrada")
             return
+        if not self._subscribe_allowed(request, context):
+            return
 
-        print(f"{request.player_id} se inscreveu para updates da sala {request.room_id}")
+        LOG.info("subscribed", "Inscrito para updates", room_id=request.room_id, player_id=request.player_id)
         
-        # 1. Cria uma fila ÚNICA para este cliente
-        update_queue = queue.Queue()
-        
-        # 2. Adiciona a fila à lista de assinantes da sala
-        with room.lock:
-            room.subscriber_queues.append(update_queue)
+        # 1. Cria uma caixa de entrada ÚNICA para este cliente
+        subscriber = Subscriber(policy)
+
+        # 2. Quando o cliente desconectar, o gRPC fecha a caixa e acorda o stream
+        if not context.add_callback(subscriber.close):
+            return # O RPC já terminou
+
+        # 3. Inscreve na sala (já recebe o estado atual, ou o que perdeu) e
+        #    manda os headers: numa reconexão já atualizada nenhum estado é
+        #    enviado, e é por eles que o cliente sabe que a inscrição valeu
+        room.subscribe(subscriber, request.resume_from_version)
+        context.send_initial_metadata(())
 
         try:
-            # 3. Envia o estado atual imediatamente
-            # (O 'add_player' já terá colocado o estado de "espera" na fila)
-            # Vamos garantir que ele pegue o estado mais recente
-            initial_state = room._get_state_proto()
-            update_queue.put(initial_state)
-
-            # 4. Loop principal: espera por atualizações na fila e 'yield' (envia)
-            while context.is_active():
-                try:
-                    # Bloqueia a thread até uma nova atualização chegar (com timeout)
-                    state = update_queue.get(timeout=1.0) 
-                    
-                    yield state # ENVIA O ESTADO PARA O CLIENTE
-                    
-                    # Se o jogo acabou, para de escutar
-                    if state.status == "GAME_OVER":
-                        break
-                except queue.Empty:
-                    # Timeout de 1s, apenas checa se o cliente ainda está ativo
-                    continue 
+            # 4. Loop principal: dorme até chegar um estado novo e 'yield' (envia)
+            while True:
+                update = subscriber.get()
+                if update is None:
+                    end_slow_stream(subscriber, context)
+                    break # Cliente desconectou (ou era lento demais)
+
+                yield encode(update) # ENVIA O ESTADO (já serializado) PARA O CLIENTE
+                
+                # Se o jogo acabou, para de escutar
+                if update.final:
+                    break
         
         except Exception as e:
-            print(f"Erro no stream para {request.player_id}: {e}")
+            LOG.error("stream_failed", "Erro no stream", room_id=request.room_id,
+                      player_id=request.player_id, error=str(e))
         
         finally:
-            # 5. Limpeza: Remove a fila da lista quando o cliente desconectar
-            print(f"{request.player_id} desconectou da sala {request.room_id}")
-            with room.lock:
-                if update_queue in room.subscriber_queues:
-                    room.subscriber_queues.remove(update_queue)
+            # 5. Limpeza: Remove a caixa da lista quando o cliente desconectar
+            LOG.info("unsubscribed", "Desconectou da sala", room_id=request.room_id, player_id=request.player_id)
+            room.unsubscribe(subscriber)
+
+    def PlayGame(self, request_iterator, context):
+        # 1. A primeira mensagem diz a sala e o jogador
+        first = next(request_iterator, None)
+        room, join = self._play_join(first, context)
+        if not room:
+            return
+
+        LOG.info("play_joined", "Entrou no PlayGame", room_id=join.room_id, player_id=join.player_id)
+        encode = play_event_encoder(join.schema_version)
+        subscriber = Subscriber()
+        if not context.add_callback(subscriber.close):
+            return # O RPC já terminou
+        room.subscribe(subscriber, join.resume_from_version)
+        context.send_initial_metadata(()) # Confirma a inscrição (ver _stream_updates)
+
+        # 2. As jogadas são lidas em outra thread; os acks entram na mesma
+        #    caixa de entrada dos estados, então saem na ordem certa
+        reader = threading.Thread(
+            target=self._play_moves,
+            args=(room, join.player_id, request_iterator, subscriber),
+            daemon=True,
+        )
+        reader.start()
+
+        try:
+            while True:
+                item = subscriber.get()
+                if item is None:
+                    end_slow_stream(subscriber, context)
+                    break # Cliente desconectou (ou era lento demais)
+
+                yield encode(item)
+
+                if not isinstance(item, bytes) and item.final:
+                    # Fim de jogo: espera a jogada em andamento (que segura o
+                    # lock da sala até enfileirar o ack) e manda o que faltou
+                    with room.lock:
+                        pass
+                    for pending in subscriber.drain():
+                        if isinstance(pending, bytes):
+                            yield pending
+                    break
+
+        except Exception as e:
+            LOG.error("play_failed", "Erro no PlayGame", room_id=join.room_id,
+                      player_id=join.player_id, error=str(e))
+
+        finally:
+            LOG.info("play_left", "Saiu do PlayGame", room_id=join.room_id, player_id=join.player_id)
+            room.unsubscribe(subscriber)
+
+    def WatchGame(self, request, context):
+        spectator = self._watch_join(request, context)
+        if spectator is None:
+            return
+        if not context.add_callback(spectator.close):
+            SPECTATORS.leave(spectator)
+            return # O RPC já terminou
+
+        try:
+            while True:
+                update = spectator.get()
+                if update is None:
+                    break # Cliente desconectou
+                yield update.state # Os mesmos bytes para todos os espectadores
+                if update.final:
+                    break
+        finally:
+            SPECTATORS.leave(spectator)
+
+    def _watch_join(self, request, context):
+        # Valida o WatchGame e entra como espectador; retorna o Spectator ou
+        # None com o erro no context
+        if not 0 <= request.delay_seconds <= MAX_DELAY:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"delay_seconds deve estar entre 0 e {MAX_DELAY:g}")
+            return None
+        room = STORE.get(request.room_id)
+        if not room:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Sala não encontrada")
+            return None
+        try:
+            spectator = SPECTATORS.join(room, request.delay_seconds)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+            return None
+        LOG.info("watching", "Espectador entrou", room_id=request.room_id, delay=request.delay_seconds)
+        return spectator
+
+    def _play_join(self, first, context):
+        # Valida o 'join'; retorna (sala, join) ou (None, None) com o erro no context
+        if first is None or first.WhichOneof("kind") != "join":
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("A primeira mensagem do PlayGame deve ser 'join'")
+            return None, None
+
+        join = first.join
+        room = STORE.get(join.room_id)
+        if not room:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Sala não encontrada")
+            return None, None
+        player_id = self._authorize(join.room_id, join.player_id, join.session_token, context)
+        if player_id is None:
+            return None, None
+        join.player_id = player_id
+        return room, join
+
+    def _play_moves(self, room, player_id, request_iterator, subscriber):
+        try:
+            for request in request_iterator:
+                if request.WhichOneof("kind") == "move":
+                    play_move(room, player_id, request.move, subscriber)
+        except Exception:
+            pass # O stream de entrada fecha com erro quando o RPC é cancelado
+
+def end_slow_stream(subscriber, context):
+    # Caixa fechada por lentidão: o cliente recebe o motivo e pode reconectar
+    if subscriber.close_reason:
+        context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+        context.set_details(f"{subscriber.close_reason}. Reconecte com resume_from_version.")
+
+def play_move(room, player_id, move, subscriber):
+    """Aplica uma jogada do PlayGame e entrega o PlayEvent(ack) serializado.
+
+    Segura o lock da sala até o ack estar na caixa de entrada: a versão do
+    ack é exatamente a do estado gerado pela jogada, e o ack sempre chega
+    depois desse estado."""
+    with room.lock:
+        result = STORE.apply_move(room, player_id, move.action, move.sequence)
+        ack = game_pb2.ActionAck(action_id=move.action_id, success=result.error is None,
+                                 error_message=result.error or "", state_version=result.version,
+                                 duplicate=result.duplicate)
+        subscriber.push(game_pb2.PlayEvent(ack=ack).SerializeToString())
+
+SESSION_DENIED = "Sessão inválida: use o session_token de quem está nesta sala"
+
+# Resposta de quem entrou na fila e ainda não tem oponente
+QUEUED = game_pb2.MatchUpdate(status="QUEUED").SerializeToString()
+
+def encode_play_event(item):
+    # Acks já chegam como PlayEvent serializado; estados viram PlayEvent(state=...)
+    if isinstance(item, bytes):
+        return item
+    return embed_message(1, item.state)
+
+def encode_compact_play_event(item):
+    # Como encode_play_event, com PlayEvent(compact=<GameStateV2>) (campo 3)
+    if isinstance(item, bytes):
+        return item
+    return embed_message(3, compact_state(item))
+
+def play_event_encoder(schema_version):
+    # O PlayGame manda GameStateV2 para quem pediu no 'join'
+    return encode_compact_play_event if schema_version >= SCHEMA_V2 else encode_play_event
+
+def encode_game_update(update):
+    # Delta quando o cliente já tem a versão anterior; senão o estado completo
+    if update.delta is None:
+        return snapshot_update(update)
+    return update.delta
+
+def encode_compact_update(update):
+    # GameUpdate(compact=<GameStateV2>): o compact é o campo 3
+    return embed_message(3, compact_state(update))
+
+def update_encoder(schema_version):
+    # O StreamGameUpdates manda GameStateV2 para quem pediu; senão snapshot e deltas
+    return encode_compact_update if schema_version >= SCHEMA_V2 else encode_game_update
+
+def _serialize(message):
+    # Estados já serializados pelo broadcast (bytes) passam direto
+    if isinstance(message, bytes):
+        return message
+    return message.SerializeToString()
+
+_HANDLER_FACTORIES = {
+    (False, False): grpc.unary_unary_rpc_method_handler,
+    (False, True): grpc.unary_stream_rpc_method_handler,
+    (True, False): grpc.stream_unary_rpc_method_handler,
+    (True, True): grpc.stream_stream_rpc_method_handler,
+}
+
+def add_servicer_to_server(servicer, server):
+    """Equivalente a game_pb2_grpc.add_GameServerServicer_to_server, mas
+    aceitando respostas já serializadas (bytes). Serve para grpc.server e
+    grpc.aio.server."""
+    service = game_pb2.DESCRIPTOR.services_by_name['GameServer']
+    handlers = {}
+    for method in service.methods:
+        factory = _HANDLER_FACTORIES[(method.client_streaming, method.server_streaming)]
+        handlers[method.name] = factory(
+            getattr(servicer, method.name),
+            request_deserializer=getattr(game_pb2, method.input_type.name).FromString,
+            response_serializer=_serialize,
+        )
+    server.add_generic_rpc_handlers(
+        (grpc.method_handlers_generic_handler(service.full_name, handlers),))
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    game_pb2_grpc.add_GameServerServicer_to_server(GameServerImpl(), server)
-    server.add_insecure_port('[::]:50051')
+    gamelog.configure_from_env()
+    # Recupera as salas da execução anterior antes de aceitar conexões
+    last_seq = recover_rooms()
+    STORE.start(last_seq)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=MAX_WORKERS),
+                         interceptors=(MetricsInterceptor(REGISTRY), RateLimitInterceptor(ADMISSION)),
+                         options=SERVER_OPTIONS)
+    add_servicer_to_server(GameServerImpl(), server)
+    server.add_insecure_port(f'[::]:{PORT}')
     server.start()
-    print("Servidor gRPC iniciado na porta 50051.")
+    LIFECYCLE.start()
+    SPECTATORS.start()
+    start_http_server(REGISTRY, METRICS_PORT)
+    LOG.info("server_started", "Servidor gRPC iniciado", port=PORT, store=STORE_KIND,
+             metrics=f"http://127.0.0.1:{METRICS_PORT}/metrics")
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
-        print("Servidor parando...")
+        LOG.info("server_stopping", "Servidor parando...")
         server.stop(0)
+        STORE.stop()
 
 if __name__ == '__main__':
     serve()
\ No newline at end of file
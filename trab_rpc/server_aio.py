@@ -0,0 +1,297 @@
+import asyncio
+import grpc
+
+# Reaproveita as salas e a lógica do servidor com threads
+from server import (GameServerImpl, LIFECYCLE, STORE, STORE_KIND, PORT, MATCHMAKER, SPECTATORS, ADMISSION, QUEUED,
+                    SERVER_OPTIONS, recover_rooms, add_servicer_to_server, update_encoder, play_event_encoder,
+                    play_move, end_slow_stream)
+from mailbox import Mailbox, SlowConsumer, SNAPSHOT_POLICY
+from metrics import REGISTRY, METRICS_PORT, AsyncMetricsInterceptor, start_http_server
+from ratelimit import AsyncRateLimitInterceptor, MAX_SPECTATOR_STREAMS
+import gamelog
+
+LOG = gamelog.get_logger("server_aio")
+
+MAX_STREAMS = 20000 # Streams abertos ao mesmo tempo (cada um é só uma corrotina)
+
+class AsyncSubscriber(Mailbox):
+    """Caixa de entrada de um stream asyncio.
+
+    Mesma interface de server.Subscriber: o GameRoom chama push() de
+    qualquer thread com o StateUpdate já serializado. Quando o push vem de outra
+    thread, a entrega é repassada ao event loop com call_soon_threadsafe; o
+    stream fica suspenso em 'await' sem ocupar nenhuma thread.
+
+    Limites e descarte: ver mailbox.py. Numa entrega repassada ao loop, o
+    SlowConsumer não chega ao GameRoom; ele vê a caixa fechada no próximo push.
+    """
+
+    def __init__(self, loop, policy=None):
+        super().__init__(policy)
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def push(self, update):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._deliver(update)
+        elif self.close_reason:
+            raise SlowConsumer(self.close_reason)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver_later, update)
+
+    def _deliver(self, update):
+        self._offer(update)
+        self._event.set()
+
+    def _deliver_later(self, update):
+        try:
+            self._deliver(update)
+        except SlowConsumer:
+            pass
+
+    def _wake(self):
+        self._event.set()
+
+    def close(self):
+        # Chamado no event loop: o stream sai do get() com None
+        self.closed = True
+        self._event.set()
+
+    async def get(self):
+        # Retorna o próximo item, ou None se a caixa foi fechada por lentidão
+        while not self.items and not self.closed:
+            self._event.clear()
+            await self._event.wait()
+        if not self.items:
+            return None
+        self._took()
+        return self.items.popleft()
+
+    def drain(self):
+        # Tudo o que já está na caixa, sem esperar
+        items = list(self.items)
+        self.items.clear()
+        return items
+
+async def offload(fn, *args):
+    """Roda fn(*args) fora do event loop se ela pode bloquear.
+
+    Com o store em memória, as chamadas que mexem nas salas só pegam locks
+    rápidos e rodam direto no loop. Com o store compartilhado (SQLite), elas
+    leem e gravam o banco com o lock da sala, e uma escrita disputada espera
+    até store.BUSY_TIMEOUT_MS: rodam numa thread, para não parar todos os
+    streams do servidor. O lock de uma sala também entra aqui, porque pode
+    estar com quem grava."""
+    if STORE.shared:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+class AsyncGameServerImpl(GameServerImpl):
+    # As RPCs unárias reaproveitam a versão síncrona; as que mexem no store
+    # vão para uma thread quando ele é compartilhado (ver offload)
+
+    async def GetLobbies(self, request, context):
+        return super().GetLobbies(request, context) # Só o índice em memória
+
+    async def CreateRoom(self, request, context):
+        return await offload(super().CreateRoom, request, context)
+
+    async def JoinRoom(self, request, context):
+        return await offload(super().JoinRoom, request, context)
+
+    async def MakeMove(self, request, context):
+        return await offload(super().MakeMove, request, context)
+
+    # O grpc.aio só trata como assíncronos handlers que são 'async def',
+    # por isso cada stream repassa o gerador comum explicitamente
+
+    async def SubscribeToGameUpdates(self, request, context):
+        async for data in self._stream_updates(request, context, lambda update: update.state, SNAPSHOT_POLICY):
+            yield data
+
+    async def StreamGameUpdates(self, request, context):
+        async for data in self._stream_updates(request, context, update_encoder(request.schema_version)):
+            yield data
+
+    async def FindMatch(self, request, context):
+        # Parear cria a sala no store
+        ticket = await offload(self._match_enqueue, request, context, AsyncSubscriber(asyncio.get_running_loop()))
+        if ticket is None:
+            return
+
+        try:
+            if ticket.room_id is None:
+                yield QUEUED
+            # Espera o matchmaking formar a partida; se o cliente desistir,
+            # o grpc.aio cancela a corrotina aqui e o finally tira da fila
+            update = await ticket.subscriber.get()
+            if update is None:
+                end_slow_stream(ticket.subscriber, context)
+                return
+            yield update
+        finally:
+            MATCHMAKER.cancel(ticket)
+
+    async def WatchGame(self, request, context):
+        spectator = await offload(self._watch_join, request, context)
+        if spectator is None:
+            return
+
+        try:
+            while True:
+                # Se o cliente desconectar, o grpc.aio cancela a corrotina aqui
+                update = await spectator.get_async()
+                yield update.state # Os mesmos bytes para todos os espectadores
+                if update.final:
+                    break
+        finally:
+            SPECTATORS.leave(spectator)
+
+    async def _stream_updates(self, request, context, encode, policy=None):
+        room = await offload(STORE.get, request.room_id)
+
+        if not room:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Sala não encontrada")
+            return
+        if not self._subscribe_allowed(request, context):
+            return
+
+        LOG.info("subscribed", "Inscrito para updates", room_id=request.room_id, player_id=request.player_id)
+
+        subscriber = AsyncSubscriber(asyncio.get_running_loop(), policy)
+        await offload(room.subscribe, subscriber, request.resume_from_version)
+        await context.send_initial_metadata(()) # Confirma a inscrição (ver server._stream_updates)
+
+        try:
+            while True:
+                # Espera (sem polling) até a sala publicar um novo estado.
+                # Se o cliente desconectar, o grpc.aio cancela a corrotina aqui.
+                update = await subscriber.get()
+                if update is None:
+                    end_slow_stream(subscriber, context)
+                    break
+
+                yield encode(update) # ENVIA O ESTADO (já serializado) PARA O CLIENTE
+
+                # Se o jogo acabou, para de escutar
+                if update.final:
+                    break
+
+        except Exception as e:
+            LOG.error("stream_failed", "Erro no stream", room_id=request.room_id,
+                      player_id=request.player_id, error=str(e))
+
+        finally:
+            # Limpeza: Remove a fila da lista quando o cliente desconectar
+            LOG.info("unsubscribed", "Desconectou da sala", room_id=request.room_id, player_id=request.player_id)
+            await offload(room.unsubscribe, subscriber)
+
+    async def PlayGame(self, request_iterator, context):
+        # 1. A primeira mensagem diz a sala e o jogador
+        requests = request_iterator.__aiter__()
+        try:
+            first = await requests.__anext__()
+        except StopAsyncIteration:
+            first = None
+        room, join = await offload(self._play_join, first, context)
+        if not room:
+            return
+
+        LOG.info("play_joined", "Entrou no PlayGame", room_id=join.room_id, player_id=join.player_id)
+        encode = play_event_encoder(join.schema_version)
+        subscriber = AsyncSubscriber(asyncio.get_running_loop())
+        await offload(room.subscribe, subscriber, join.resume_from_version)
+        await context.send_initial_metadata(())
+
+        # 2. As jogadas são lidas por outra tarefa; os acks entram na mesma
+        #    caixa de entrada dos estados, então saem na ordem certa
+        reader = asyncio.create_task(self._play_moves(room, join.player_id, requests, subscriber))
+        reader.add_done_callback(lambda task: _reader_done(task, join, subscriber))
+
+        try:
+            while True:
+                item = await subscriber.get()
+                if item is None:
+                    end_slow_stream(subscriber, context)
+                    break
+
+                yield encode(item)
+
+                if not isinstance(item, bytes) and item.final:
+                    # Fim de jogo: manda o ack da jogada final, se já estiver na caixa
+                    await offload(_wait_unlocked, room)
+                    for pending in subscriber.drain():
+                        if isinstance(pending, bytes):
+                            yield pending
+                    break
+
+        except Exception as e:
+            LOG.error("play_failed", "Erro no PlayGame", room_id=join.room_id,
+                      player_id=join.player_id, error=str(e))
+
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except (asyncio.CancelledError, Exception):
+                pass # Cancelada aqui, ou o erro já foi registrado por _reader_done
+            LOG.info("play_left", "Saiu do PlayGame", room_id=join.room_id, player_id=join.player_id)
+            await offload(room.unsubscribe, subscriber)
+
+    async def _play_moves(self, room, player_id, requests, subscriber):
+        async for request in requests:
+            if request.WhichOneof("kind") == "move":
+                await offload(play_move, room, player_id, request.move, subscriber)
+
+def _reader_done(task, join, subscriber):
+    # A leitura das jogadas acabou. Sem erro, o cliente só fechou o lado dele
+    # e continua recebendo os estados; com erro, o stream termina junto
+    if task.cancelled() or task.exception() is None:
+        return
+    LOG.warning("play_moves_failed", "Erro ao ler as jogadas do PlayGame", room_id=join.room_id,
+                player_id=join.player_id, error=str(task.exception()))
+    subscriber.close()
+
+def _wait_unlocked(room):
+    # Espera quem está com o lock da sala terminar (ex: o ack da jogada final)
+    with room.lock:
+        pass
+
+async def serve():
+    gamelog.configure_from_env()
+    # Recupera as salas da execução anterior antes de aceitar conexões
+    last_seq = recover_rooms()
+    STORE.start(last_seq)
+    # Sem ThreadPoolExecutor: cada stream é uma corrotina, então o número de
+    # inscrições simultâneas não é limitado pelo número de threads (o teto
+    # de streams do controle de admissão só protege a memória)
+    ADMISSION.max_streams = MAX_STREAMS
+    ADMISSION.max_spectator_streams = MAX_SPECTATOR_STREAMS
+    server = grpc.aio.server(
+        interceptors=(AsyncMetricsInterceptor(REGISTRY), AsyncRateLimitInterceptor(ADMISSION)),
+        options=SERVER_OPTIONS)
+    add_servicer_to_server(AsyncGameServerImpl(), server)
+    server.add_insecure_port(f'[::]:{PORT}')
+    await server.start()
+    LIFECYCLE.start()
+    SPECTATORS.start()
+    start_http_server(REGISTRY, METRICS_PORT)
+    LOG.info("server_started", "Servidor gRPC (asyncio) iniciado", port=PORT, store=STORE_KIND,
+             metrics=f"http://127.0.0.1:{METRICS_PORT}/metrics")
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(0)
+        STORE.stop()
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        LOG.info("server_stopping", "Servidor parando...")
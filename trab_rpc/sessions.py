@@ -0,0 +1,149 @@
+"""Sessões dos jogadores: tokens e índices jogador <-> sala.
+
+Dentro da sala o player_id continua sendo o nome, mas usar um nome agora
+exige provar que é a mesma pessoa:
+- CreateRoom, JoinRoom e FindMatch devolvem um token opaco (session_token),
+  um por jogador. O cliente manda esse token nas chamadas seguintes.
+- Um nome pertence a uma sessão enquanto ela tiver salas no registro. Quem
+  tentar usá-lo sem o token recebe ALREADY_EXISTS. Quando as salas da
+  sessão são removidas (lifecycle), o nome fica livre de novo.
+- MakeMove, PlayGame e as inscrições de jogadores são autorizadas pelo
+  token. Token -> sessão é um dict e as salas de cada sessão são um set,
+  então checar é O(1), sem percorrer as salas.
+- O token de cada assento é salvo com a sala (GameRoom.player1_session e
+  player2_session) e vai para o journal. recover_rooms reconstrói os
+  índices (restore), então as sessões sobrevivem a um restart.
+- Num cluster (cluster.py) cada worker tem o próprio registro, mas todos
+  recebem o mesmo segredo: o token leva uma assinatura (HMAC do nome), e
+  um worker aceita o token que outro deu para o mesmo nome. O cliente usa
+  um token só, em qualquer worker em que a próxima partida cair.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+
+TOKEN_BYTES = 18 # Bytes aleatórios do token (24 caracteres em base64)
+SIGNATURE_BYTES = 12 # Bytes do HMAC nos tokens assinados (16 caracteres)
+
+def sign(secret, text):
+    """Assinatura (HMAC) de 'text' com o segredo do cluster, em base64."""
+    digest = hmac.new(secret, text.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode()
+
+class Session:
+    __slots__ = ("token", "player_name", "rooms")
+
+    def __init__(self, token, player_name):
+        self.token = token
+        self.player_name = player_name
+        self.rooms = set() # room_ids em que o jogador está
+
+class SessionRegistry:
+    """Índices token -> sessão, nome -> sessão e sala -> sessões."""
+
+    def __init__(self, secret=""):
+        self._secret = secret.encode() # Segredo do cluster ("" = tokens sem assinatura)
+        self._lock = threading.Lock()
+        self._by_token = {}
+        self._by_name = {}
+        self._by_room = {} # room_id -> [sessões dos jogadores da sala]
+
+    def _claim(self, player_name, token):
+        # Chamado com _lock: a sessão que pode usar o nome, ou ValueError
+        session = self._by_token.get(token) if token else None
+        if session is not None and session.player_name == player_name:
+            return session
+        holder = self._by_name.get(player_name)
+        if holder is not None and holder.rooms:
+            raise ValueError(f"O nome {player_name} está em uso por outro jogador")
+        if token and self._signed(token, player_name):
+            return Session(token, player_name) # Token que outro worker do cluster deu
+        return Session(self._new_token(player_name), player_name)
+
+    def _sign(self, nonce, player_name):
+        return sign(self._secret, f"{nonce}:{player_name}")
+
+    def _new_token(self, player_name):
+        token = secrets.token_urlsafe(TOKEN_BYTES)
+        if self._secret:
+            token = f"{token}.{self._sign(token, player_name)}"
+        return token
+
+    def _signed(self, token, player_name):
+        nonce, _, signature = token.rpartition(".")
+        return bool(self._secret and nonce) and hmac.compare_digest(signature, self._sign(nonce, player_name))
+
+    def check(self, player_name, token=""):
+        """ValueError se 'player_name' é de outra sessão (sem mudar nada)."""
+        with self._lock:
+            self._claim(player_name, token)
+
+    def join(self, player_name, token, room_id):
+        """Põe o jogador na sala: retorna a sessão dele (a do token ou uma
+        nova). ValueError se o nome é de outra sessão."""
+        with self._lock:
+            session = self._claim(player_name, token)
+            self._add(session, room_id)
+            return session
+
+    def _add(self, session, room_id):
+        self._by_token[session.token] = session
+        self._by_name[session.player_name] = session
+        if room_id not in session.rooms:
+            session.rooms.add(room_id)
+            self._by_room.setdefault(room_id, []).append(session)
+
+    def leave(self, session, room_id):
+        # Desfaz um join (ex: a sala estava cheia)
+        with self._lock:
+            self._remove(session, room_id)
+            sessions = self._by_room.get(room_id)
+            if sessions is not None and session in sessions:
+                sessions.remove(session)
+                if not sessions:
+                    del self._by_room[room_id]
+
+    def _remove(self, session, room_id):
+        session.rooms.discard(room_id)
+        if not session.rooms:
+            # Sem salas: a sessão acaba e o nome fica livre
+            self._by_token.pop(session.token, None)
+            if self._by_name.get(session.player_name) is session:
+                del self._by_name[session.player_name]
+
+    def discard_room(self, room_id):
+        # Listener do RoomLifecycle: a sala saiu do registro
+        with self._lock:
+            for session in self._by_room.pop(room_id, ()):
+                self._remove(session, room_id)
+
+    def restore(self, token, player_name, room_id):
+        # Recuperação do journal: o token salvo no assento volta a valer
+        with self._lock:
+            session = self._by_token.get(token)
+            if session is None:
+                session = Session(token, player_name)
+            self._add(session, room_id)
+
+    def player_of(self, token):
+        """Nome do jogador da sessão do token, se ela existe; senão None."""
+        session = self._by_token.get(token) if token else None
+        return session.player_name if session is not None else None
+
+    def player_in(self, token, room_id):
+        """Nome do jogador do token, se ele está na sala; senão None."""
+        session = self._by_token.get(token) if token else None
+        if session is None or room_id not in session.rooms:
+            return None
+        return session.player_name
+
+    def rooms_of(self, player_name):
+        # Salas em que o jogador (dono atual do nome) está
+        with self._lock:
+            session = self._by_name.get(player_name)
+            return set(session.rooms) if session is not None else set()
+
+    def stats(self):
+        return {"sessions": len(self._by_token), "players": len(self._by_name)}
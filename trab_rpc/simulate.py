@@ -0,0 +1,280 @@
+"""Simulador Monte Carlo das regras do jogo, vetorizado com NumPy.
+
+Joga milhões de partidas ao mesmo tempo, em arrays (uma posição por
+partida), com as mesmas regras do GameRoom.make_move e os mesmos sorteios
+(rules.py): com a mesma semente, a partida simulada é a mesma que o servidor
+jogaria. Serve para calibrar INITIAL_LIVES e o pente (MIN_BULLETS a
+MAX_BULLETS balas, metade reais) olhando:
+- vitórias de quem começa jogando e de cada política;
+- distribuição da duração das partidas (jogadas, contando as recargas);
+- frequência de recargas do pente.
+
+As políticas são plugáveis: uma função (view, rng) -> array de bool
+(True = atira em si mesmo) para as partidas em que é a vez dela; 'view'
+tem só o que o cliente vê no GameState. Ver POLICIES, ou passe
+"modulo:funcao" na linha de comando.
+
+Uso:
+  python simulate.py --games 1000000 --p1 odds --p2 random
+  python simulate.py --lives 4 --bullets 3 8     # testa outras regras
+  python simulate.py --check 2000                # confere contra o replay.py
+"""
+import argparse
+import collections
+import importlib
+import time
+
+import numpy as np
+
+import rules
+from rules import GOLDEN_GAMMA, INITIAL_LIVES, MAX_BULLETS, MIN_BULLETS, SHOOT_OPPONENT, SHOOT_SELF
+
+BATCH_SIZE = 1 << 20 # Partidas simuladas por vez (limita a memória)
+MAX_MOVES = 10000 # Proteção contra políticas que nunca terminam
+
+Rules = collections.namedtuple("Rules", ["lives", "min_bullets", "max_bullets"])
+DEFAULT_RULES = Rules(INITIAL_LIVES, MIN_BULLETS, MAX_BULLETS)
+
+# O que uma política vê das partidas em que é a sua vez (arrays)
+View = collections.namedtuple("View", ["my_lives", "opponent_lives", "bullets", "live_bullets"])
+
+# Resultado por partida: assento (0 = player1) de quem começou e de quem
+# venceu, jogadas e recargas
+Results = collections.namedtuple("Results", ["first", "winner", "moves", "reloads"])
+
+# --- Políticas ---
+
+def shoot_opponent(view, rng):
+    # Sempre atira no oponente
+    return np.zeros(len(view.bullets), dtype=bool)
+
+def coin(view, rng):
+    # Cara ou coroa
+    return rng.random(len(view.bullets)) < 0.5
+
+def odds(view, rng):
+    # Atira em si quando há mais balas vazias que reais: se vier vazia, mantém a vez
+    return view.live_bullets * 2 < view.bullets
+
+POLICIES = {"opponent": shoot_opponent, "random": coin, "odds": odds}
+
+def load_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, function = name.partition(":")
+    return getattr(importlib.import_module(module), function)
+
+# --- Sorteios (rules.py em arrays) ---
+
+_M64 = [np.uint64(c) for c in (GOLDEN_GAMMA, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 30, 27, 31)]
+
+def rng_values(seeds, draws):
+    """rules.rng_value para arrays uint64 (as contas dão a volta em 2**64)."""
+    gamma, mul1, mul2, s30, s27, s31 = _M64
+    with np.errstate(over="ignore"):
+        z = seeds + (draws + np.uint64(1)) * gamma
+        z = (z ^ (z >> s30)) * mul1
+        z = (z ^ (z >> s27)) * mul2
+    return z ^ (z >> s31)
+
+class ClipTable:
+    """rules.load_clip para arrays: as máscaras de CLIP_PATTERNS numa tabela
+    [balas, bala extra real, índice]."""
+
+    def __init__(self, game_rules):
+        self.min_bullets = game_rules.min_bullets
+        self.span = np.uint64(game_rules.max_bullets - game_rules.min_bullets + 1)
+        patterns = {
+            (size, extra): rules.clip_patterns(size, size // 2 + extra)
+            for size in range(game_rules.min_bullets, game_rules.max_bullets + 1)
+            for extra in (0, 1)
+        }
+        width = max(len(p) for p in patterns.values())
+        self.bits = np.zeros((game_rules.max_bullets + 1, 2, width), dtype=np.int64)
+        self.counts = np.ones((game_rules.max_bullets + 1, 2), dtype=np.uint64)
+        for (size, extra), p in patterns.items():
+            self.bits[size, extra, :len(p)] = p
+            self.counts[size, extra] = len(p)
+
+    def load(self, values):
+        # Retorna (bits, balas, reais), como rules.load_clip
+        size = self.min_bullets + ((values & np.uint64(0xFFFF)) % self.span).astype(np.int64)
+        extra = (size & 1) & ((values >> np.uint64(16)) & np.uint64(1)).astype(np.int64)
+        index = ((values >> np.uint64(17)) % self.counts[size, extra]).astype(np.int64)
+        return self.bits[size, extra, index], size, size // 2 + extra
+
+# --- Simulação ---
+
+def simulate_batch(seeds, policies, game_rules=DEFAULT_RULES, rng=None, history=None):
+    """Joga uma partida por semente até o fim; 'policies' = (player1, player2).
+
+    Com 'history' (uma lista), acrescenta por jogada (partidas, assento,
+    ações) para conferir contra o replay.py."""
+    rng = rng or np.random.default_rng()
+    clips = ClipTable(game_rules)
+    n = len(seeds)
+    out_winner = np.full(n, -1, dtype=np.int8)
+    out_moves = np.zeros(n, dtype=np.int32)
+    out_reloads = np.zeros(n, dtype=np.int32)
+
+    # start_game: sorteio 0 decide quem começa, sorteio 1 carrega o pente
+    ids = np.arange(n)
+    first = (rng_values(seeds, np.uint64(0)) & np.uint64(1)).astype(np.int8)
+    bits, size, live_left = clips.load(rng_values(seeds, np.uint64(1)))
+    draws = np.full(n, 2, dtype=np.uint64)
+    turn = first.astype(np.int64)
+    cursor = np.zeros(n, dtype=np.int64)
+    lives = np.full((2, n), game_rules.lives, dtype=np.int64)
+    moves = np.zeros(n, dtype=np.int32)
+    reloads = np.zeros(n, dtype=np.int32)
+
+    for _ in range(MAX_MOVES):
+        if not len(ids):
+            break
+        m = len(ids)
+        columns = np.arange(m)
+
+        # Pente vazio: a jogada recarrega e a vez fica com o mesmo jogador
+        empty = cursor >= size
+        if empty.any():
+            e = np.flatnonzero(empty)
+            bits[e], size[e], live_left[e] = clips.load(rng_values(seeds[e], draws[e]))
+            draws[e] += np.uint64(1)
+            cursor[e] = 0
+            reloads[e] += 1
+        fire = ~empty
+
+        shoot_self = np.zeros(m, dtype=bool)
+        for seat in (0, 1):
+            acting = np.flatnonzero(fire & (turn == seat))
+            if len(acting):
+                view = View(lives[seat, acting], lives[1 - seat, acting],
+                            size[acting] - cursor[acting], live_left[acting])
+                shoot_self[acting] = policies[seat](view, rng)
+
+        if history is not None:
+            history.append((ids, turn.copy(), np.where(shoot_self, SHOOT_SELF, SHOOT_OPPONENT)))
+
+        live = fire & ((bits >> np.minimum(cursor, 63)) & 1).astype(bool)
+        cursor += fire
+        live_left -= live
+        target = np.where(shoot_self, turn, 1 - turn)
+        lives[target[live], columns[live]] -= 1
+        # Atirar no oponente sempre passa a vez; em si mesmo, só se era real
+        turn = np.where(fire & (~shoot_self | live), 1 - turn, turn)
+        moves += 1
+
+        # Fim de jogo: quem ficou sem vidas perde (player1 conferido primeiro)
+        lost1 = lives[0] <= 0
+        over = lost1 | (lives[1] <= 0)
+        if over.any():
+            done = ids[over]
+            out_winner[done] = np.where(lost1[over], 1, 0)
+            out_moves[done] = moves[over]
+            out_reloads[done] = reloads[over]
+            keep = ~over
+            ids, seeds, draws, turn = ids[keep], seeds[keep], draws[keep], turn[keep]
+            bits, size, cursor, live_left = bits[keep], size[keep], cursor[keep], live_left[keep]
+            lives, moves, reloads = lives[:, keep], moves[keep], reloads[keep]
+
+    return Results(first, out_winner, out_moves, out_reloads)
+
+def simulate(games, policies, game_rules=DEFAULT_RULES, seed=None):
+    """Simula 'games' partidas em lotes de BATCH_SIZE e junta os resultados."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for start in range(0, games, BATCH_SIZE):
+        seeds = rng.bit_generator.random_raw(min(BATCH_SIZE, games - start)).astype(np.uint64)
+        parts.append(simulate_batch(seeds, policies, game_rules, rng))
+    return Results(*(np.concatenate(column) for column in zip(*parts)))
+
+# --- Relatório ---
+
+def report(results, names):
+    n = len(results.winner)
+    unfinished = int((results.winner < 0).sum())
+    finished = results.winner >= 0
+    first_wins = (results.winner == results.first)[finished].mean()
+    print(f"{n} partidas ({unfinished} sem fim em {MAX_MOVES} jogadas)")
+    print(f"  quem começa vence: {first_wins:.2%}")
+    for seat, name in enumerate(names):
+        began = finished & (results.first == seat)
+        print(f"  player{seat + 1} ({name}): vence {(results.winner[finished] == seat).mean():.2%}"
+              f" | começando {(results.winner[began] == seat).mean():.2%}"
+              f" | em segundo {(results.winner[finished & ~began] == seat).mean():.2%}")
+
+    moves = results.moves[finished]
+    reloads = results.reloads[finished]
+    p50, p90, p99 = np.percentile(moves, [50, 90, 99])
+    print(f"  jogadas por partida: média {moves.mean():.1f}, p50 {p50:.0f}, p90 {p90:.0f}, "
+          f"p99 {p99:.0f}, máx {moves.max()}")
+    print(f"  recargas por partida: média {reloads.mean():.2f} "
+          f"({reloads.sum() / moves.sum():.1%} das jogadas)")
+
+    counts = np.bincount(moves)
+    scale = 50 / counts.max()
+    last = int(np.percentile(moves, 99.9))
+    print("  duração (jogadas):")
+    for length in range(int(moves.min()), last + 1):
+        if counts[length]:
+            print(f"    {length:>4} {counts[length] / len(moves):>7.2%} {'#' * round(counts[length] * scale)}")
+    print(f"    >{last} {(moves > last).mean():>7.2%}")
+
+    counts = np.bincount(reloads)
+    print("  recargas: " + "  ".join(f"{k}: {c / len(reloads):.1%}" for k, c in enumerate(counts[:10]) if c))
+
+# --- Conferência contra o replay ---
+
+def check(games, policies, seed=None):
+    """Simula 'games' partidas guardando as jogadas e refaz cada uma com o
+    replay.replay (o mesmo laço do GameRoom.make_move); retorna quantas
+    divergem."""
+    from replay import replay
+
+    rng = np.random.default_rng(seed)
+    seeds = rng.bit_generator.random_raw(games).astype(np.uint64)
+    history = []
+    results = simulate_batch(seeds, policies, DEFAULT_RULES, rng, history)
+
+    actions = [[] for _ in range(games)]
+    players = ("p1", "p2")
+    for ids, turn, chosen in history:
+        for game, seat, action in zip(ids.tolist(), turn.tolist(), chosen.tolist()):
+            actions[game].append((players[seat], action))
+
+    mismatches = 0
+    for game in range(games):
+        result = replay(int(seeds[game]), players, actions[game])
+        expected_winner = players[results.winner[game]] if results.winner[game] >= 0 else None
+        if (result.winner_id != expected_winner or result.rejected
+                or result.rng_draws - 2 != results.reloads[game]
+                or result.version - 2 != results.moves[game]):
+            mismatches += 1
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000000)
+    parser.add_argument("--p1", default="odds", help="Política do player1 (%s ou modulo:funcao)" % ", ".join(POLICIES))
+    parser.add_argument("--p2", default="odds", help="Política do player2")
+    parser.add_argument("--lives", type=int, default=INITIAL_LIVES)
+    parser.add_argument("--bullets", type=int, nargs=2, default=(MIN_BULLETS, MAX_BULLETS), metavar=("MIN", "MAX"))
+    parser.add_argument("--seed", type=int, default=None, help="Semente do simulador (repetível)")
+    parser.add_argument("--check", type=int, metavar="N", help="Confere N partidas contra o replay.py e sai")
+    args = parser.parse_args()
+
+    policies = (load_policy(args.p1), load_policy(args.p2))
+    if args.check:
+        print(f"partidas diferentes do replay: {check(args.check, policies, args.seed)} de {args.check}")
+        return
+
+    game_rules = Rules(args.lives, *args.bullets)
+    start = time.perf_counter()
+    results = simulate(args.games, policies, game_rules, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"regras: {game_rules.lives} vidas, pente de {game_rules.min_bullets} a {game_rules.max_bullets} balas; "
+          f"simulado em {elapsed:.1f}s ({args.games / elapsed / 1e6:.2f} M partidas/s)")
+    report(results, (args.p1, args.p2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import asyncio
+import collections
+import queue
+import threading
+import time
+
+from gamelog import get_logger
+from metrics import REGISTRY, LOCK_WAIT_BUCKETS
+
+LOG = get_logger("spectators")
+
+MAX_SPECTATORS = 5000 # Espectadores por sala; acima disso o WatchGame é recusado
+LIVE_SPECTATORS = 100 # Os primeiros da sala recebem todas as versões
+COALESCED_INTERVAL = 1.0 # Os demais olham o estado mais novo a cada N segundos (sem serem acordados)
+MAX_DELAY = 60.0 # Atraso máximo que um espectador pode pedir (segundos)
+
+REJECTED = REGISTRY.counter(
+    "game_spectators_rejected_total", "WatchGame recusados por sala lotada")
+FANOUT_TIME = REGISTRY.histogram(
+    "game_spectator_fanout_seconds", "Duracao de cada aviso aos espectadores de uma sala (thread do hub)",
+    buckets=LOCK_WAIT_BUCKETS)
+
+class Spectator:
+    """Um stream do WatchGame. Não tem caixa de entrada: lê direto do feed
+    da sala a versão mais nova que pode ver."""
+
+    __slots__ = ("feed", "delay", "interval", "version", "closed", "next_at")
+
+    def __init__(self, feed, delay, interval):
+        self.feed = feed
+        self.delay = delay
+        self.interval = interval # 0 = todas as versões; senão, camada "coalescida"
+        self.version = 0 # Última versão enviada
+        self.closed = False
+        self.next_at = 0.0 # Antes disso a camada coalescida não recebe nada
+
+    def get(self):
+        return self.feed.get(self)
+
+    async def get_async(self):
+        return await self.feed.get_async(self)
+
+    def close(self):
+        # Cliente desconectou: acorda o get() deste stream
+        self.closed = True
+        with self.feed.cond:
+            self.feed.cond.notify_all()
+            self.feed.slow_cond.notify_all()
+
+class SpectatorFeed:
+    """Stream compartilhado pelos espectadores de uma sala.
+
+    Para o GameRoom é um único inscrito: push() só guarda o StateUpdate (os
+    bytes já serializados do broadcast) e agenda o aviso no hub, em O(1) e
+    sem depender de quantos espectadores existem. Quem acorda os espectadores
+    é a thread do hub, fora do lock da sala. Os espectadores leem sempre o
+    estado mais novo (ou o mais novo com o atraso pedido), então um
+    espectador lento pula versões em vez de acumular uma fila.
+
+    A camada coalescida (acima de LIVE_SPECTATORS) não é acordada a cada
+    versão: espera no slow_cond, que divide o lock com o cond, e só olha o
+    feed de tempos em tempos. Assim o custo de cada versão depende só dos
+    espectadores ao vivo.
+    """
+
+    items = () # Sem caixa de entrada (ver server.subscriber_stats)
+
+    def __init__(self, hub, room):
+        self.hub = hub
+        self.room = room
+        lock = threading.Lock()
+        self.cond = threading.Condition(lock) # Camada ao vivo: acordada a cada versão
+        self.slow_cond = threading.Condition(lock) # Camada coalescida: acorda por tempo
+        self.history = collections.deque() # (publicado em, StateUpdate), para os atrasos
+        self.count = 0 # Espectadores na sala
+        self._scheduled = False
+        self._loops = {} # event loop -> asyncio.Event dos espectadores esperando nele
+
+    def push(self, update):
+        # Chamado pelo GameRoom com o lock da sala
+        now = time.monotonic()
+        with self.cond:
+            history = self.history
+            history.append((now, update))
+            # Guarda a última versão anterior à janela: era o estado MAX_DELAY atrás
+            while len(history) > 1 and now - history[1][0] > MAX_DELAY:
+                history.popleft()
+            if self._scheduled:
+                return # O hub ainda não avisou a versão anterior; avisa as duas juntas
+            self._scheduled = True
+        self.hub.schedule(self)
+
+    def notify(self):
+        # Thread do hub: acorda todos os espectadores da sala
+        with self.cond:
+            self._scheduled = False
+            self.cond.notify_all()
+            loops = list(self._loops)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake_loop, loop)
+            except RuntimeError:
+                with self.cond:
+                    self._loops.pop(loop, None) # Event loop já fechado
+
+    def _wake_loop(self, loop):
+        with self.cond:
+            event = self._loops.pop(loop, None)
+        if event is not None:
+            event.set()
+
+    def _poll(self, spectator, now):
+        """Chamado com self.cond: retorna (update, None) se há uma versão nova
+        para o espectador, ou (None, segundos até valer a pena olhar de novo;
+        None = só quando chegar outra versão)."""
+        if now < spectator.next_at:
+            return None, spectator.next_at - now
+
+        update, due = None, None
+        if spectator.delay:
+            cutoff = now - spectator.delay
+            for published, item in reversed(self.history):
+                if published <= cutoff:
+                    update = item
+                    break
+                due = published - cutoff # A mais antiga ainda escondida pelo atraso
+        elif self.history:
+            update = self.history[-1][1]
+
+        if update is not None and update.version > spectator.version:
+            spectator.version = update.version
+            if spectator.interval:
+                spectator.next_at = now + spectator.interval
+            return update, None
+        if spectator.interval:
+            return None, spectator.interval if due is None else min(due, spectator.interval)
+        return None, due
+
+    def get(self, spectator):
+        # Próximo StateUpdate para o espectador, ou None se ele desconectou
+        cond = self.slow_cond if spectator.interval else self.cond
+        with cond:
+            while not spectator.closed:
+                update, wait = self._poll(spectator, time.monotonic())
+                if update is not None:
+                    return update
+                cond.wait(wait)
+            return None
+
+    async def get_async(self, spectator):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.cond:
+                update, wait = self._poll(spectator, time.monotonic())
+                if update is not None:
+                    return update
+                if not spectator.interval:
+                    event = self._loops.get(loop)
+                    if event is None:
+                        event = self._loops[loop] = asyncio.Event()
+            if spectator.interval:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+class SpectatorHub:
+    """Feeds dos espectadores (um por sala com espectadores) e a thread que
+    os avisa das versões novas."""
+
+    def __init__(self, max_spectators=MAX_SPECTATORS, live_spectators=LIVE_SPECTATORS,
+                 coalesced_interval=COALESCED_INTERVAL):
+        self.max_spectators = max_spectators
+        self.live_spectators = live_spectators
+        self.coalesced_interval = coalesced_interval
+        self._lock = threading.Lock()
+        self._feeds = {} # room_id -> SpectatorFeed
+        self._queue = queue.SimpleQueue() # Feeds com versões a avisar
+        self._thread = None
+
+    def join(self, room, delay=0.0):
+        """Novo espectador da sala; ValueError se a sala está lotada."""
+        with self._lock:
+            feed = self._feeds.get(room.room_id)
+            if feed is None:
+                feed = self._feeds[room.room_id] = SpectatorFeed(self, room)
+                room.subscribe(feed) # Já publica o estado atual
+            if feed.count >= self.max_spectators:
+                REJECTED.inc()
+                raise ValueError(f"Sala com o máximo de {self.max_spectators} espectadores")
+            interval = self.coalesced_interval if feed.count >= self.live_spectators else 0.0
+            feed.count += 1
+        return Spectator(feed, delay, interval)
+
+    def leave(self, spectator):
+        feed = spectator.feed
+        with self._lock:
+            feed.count -= 1
+            if feed.count == 0 and self._feeds.get(feed.room.room_id) is feed:
+                del self._feeds[feed.room.room_id]
+                feed.room.unsubscribe(feed) # Sem espectadores, a sala volta a poder ser recolhida
+
+    def stats(self):
+        feeds = list(self._feeds.values())
+        return {"rooms": len(feeds), "spectators": sum(feed.count for feed in feeds)}
+
+    def schedule(self, feed):
+        self._queue.put(feed)
+
+    def _run(self):
+        while True:
+            feed = self._queue.get()
+            if feed is None:
+                return
+            start = time.perf_counter()
+            try:
+                feed.notify()
+            except Exception as e:
+                LOG.error("fanout_failed", "Erro ao avisar espectadores", room_id=feed.room.room_id, error=str(e))
+            FANOUT_TIME.observe(time.perf_counter() - start)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="spectators", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,398 @@
+"""Onde ficam as salas: na memória do processo ou num SQLite compartilhado.
+
+O servidor lê e muda as salas pelo STORE (server.py), que decide como cada
+mudança (criação, entrada de jogador, jogada) fica guardada:
+
+- MemoryStore (o padrão): o RoomRegistry do processo é a fonte da verdade e
+  a recuperação vem do journal (journal.py). Um processo só.
+- SQLiteStore: cada sala é uma linha (estado + versão) de um banco SQLite em
+  modo WAL, e vários processos podem servir as mesmas salas (ex: todos na
+  mesma porta, que o gRPC abre com SO_REUSEPORT). Cada processo tem uma
+  cópia local de cada sala, com os inscritos dele, e grava com versionamento
+  otimista:
+    1. a mudança é calculada num draft da cópia local (GameRoom.draft);
+    2. UPDATE ... WHERE version = <versão da cópia local>;
+    3. se a linha mudou (outro processo gravou antes), a cópia é atualizada
+       com o estado do banco e a mudança é calculada de novo;
+    4. se gravou, a cópia publica o novo estado (GameRoom.load_state).
+  Triggers registram cada criação, versão (com o estado) e remoção na
+  tabela 'changes'. Uma thread de cada processo olha o PRAGMA data_version
+  (que só muda quando OUTRA conexão grava) a cada POLL_INTERVAL e, quando
+  ele muda, publica aos inscritos locais cada versão nova das salas, traz as
+  salas novas e remove as apagadas. As mudanças ficam CHANGES_TTL segundos
+  na tabela; um processo que ficou parado mais que isso compara todas as
+  salas com o banco (_resync) e publica só a versão atual de cada uma.
+
+  Com synchronous=NORMAL, uma jogada gravada não se perde se o processo cair
+  (só numa queda do sistema operacional/energia). O journal não é usado. A
+  fila do FindMatch e as sessões continuam sendo de cada processo: as
+  sessões das salas vêm do banco, mas um nome só fica protegido nos outros
+  processos depois que a sala chega neles.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from gamelog import get_logger
+from journal import recover
+from metrics import REGISTRY, LOCK_WAIT_BUCKETS
+from room import GameRoom, MoveResult
+
+LOG = get_logger("store")
+
+POLL_INTERVAL = 0.02 # Segundos entre as checagens de mudanças de outros processos
+CONFLICT_RETRIES = 8 # Vezes que uma mudança é refeita quando outro processo grava a sala antes
+TOUCH_INTERVAL = 30.0 # Segundos entre as marcações das salas com inscritos (ver in_use)
+CHANGES_TTL = 10.0 # Segundos que uma mudança fica na tabela 'changes' (e entre as limpezas)
+BUSY_TIMEOUT_MS = 5000 # Espera pelo lock de escrita do banco (outro processo gravando)
+
+CONFLICTS = REGISTRY.counter(
+    "game_store_conflicts_total", "Mudancas refeitas porque outro processo gravou a sala antes")
+WRITE_TIME = REGISTRY.histogram(
+    "game_store_write_seconds", "Duracao de cada escrita de sala no SQLite", buckets=LOCK_WAIT_BUCKETS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    state TEXT NOT NULL,      -- JSON de GameRoom.dump_state()
+    touched REAL NOT NULL     -- time.time() da última escrita ou marcação
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id TEXT NOT NULL,
+    version INTEGER,          -- NULL = sala apagada
+    state TEXT,               -- estado nessa versão
+    at REAL NOT NULL          -- julianday
+);
+CREATE TRIGGER IF NOT EXISTS rooms_inserted AFTER INSERT ON rooms BEGIN
+    INSERT INTO changes (room_id, version, state, at) VALUES (NEW.room_id, NEW.version, NEW.state, julianday('now'));
+END;
+CREATE TRIGGER IF NOT EXISTS rooms_updated AFTER UPDATE OF version ON rooms BEGIN
+    INSERT INTO changes (room_id, version, state, at) VALUES (NEW.room_id, NEW.version, NEW.state, julianday('now'));
+END;
+CREATE TRIGGER IF NOT EXISTS rooms_deleted AFTER DELETE ON rooms BEGIN
+    INSERT INTO changes (room_id, version, state, at) VALUES (OLD.room_id, NULL, NULL, julianday('now'));
+END;
+"""
+
+class MemoryStore:
+    """Salas só na memória deste processo; o journal grava as mudanças."""
+
+    shared = False
+
+    def __init__(self, rooms, journal):
+        self.rooms = rooms
+        self.journal = journal
+        self.get = rooms.get # Busca sem lock (ver RoomRegistry.get)
+
+    def add(self, room):
+        # KeyError se o room_id já existe
+        self.rooms.add(room)
+        with room.lock:
+            self.journal.record("create", room)
+
+    def update(self, room, kind, change):
+        """Aplica change(sala), que levanta uma exceção se a mudança não vale,
+        e grava o resultado; retorna o que change retornar."""
+        with room.lock:
+            result = change(room)
+            self.journal.record(kind, room)
+            return result
+
+    def apply_move(self, room, player_id, action, sequence=0):
+        # GameRoom.apply_move + journal (só as jogadas aceitas e novas)
+        with room.lock:
+            result = room.apply_move(player_id, action, sequence)
+            if result.error is None and not result.duplicate:
+                self.journal.record("move", room, (player_id, action))
+            return result
+
+    def discard(self, room_id):
+        # Listener de RoomLifecycle.removal_listeners
+        self.journal.record_removal(room_id)
+
+    def recover(self):
+        """(estados, último seq) da execução anterior (ver journal.recover)."""
+        return recover(self.journal.directory)
+
+    def start(self, last_seq):
+        self.journal.start(self.rooms, last_seq, snapshot_now=last_seq > 0)
+
+    def stop(self):
+        self.journal.stop()
+
+class SQLiteStore:
+    """Salas num banco SQLite compartilhado por vários processos."""
+
+    shared = True
+
+    def __init__(self, rooms, path, poll_interval=POLL_INTERVAL):
+        self.rooms = rooms
+        self.path = path
+        self.poll_interval = poll_interval
+        # Funções chamadas com as salas que chegam de outros processos:
+        # loaded com cada sala nova aqui (com o lock dela), refreshed com uma
+        # sala depois de publicar um estado gravado lá, deleted com o room_id
+        # de uma sala apagada lá
+        self.loaded_listeners = []
+        self.refreshed_listeners = []
+        self.deleted_listeners = []
+
+        self._lock = threading.Lock() # Uma conexão, usada por uma thread de cada vez
+        self._db = None
+        self._seq = 0 # Última mudança vista
+        self._data_version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Banco ---
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        db.executescript(_SCHEMA)
+        self._db = db
+
+    def _save(self, draft, expected_version):
+        # UPDATE otimista do estado do draft; False se a linha não está mais
+        # em 'expected_version' (os triggers registram a mudança na mesma
+        # transação)
+        data = json.dumps(draft.dump_state(), ensure_ascii=False)
+        start = time.perf_counter()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE rooms SET version = ?, state = ?, touched = ? WHERE room_id = ? AND version = ?",
+                (draft.version, data, time.time(), draft.room_id, expected_version))
+        WRITE_TIME.observe(time.perf_counter() - start)
+        return cursor.rowcount == 1
+
+    def _load(self, room_id):
+        with self._lock:
+            row = self._db.execute("SELECT state FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    # --- Salas ---
+
+    def get(self, room_id):
+        # A cópia local; uma sala que ainda não chegou aqui é buscada no banco
+        room = self.rooms.get(room_id)
+        if room is None:
+            state = self._load(room_id)
+            if state is not None:
+                room = self._adopt(state)
+        return room
+
+    def add(self, room):
+        # Entra no registro local antes do banco, para a thread de mudanças
+        # não trazer do banco uma segunda cópia
+        self.rooms.add(room)
+        with room.lock:
+            state = room.dump_state()
+        try:
+            with self._lock:
+                self._db.execute("INSERT INTO rooms (room_id, version, state, touched) VALUES (?, ?, ?, ?)",
+                                 (room.room_id, room.version, json.dumps(state, ensure_ascii=False), time.time()))
+        except sqlite3.IntegrityError:
+            self.rooms.remove(room.room_id)
+            raise KeyError(f"Sala {room.room_id} já existe")
+
+    def update(self, room, kind, change):
+        """Como MemoryStore.update, com a mudança calculada num draft e
+        gravada se ninguém gravou a sala antes (senão, refeita)."""
+        with room.lock:
+            for _ in range(CONFLICT_RETRIES):
+                draft = room.draft()
+                result = change(draft)
+                if self._save(draft, room.version):
+                    room.load_state(draft.dump_state())
+                    return result
+                self._conflict(room)
+            raise Exception("Sala disputada demais; tente de novo")
+
+    def apply_move(self, room, player_id, action, sequence=0):
+        # GameRoom.apply_move num draft; só as jogadas aceitas e novas são gravadas
+        with room.lock:
+            for _ in range(CONFLICT_RETRIES):
+                draft = room.draft()
+                result = draft.apply_move(player_id, action, sequence)
+                if result.error is None and not result.duplicate:
+                    if self._save(draft, room.version):
+                        room.load_state(draft.dump_state())
+                        room.move_results = draft.move_results
+                        return result
+                elif result.duplicate or self._current_version(room.room_id) <= room.version:
+                    # Recusa com a cópia em dia (ou repetição): só o sequence fica
+                    room.player1_sequence = draft.player1_sequence
+                    room.player2_sequence = draft.player2_sequence
+                    room.move_results = draft.move_results
+                    return result
+                self._conflict(room)
+            return MoveResult("Sala disputada demais; tente de novo", room.version, False)
+
+    def _current_version(self, room_id):
+        with self._lock:
+            row = self._db.execute("SELECT version FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        return row[0] if row is not None else -1
+
+    def _conflict(self, room):
+        # Outro processo gravou a sala: publica o estado de lá antes de refazer
+        CONFLICTS.inc()
+        state = self._load(room.room_id)
+        if state is None:
+            raise Exception("Sala não existe mais")
+        self._refresh(room, state)
+
+    def _refresh(self, room, state):
+        if room.load_state(state):
+            for listener in self.refreshed_listeners:
+                listener(room)
+
+    def _adopt(self, state):
+        # Sala criada por outro processo: entra no registro local
+        room = GameRoom.restore(state)
+        try:
+            self.rooms.add(room)
+        except KeyError:
+            return self.rooms.get(room.room_id) # Outra thread trouxe antes
+        with room.lock:
+            for listener in self.loaded_listeners:
+                listener(room)
+        return room
+
+    def discard(self, room_id):
+        # Listener de RoomLifecycle.removal_listeners: a sala sai para todos
+        with self._lock:
+            self._db.execute("DELETE FROM rooms WHERE room_id = ?", (room_id,))
+
+    def in_use(self, room_id):
+        """True se algum processo gravou ou marcou a sala há pouco (ela tem
+        inscritos lá); para o RoomLifecycle não recolher a sala aqui."""
+        with self._lock:
+            row = self._db.execute("SELECT touched FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        return row is not None and row[0] >= time.time() - 2 * TOUCH_INTERVAL
+
+    # --- Mudanças dos outros processos ---
+
+    def poll(self):
+        """Publica as mudanças gravadas por outros processos desde a última
+        chamada, versão por versão; retorna quantas mudanças foram lidas."""
+        with self._lock:
+            data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return 0
+            self._data_version = data_version
+            changes = self._db.execute(
+                "SELECT seq, room_id, version, state FROM changes WHERE seq > ? ORDER BY seq",
+                (self._seq,)).fetchall()
+        if not changes:
+            return 0
+        if changes[0][0] > self._seq + 1:
+            # Mudanças que saíram da tabela antes de serem lidas aqui
+            self._resync()
+
+        for seq, room_id, version, data in changes:
+            self._seq = seq
+            room = self.rooms.get(room_id)
+            if version is None:
+                if room is not None:
+                    for listener in self.deleted_listeners:
+                        listener(room_id)
+            elif room is None:
+                self._adopt(json.loads(data))
+            elif version > room.version:
+                self._refresh(room, json.loads(data))
+        return len(changes)
+
+    def _resync(self):
+        # Compara todas as salas com o banco: publica a versão atual das que
+        # mudaram, traz as novas e remove as que não estão mais lá
+        with self._lock:
+            rows = self._db.execute("SELECT room_id, version, state FROM rooms").fetchall()
+        LOG.warning("store_resync", "Mudanças perdidas; comparando todas as salas com o banco", rooms=len(rows))
+        current = set()
+        for room_id, version, data in rows:
+            current.add(room_id)
+            room = self.rooms.get(room_id)
+            if room is None:
+                self._adopt(json.loads(data))
+            elif version > room.version:
+                self._refresh(room, json.loads(data))
+        for room in self.rooms.values():
+            if room.room_id not in current:
+                for listener in self.deleted_listeners:
+                    listener(room.room_id)
+
+    def _touch(self):
+        # Marca as salas com inscritos aqui (ver in_use)
+        now = time.time()
+        busy = [(now, room.room_id) for room in self.rooms.values() if room.subscribers]
+        if not busy:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("UPDATE rooms SET touched = ? WHERE room_id = ?", busy)
+            finally:
+                self._db.execute("COMMIT")
+
+    def _prune(self):
+        # Mudanças antigas: os outros processos já as leram
+        with self._lock:
+            self._db.execute("DELETE FROM changes WHERE at < julianday('now') - ?", (CHANGES_TTL / 86400,))
+
+    # --- Thread ---
+
+    def recover(self):
+        """Abre o banco e lê todas as salas: (estados, última mudança), como
+        journal.recover. O seq é lido antes das salas: uma mudança entre as
+        duas leituras volta na primeira poll() e é ignorada pela versão."""
+        self._open()
+        with self._lock:
+            seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            rows = self._db.execute("SELECT state FROM rooms").fetchall()
+        states = {}
+        for (data,) in rows:
+            state = json.loads(data)
+            states[state[0]] = state
+        LOG.info("store_opened", "Salas lidas do banco compartilhado", path=self.path, rooms=len(states), seq=seq)
+        return states, seq
+
+    def start(self, last_seq):
+        self._seq = last_seq
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="store-poll", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_touch = time.monotonic() + TOUCH_INTERVAL
+        next_prune = time.monotonic() + CHANGES_TTL
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+                now = time.monotonic()
+                if now >= next_touch:
+                    self._touch()
+                    next_touch = now + TOUCH_INTERVAL
+                if now >= next_prune:
+                    self._prune()
+                    next_prune = now + CHANGES_TTL
+            except Exception as e:
+                LOG.error("store_poll_failed", "Erro ao ler as mudanças do banco", error=str(e))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
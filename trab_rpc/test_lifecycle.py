@@ -0,0 +1,77 @@
+"""Testes do recolhimento de salas ociosas (RoomLifecycle)."""
+import threading
+
+import pytest
+
+import game_pb2
+from lifecycle import RoomLifecycle
+from registry import RoomRegistry
+from room import GameRoom
+
+def tracked_room(players=("ana",)):
+    rooms = RoomRegistry()
+    lifecycle = RoomLifecycle(rooms, idle_ttl=60.0)
+    room = GameRoom("sala", players[0], seed=1)
+    for player in players[1:]:
+        room.add_player(player)
+    rooms.add(room)
+    with room.lock:
+        lifecycle.track(room)
+    return lifecycle, room
+
+def lock_is_free(room):
+    # Tenta pegar o lock da sala em outra thread
+    result = []
+    def attempt():
+        result.append(room.lock.acquire(timeout=1.0))
+        if result[0]:
+            room.lock.release()
+    thread = threading.Thread(target=attempt)
+    thread.start()
+    thread.join()
+    return result[0]
+
+def test_idle_room_is_removed_without_its_lock_held():
+    lifecycle, room = tracked_room()
+    seen = []
+    lifecycle.removal_listeners.append(lambda room_id: seen.append((room_id, lock_is_free(room))))
+
+    lifecycle._check_idle(room.room_id, room.version)
+
+    assert seen == [(room.room_id, True)]
+    assert lifecycle.rooms.get(room.room_id) is None
+    assert lifecycle.stats()["reaped"] == 1
+
+def test_removed_room_rejects_moves_and_joins():
+    lifecycle, room = tracked_room(("ana", "bia"))
+    lifecycle._check_idle(room.room_id, room.version)
+    version = room.version
+
+    result = room.apply_move(room.current_turn_player_id, game_pb2.SHOOT_SELF, sequence=1)
+
+    assert room.closed
+    assert result.error == "Sala não existe mais"
+    assert room.version == version
+    with pytest.raises(Exception, match="Sala não existe mais"):
+        room.add_player("caio")
+
+def test_room_with_subscribers_or_moves_is_kept():
+    lifecycle, room = tracked_room(("ana", "bia"))
+    seen_version = room.version
+    room.make_move(room.current_turn_player_id, game_pb2.SHOOT_SELF)
+
+    lifecycle._check_idle(room.room_id, seen_version)
+
+    assert lifecycle.rooms.get(room.room_id) is room
+    assert not room.closed
+
+def test_busy_check_runs_without_the_room_lock():
+    lifecycle, room = tracked_room()
+    seen = []
+    lifecycle.busy_checks.append(lambda room_id: seen.append(lock_is_free(room)) or True)
+
+    lifecycle._check_idle(room.room_id, room.version)
+
+    assert seen == [True]
+    assert lifecycle.rooms.get(room.room_id) is room
+    assert not room.closed
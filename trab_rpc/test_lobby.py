@@ -0,0 +1,54 @@
+"""Testes da paginação e do cache do LobbyIndex."""
+import game_pb2
+from lobby import LobbyIndex
+from room import GameRoom
+
+def new_lobby(names):
+    lobby = LobbyIndex()
+    rooms = [GameRoom(name, f"host{i}") for i, name in enumerate(names)]
+    for room in rooms:
+        lobby.add(room)
+    return lobby, rooms
+
+def pages(lobby, page_size, name_prefix=""):
+    # room_ids de cada página, seguindo os page_tokens até o fim
+    result, token = [], ""
+    while True:
+        page = game_pb2.LobbyList.FromString(lobby.query(page_size, token, name_prefix))
+        result.append([room.room_id for room in page.rooms])
+        token = page.next_page_token
+        if not token:
+            return result
+
+def test_pages_cover_every_room_once():
+    lobby, rooms = new_lobby([f"sala{i}" for i in range(7)])
+
+    result = pages(lobby, 3)
+
+    assert [len(page) for page in result] == [3, 3, 1]
+    assert sum(result, []) == [room.room_id for room in rooms]
+
+def test_name_prefix_pages_skip_other_rooms():
+    names = ["a" if i % 3 == 0 else "b" for i in range(10)]
+    lobby, rooms = new_lobby(names)
+
+    result = pages(lobby, 2, name_prefix="a")
+
+    assert sum(result, []) == [room.room_id for room in rooms if room.room_name == "a"]
+
+def test_page_token_survives_removed_rooms():
+    lobby, rooms = new_lobby([f"sala{i}" for i in range(6)])
+    first = game_pb2.LobbyList.FromString(lobby.query(2))
+    lobby.discard(rooms[2].room_id)
+
+    second = game_pb2.LobbyList.FromString(lobby.query(2, first.next_page_token))
+
+    assert [room.room_id for room in second.rooms] == [rooms[3].room_id, rooms[4].room_id]
+
+def test_cached_answer_is_dropped_when_the_lobby_changes():
+    lobby, rooms = new_lobby(["sala0"])
+    assert lobby.query() is lobby.query() # Mesmos bytes, vindos do cache
+
+    lobby.discard(rooms[0].room_id)
+
+    assert game_pb2.LobbyList.FromString(lobby.query()).rooms == []
@@ -0,0 +1,111 @@
+"""Testes da caixa de entrada dos inscritos (mailbox.py) com o GameRoom."""
+import time
+
+import pytest
+
+import game_pb2
+from mailbox import MailboxPolicy, SNAPSHOT_POLICY, SlowConsumer
+from room import GameRoom
+from server import Subscriber
+
+def play_until(room, version):
+    # Joga (sempre atirando em si mesmo) até a sala chegar em 'version'
+    while room.version < version:
+        room.make_move(room.current_turn_player_id, game_pb2.SHOOT_SELF)
+    assert room.status == "IN_GAME"
+
+def new_room():
+    room = GameRoom("sala", "ana", seed=1)
+    room.add_player("bia")
+    return room
+
+def test_resume_delivers_every_missed_version_with_its_delta():
+    room = new_room()
+    play_until(room, 8)
+    expected = {update.version: update for update in room.history}
+
+    subscriber = Subscriber()
+    room.subscribe(subscriber, resume_from_version=3)
+    received = subscriber.drain()
+
+    assert [update.version for update in received] == [4, 5, 6, 7, 8]
+    for update in received:
+        assert update.delta is not None
+        assert update.delta == expected[update.version].delta
+        assert update.compact == expected[update.version].compact
+
+def test_live_updates_are_not_coalesced_by_default():
+    room = new_room()
+    subscriber = Subscriber()
+    room.subscribe(subscriber)
+    subscriber.drain() # Estado inicial
+
+    play_until(room, room.version + 3)
+    received = subscriber.drain()
+
+    assert len(received) == 3
+    assert all(update.delta is not None for update in received)
+
+def test_snapshot_policy_keeps_only_the_latest_state():
+    room = new_room()
+    play_until(room, 8)
+
+    subscriber = Subscriber(SNAPSHOT_POLICY)
+    room.subscribe(subscriber, resume_from_version=3)
+    received = subscriber.drain()
+
+    assert [(update.version, update.delta) for update in received] == [(8, None)]
+
+def test_snapshot_policy_never_coalesces_acks():
+    subscriber = Subscriber(SNAPSHOT_POLICY)
+    room = new_room()
+    first, second = room.history[0], room.history[1]
+
+    subscriber.push(first)
+    subscriber.push(b"ack")
+    subscriber.push(second)
+
+    assert subscriber.drain() == [first, b"ack", second]
+
+def test_capacity_overflow_disconnects_and_drops_pending_items():
+    subscriber = Subscriber(MailboxPolicy(capacity=2, coalesce=False, lag_budget=30.0))
+    subscriber.push(b"1")
+    subscriber.push(b"2")
+
+    with pytest.raises(SlowConsumer):
+        subscriber.push(b"3")
+
+    assert subscriber.closed
+    assert "2 itens" in subscriber.close_reason
+    assert subscriber.get() is None # Os pendentes foram descartados
+    with pytest.raises(SlowConsumer):
+        subscriber.push(b"4")
+
+def test_room_removes_a_subscriber_over_capacity():
+    room = new_room()
+    subscriber = Subscriber(MailboxPolicy(capacity=1, coalesce=False, lag_budget=30.0))
+    room.subscribe(subscriber) # Estado inicial: a caixa fica cheia
+
+    play_until(room, room.version + 1)
+
+    assert subscriber not in room.subscribers
+    assert subscriber.get() is None
+
+def test_lag_budget_disconnects_a_stalled_stream():
+    subscriber = Subscriber(MailboxPolicy(capacity=256, coalesce=False, lag_budget=0.05))
+    subscriber.push(b"1")
+    time.sleep(0.1)
+
+    with pytest.raises(SlowConsumer):
+        subscriber.push(b"2")
+    assert "sem consumir" in subscriber.close_reason
+
+def test_consuming_resets_the_lag_budget():
+    subscriber = Subscriber(MailboxPolicy(capacity=256, coalesce=False, lag_budget=0.1))
+    subscriber.push(b"1")
+    subscriber.push(b"2")
+    for _ in range(3):
+        time.sleep(0.06)
+        assert subscriber.get() is not None
+        subscriber.push(b"x") # Não levanta: o stream consumiu há menos de 0.1s
+    assert not subscriber.closed
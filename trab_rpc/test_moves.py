@@ -0,0 +1,110 @@
+"""Testes das jogadas idempotentes (sequence do MakeMove/PlayGame)."""
+import grpc
+
+import game_pb2
+from room import GameRoom, MOVE_WINDOW
+from server import STORE, GameServerImpl
+
+class FakeContext:
+    """O suficiente de um grpc.ServicerContext para as RPCs unárias."""
+
+    def __init__(self):
+        self.code = grpc.StatusCode.OK
+        self.details = ""
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+def new_room():
+    room = GameRoom("sala", "ana", seed=1)
+    room.add_player("bia")
+    return room
+
+def test_repeated_sequence_is_applied_once():
+    room = new_room()
+    player = room.current_turn_player_id
+
+    first = room.apply_move(player, game_pb2.SHOOT_OPPONENT, sequence=1)
+    version = room.version
+    retry = room.apply_move(player, game_pb2.SHOOT_OPPONENT, sequence=1)
+
+    assert first.error is None and not first.duplicate
+    assert retry == (None, first.version, True)
+    assert room.version == version
+
+def test_repeated_sequence_returns_the_original_error():
+    room = new_room()
+    waiting = room.get_opponent_id(room.current_turn_player_id)
+
+    first = room.apply_move(waiting, game_pb2.SHOOT_SELF, sequence=1)
+    retry = room.apply_move(waiting, game_pb2.SHOOT_SELF, sequence=1)
+
+    assert first.error == "Não é o seu turno"
+    assert retry == (first.error, first.version, True)
+
+def test_old_sequence_outside_the_window_counts_as_processed():
+    room = new_room()
+    player = room.current_turn_player_id
+    room.apply_move(player, game_pb2.SHOOT_OPPONENT, sequence=5)
+    room.move_results.clear() # Como se os resultados tivessem saído da janela
+
+    version = room.version
+    result = room.apply_move(player, game_pb2.SHOOT_OPPONENT, sequence=3)
+
+    assert result == (None, version, True)
+    assert room.version == version
+
+def test_move_results_window_is_bounded():
+    room = new_room()
+    waiting = room.get_opponent_id(room.current_turn_player_id)
+
+    for sequence in range(1, MOVE_WINDOW + 10):
+        room.apply_move(waiting, game_pb2.SHOOT_SELF, sequence)
+
+    assert len(room.move_results) == MOVE_WINDOW
+    assert room.apply_move(waiting, game_pb2.SHOOT_SELF, 1).duplicate
+
+def test_sequences_are_tracked_per_player():
+    room = new_room()
+    player = room.current_turn_player_id
+    opponent = room.get_opponent_id(player)
+
+    room.apply_move(player, game_pb2.SHOOT_OPPONENT, sequence=1) # A vez passa
+    result = room.apply_move(opponent, game_pb2.SHOOT_OPPONENT, sequence=1)
+
+    assert not result.duplicate and result.error is None
+
+def test_zero_sequence_disables_deduplication():
+    room = new_room()
+    player = room.current_turn_player_id
+
+    room.apply_move(player, game_pb2.SHOOT_OPPONENT)
+    result = room.apply_move(player, game_pb2.SHOOT_OPPONENT)
+
+    assert result.error == "Não é o seu turno"
+    assert not result.duplicate
+
+def test_make_move_rpc_retry_is_idempotent():
+    server = GameServerImpl()
+    context = FakeContext()
+    created = server.CreateRoom(game_pb2.CreateRoomRequest(player_name="ana", room_name="sala"), context)
+    joined = server.JoinRoom(game_pb2.JoinRoomRequest(player_name="bia", room_id=created.room_id), context)
+    assert context.code == grpc.StatusCode.OK
+
+    room = STORE.get(created.room_id)
+    player = room.current_turn_player_id
+    token = created.session_token if player == "ana" else joined.session_token
+    request = game_pb2.MoveRequest(room_id=created.room_id, player_id=player, session_token=token,
+                                   action=game_pb2.SHOOT_OPPONENT, sequence=7)
+
+    first = server.MakeMove(request, FakeContext())
+    version = room.version
+    retry = server.MakeMove(request, FakeContext())
+
+    assert first.success and not first.duplicate
+    assert retry.success and retry.duplicate
+    assert retry.state_version == first.state_version
+    assert room.version == version
@@ -0,0 +1,121 @@
+"""Testes do controle de admissão (ratelimit.py)."""
+import collections
+
+import grpc
+import pytest
+
+import game_pb2
+from ratelimit import (FORWARDED_METADATA, PUSHBACK_METADATA, SESSION_METADATA, AdmissionControl,
+                       RateLimitInterceptor, caller_key, forwarded_peer)
+from sessions import SessionRegistry
+
+HandlerCallDetails = collections.namedtuple("HandlerCallDetails", ["method", "invocation_metadata"])
+
+class Aborted(Exception):
+    pass
+
+class FakeContext:
+    """O suficiente de um grpc.ServicerContext para os interceptors."""
+
+    def __init__(self, peer="ipv4:10.0.0.1:5000", metadata=()):
+        self._peer = peer
+        self._metadata = tuple(metadata)
+        self.trailing_metadata = ()
+        self.code = None
+
+    def peer(self):
+        return self._peer
+
+    def invocation_metadata(self):
+        return self._metadata
+
+    def set_trailing_metadata(self, metadata):
+        self.trailing_metadata = metadata
+
+    def abort(self, code, details):
+        self.code = code
+        raise Aborted(details)
+
+def test_bucket_allows_the_burst_then_asks_to_wait():
+    control = AdmissionControl(10, {"MakeMove": (1.0, 3)})
+
+    waits = [control.take("MakeMove", "ana") for _ in range(4)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 0.0 < waits[3] <= 1.0
+    assert control.take("MakeMove", "bia") == 0.0 # Cada um com o seu bucket
+    assert control.take("GetLobbies", "ana") == 0.0 # Método sem limite
+
+def test_caller_is_the_verified_session_never_the_claimed_name():
+    sessions = SessionRegistry()
+    session = sessions.join("ana", "", "sala-1")
+    context = FakeContext()
+
+    own = caller_key(game_pb2.MoveRequest(session_token=session.token), context, sessions)
+    forged = caller_key(game_pb2.MoveRequest(player_id="ana", session_token="falso"), context, sessions)
+    from_metadata = caller_key(game_pb2.LobbyRequest(), FakeContext(metadata=((SESSION_METADATA, session.token),)),
+                               sessions)
+
+    assert own == (f"session:{session.token}", "ana")
+    assert forged == (context.peer(), None)
+    assert from_metadata == own
+
+def test_forwarded_peer_needs_the_cluster_signature():
+    secret = b"segredo"
+    signed = FakeContext(metadata=((FORWARDED_METADATA, forwarded_peer("ipv4:1.2.3.4:9", secret)),))
+    forged = FakeContext(metadata=((FORWARDED_METADATA, "ipv4:1.2.3.4:9 assinatura"),))
+
+    assert caller_key(game_pb2.LobbyRequest(), signed, None, secret) == ("ipv4:1.2.3.4:9", None)
+    assert caller_key(game_pb2.LobbyRequest(), forged, None, secret) == (forged.peer(), None)
+
+def test_player_streams_are_capped_per_caller():
+    control = AdmissionControl(100, max_player_streams=2)
+
+    assert control.open_stream("PlayGame", "ana", True) is None
+    assert control.open_stream("StreamGameUpdates", "ana", True) is None
+    assert "2 streams abertos" in control.open_stream("PlayGame", "ana", True)
+    assert control.open_stream("PlayGame", "bia", True) is None
+
+    control.close_stream("PlayGame", "ana", True)
+    assert control.open_stream("PlayGame", "ana", True) is None
+
+def test_spectator_streams_have_their_own_cap():
+    control = AdmissionControl(100, max_player_streams=2, max_spectator_streams=5)
+    peer = "ipv4:10.0.0.1:5000"
+
+    for _ in range(2):
+        assert control.open_stream("StreamGameUpdates", peer, False) is None
+    # Os streams de jogo do canal já estão no teto, mas ele ainda assiste salas
+    for _ in range(5):
+        assert control.open_stream("WatchGame", peer, False) is None
+    assert "streams de espectador" in control.open_stream("WatchGame", peer, False)
+
+    control.close_stream("WatchGame", peer, False)
+    assert control.open_stream("WatchGame", peer, False) is None
+    assert control.stats()["streams"] == 7
+
+def test_seated_players_keep_their_reserved_share():
+    control = AdmissionControl(8, max_player_streams=8, max_spectator_streams=8)
+
+    for _ in range(6): # 8 - int(8 * 0.25) lugares sem reserva
+        assert control.open_stream("WatchGame", "ipv4:10.0.0.1:5000", False) is None
+    assert "espectadores e clientes sem sessão" in control.open_stream("WatchGame", "ipv4:10.0.0.2:5000", False)
+    assert control.open_stream("PlayGame", "session:ana", True) is None
+    assert control.open_stream("PlayGame", "session:bia", True) is None
+    assert "8 streams abertos" in control.open_stream("PlayGame", "session:caio", True)
+
+def test_rejected_call_gets_retry_pushback():
+    control = AdmissionControl(10, {"CreateRoom": (1.0, 1)})
+    interceptor = RateLimitInterceptor(control)
+    handler = grpc.unary_unary_rpc_method_handler(lambda request, context: "ok")
+    details = HandlerCallDetails("/game.GameServer/CreateRoom", ())
+    behavior = interceptor.intercept_service(lambda _: handler, details).unary_unary
+
+    assert behavior(game_pb2.CreateRoomRequest(), FakeContext()) == "ok"
+    context = FakeContext()
+    with pytest.raises(Aborted):
+        behavior(game_pb2.CreateRoomRequest(), context)
+
+    assert context.code == grpc.StatusCode.RESOURCE_EXHAUSTED
+    (key, value), = context.trailing_metadata
+    assert key == PUSHBACK_METADATA and 0 < int(value) <= 1000
@@ -0,0 +1,54 @@
+"""Testes do PlayGame do servidor asyncio (sem abrir uma porta de verdade)."""
+import asyncio
+
+import grpc
+
+import game_pb2
+from server import GameServerImpl
+from server_aio import AsyncGameServerImpl
+
+class FakeContext:
+    """O suficiente de um grpc.aio.ServicerContext para o PlayGame."""
+
+    def __init__(self):
+        self.code = grpc.StatusCode.OK
+        self.details = ""
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    async def send_initial_metadata(self, metadata):
+        pass
+
+def new_match(host, guest):
+    # Sala em jogo no STORE do servidor; retorna (room_id, token de cada jogador).
+    # Os nomes ficam protegidos pelas sessões: cada teste usa os seus
+    server = GameServerImpl()
+    context = FakeContext()
+    created = server.CreateRoom(game_pb2.CreateRoomRequest(player_name=host, room_name="sala"), context)
+    joined = server.JoinRoom(game_pb2.JoinRoomRequest(player_name=guest, room_id=created.room_id), context)
+    assert context.code == grpc.StatusCode.OK
+    return created.room_id, {host: created.session_token, guest: joined.session_token}
+
+async def failing_requests(join):
+    yield game_pb2.PlayRequest(join=join)
+    await asyncio.sleep(0.01)
+    raise RuntimeError("leitura quebrou")
+
+def test_play_game_ends_when_the_move_reader_fails():
+    room_id, tokens = new_match("caio", "duda")
+    join = game_pb2.SubscribeRequest(room_id=room_id, player_id="caio", session_token=tokens["caio"])
+    unhandled = []
+
+    async def play():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, error: unhandled.append(error))
+        stream = AsyncGameServerImpl().PlayGame(failing_requests(join), FakeContext())
+        return [event async for event in stream]
+
+    events = asyncio.run(asyncio.wait_for(play(), timeout=5.0))
+
+    assert len(events) == 1 # O estado inicial; depois o stream termina em vez de ficar esperando
+    assert unhandled == []
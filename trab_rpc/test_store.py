@@ -0,0 +1,96 @@
+"""Testes do versionamento otimista do SQLiteStore.
+
+Dois SQLiteStore no mesmo arquivo fazem o papel de dois processos; cada um
+tem o seu RoomRegistry com a cópia local das salas.
+"""
+import pytest
+
+import game_pb2
+from registry import RoomRegistry
+from room import GameRoom
+from store import CONFLICTS, SQLiteStore
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / "rooms.db")
+    opened = []
+    for _ in range(2):
+        store = SQLiteStore(RoomRegistry(), path)
+        store.recover()
+        opened.append(store)
+    yield opened
+    for store in opened:
+        store.stop()
+
+def conflicts():
+    return CONFLICTS._values.get((), 0)
+
+def shared_room(first, second):
+    # Sala em jogo criada no primeiro store e adotada pelo segundo
+    room = GameRoom("sala", "ana", seed=1)
+    room.add_player("bia")
+    first.add(room)
+    return room, second.get(room.room_id)
+
+def test_stale_write_is_rejected(stores):
+    first, second = stores
+    room, copy = shared_room(first, second)
+
+    draft = room.draft()
+    draft.make_move(draft.current_turn_player_id, game_pb2.SHOOT_SELF)
+    assert first._save(draft, room.version)
+
+    stale = copy.draft()
+    stale.make_move(stale.current_turn_player_id, game_pb2.SHOOT_SELF)
+    assert not second._save(stale, copy.version) # A linha já está em outra versão
+    assert second._current_version(room.room_id) == draft.version
+
+def test_conflicting_move_is_redone_on_the_stored_state(stores):
+    first, second = stores
+    room, copy = shared_room(first, second)
+    refreshed = []
+    second.refreshed_listeners.append(refreshed.append)
+    before = conflicts()
+
+    player = room.current_turn_player_id
+    assert first.apply_move(room, player, game_pb2.SHOOT_OPPONENT, 1).error is None
+    # A cópia do segundo store ainda acha que a vez é de 'player'
+    assert copy.current_turn_player_id == player
+    result = second.apply_move(copy, player, game_pb2.SHOOT_OPPONENT, 1)
+
+    assert conflicts() == before + 1
+    assert refreshed == [copy]
+    assert result.duplicate # Refeita sobre o estado gravado: o sequence já foi processado
+    assert copy.version == room.version == second._current_version(room.room_id)
+
+def test_conflicting_update_is_redone(stores):
+    first, second = stores
+    room = GameRoom("sala", "ana")
+    first.add(room)
+    copy = second.get(room.room_id)
+    before = conflicts()
+
+    first.update(room, "join", lambda draft: draft.add_player("bia"))
+    with pytest.raises(Exception, match="Sala está cheia"):
+        second.update(copy, "join", lambda draft: draft.add_player("caio"))
+
+    assert conflicts() == before + 1
+    assert copy.player2_id == "bia"
+    assert copy.version == second._current_version(room.room_id)
+
+def test_moves_from_both_stores_keep_one_history(stores):
+    first, second = stores
+    room, copy = shared_room(first, second)
+
+    for sequence in range(1, 5):
+        for store, local in ((first, room), (second, copy)):
+            player = local.current_turn_player_id
+            store.apply_move(local, player, game_pb2.SHOOT_SELF, sequence)
+        if room.status == "GAME_OVER" or copy.status == "GAME_OVER":
+            break
+    second.poll()
+    first.poll()
+
+    version = first._current_version(room.room_id)
+    assert room.version == copy.version == version
+    assert room.dump_state() == copy.dump_state()